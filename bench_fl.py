@@ -0,0 +1,428 @@
+import os, sys, gc, json, time, argparse, subprocess, tracemalloc
+
+BASE = os.path.dirname(__file__)
+SRC = os.path.join(BASE, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import numpy as np
+
+from controllers.app_controller_fl import AppController_FL
+from controllers.sessions_fl import SessionManager_FL
+from core.simulator import Simulator_FL
+from core.tank import Tank
+from core.flowmeter import FlowMeter
+from core.properties import rho_water, water_props, rho_water_arr
+from core.remeter import remeter_FL
+from core.events import EventJournal_FL
+from core.hydraulics import HydraulicNetwork_FL
+from core.pump import Pump
+
+# Rögzített forgatókönyvek: mindegyik egy (futtató, tickszám) párt ad vissza,
+# külső erőforrásnál (pl. Tk ablak) harmadikként egy lebontó függvényt is.
+# A futtató pontosan `n` ticket hajt végre egy frissen felépített állapoton.
+SCENARIOS = {}
+
+
+def _repeat(fn):
+    # fn(k) n-szer, gyűjtött eredménylista nélkül
+    def run(n):
+        for k in range(n):
+            fn(k)
+    return run
+
+
+def scenario(name):
+    def reg(fn):
+        SCENARIOS[name] = fn
+        return fn
+    return reg
+
+
+@scenario("sim_steady_transfer")
+def _sim_steady():
+    sim = Simulator_FL(history_capacity=200)
+    sim.t1.level_l, sim.t2.level_l, sim.t3.level_l = 900.0, 500.0, 100.0
+    sim.p1.command = 0.1; sim.p2.command = 0.1; sim.drain_lps = 3.5
+    return _repeat(lambda k: sim.step_FL(1.0)), 20000
+
+
+@scenario("ctrl_bidirectional")
+def _ctrl_bidir():
+    ctrl = AppController_FL()
+    ctrl.L1, ctrl.L2, ctrl.L3 = 500.0, 500.0, 500.0
+
+    def run(n):
+        for k in range(n):
+            # 5 percenként irányváltás
+            d = 1.0 if (k // 300) % 2 == 0 else -1.0
+            ctrl.set_p1(d); ctrl.set_p2(-d)
+            ctrl.tick_FL(1.0)
+    return run, 20000
+
+
+@scenario("ctrl_drain_to_empty")
+def _ctrl_drain():
+    ctrl = AppController_FL()
+    ctrl.L3 = 1000.0
+    ctrl.set_drain(20.0)
+    return _repeat(lambda k: ctrl.tick_FL(1.0)), 20000
+
+
+@scenario("ctrl_multi_hour")
+def _ctrl_long():
+    ctrl = AppController_FL()
+    ctrl.set_p1(0.5); ctrl.set_p2(0.4); ctrl.set_drain(4.0)
+    return _repeat(lambda k: ctrl.tick_FL(1.0)), 8 * 3600
+
+
+@scenario("sessions_200")
+def _sessions():
+    # 200 üzem négy ütemcsoportban, léptetett (nem valós) órával; egy "tick" egy ütemezői kör
+    clk = [0.0]
+    mgr = SessionManager_FL(clock=lambda: clk[0])
+    for i in range(200):
+        s = mgr.create(dt_s=(1.0, 0.5)[i % 2], speed=(1.0, 2.0)[(i // 2) % 2])
+        s.set_p1(1.0); s.set_p2(0.5); s.set_drain(1.0)
+
+    def run(n):
+        for _ in range(n):
+            clk[0] += 0.25
+            mgr.run_pending()
+    return run, 200
+
+
+@scenario("tank_add_thermal")
+def _tank():
+    tank = Tank(1000.0, 500.0, 60.0)
+
+    def run(n):
+        for k in range(n):
+            tank.add(1.0, 20.0 + (k % 7))
+            tank.remove(1.0)
+            tank.thermal_losses(1.0)
+    return run, 50000
+
+
+@scenario("flowmeter_measure")
+def _meter():
+    fq = FlowMeter("FQ", lowpass_tau_s=5.0)
+    return _repeat(lambda k: fq.measure(10.0 + (k % 5), 990.0, 1.0)), 100000
+
+
+@scenario("remeter_8tau")
+def _remeter():
+    # egy "tick" egy minta, nyolc tau jelölttel egyszerre
+    rng = np.random.default_rng(0)
+    n = 86400
+    q = np.abs(rng.normal(10.0, 3.0, n))
+
+    def run(n):
+        remeter_FL(q[:n], 990.0, 1.0, (0.0, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0), series=False)
+    return run, n
+
+
+@scenario("events_range_1e5")
+def _events():
+    # 100 000 eseményes naplóban egy-egy 10 perces időablak lekérdezése
+    j = EventJournal_FL()
+    for k in range(100000):
+        j.append(30.0 * k, ("LL raise", "LL clear")[k % 2], "T1", 0.0)
+    return _repeat(lambda k: j.range(k * 97.0, k * 97.0 + 600.0)), 20000
+
+
+@scenario("hydraulics_grid_420")
+def _hydraulics():
+    # 15x15 csomópontos hurkolt rács (420 cső) két tartály között, szivattyúval;
+    # tickenként a szintek változnak, a megoldás az előzőből indul
+    n = 15
+    rng = np.random.default_rng(1)
+    net = HydraulicNetwork_FL()
+    src, dst = Tank(1000.0, 800.0, 40.0), Tank(1000.0, 200.0, 20.0)
+    net.add_tank("A", src, elevation_m=5.0)
+    net.add_tank("B", dst)
+    for i in range(n):
+        for j in range(n):
+            net.add_junction(f"J{i}_{j}", elevation_m=float(rng.uniform(0.0, 2.0)))
+    for i in range(n):
+        for j in range(n):
+            if i + 1 < n:
+                net.add_pipe(f"h{i}_{j}", f"J{i}_{j}", f"J{i + 1}_{j}", 50.0, float(rng.choice((0.05, 0.08, 0.1))))
+            if j + 1 < n:
+                net.add_pipe(f"v{i}_{j}", f"J{i}_{j}", f"J{i}_{j + 1}", 50.0, float(rng.choice((0.05, 0.08, 0.1))))
+    pump = Pump(30.0, "PA")
+    pump.command = 1.0
+    net.add_pump("PA", "A", "J0_0", pump, length_m=5.0, diameter_m=0.15, shutoff_m=30.0)
+    net.add_pipe("out", f"J{n - 1}_{n - 1}", "B", 20.0, 0.15)
+    net.solve_FL()
+
+    def step(k):
+        src.level_l -= 0.5
+        dst.level_l += 0.5
+        net.solve_FL()
+    return _repeat(step), 500
+
+
+@scenario("properties_scalar")
+def _props():
+    return _repeat(lambda k: (rho_water(20.0 + k % 80), water_props(20.0 + k % 80))), 50000
+
+
+@scenario("properties_array")
+def _props_arr():
+    T = np.linspace(0.0, 100.0, 1000)
+    return _repeat(lambda k: rho_water_arr(T)), 5000
+
+
+@scenario("trend_redraw_200")
+def _trend():
+    from ui.trend_fl import TrendPanel_FL
+    panel = TrendPanel_FL(None)
+    ctrl = AppController_FL()
+    ctrl.set_p1(1.0); ctrl.set_p2(0.5); ctrl.set_drain(2.0)
+    for _ in range(200):
+        ctrl.tick_FL(1.0)
+
+    def run(n):
+        for _ in range(n):
+            ctrl.tick_FL(1.0)
+            panel.update_FL(ctrl.history_columns())
+    return run, 300
+
+
+@scenario("app_draw_dynamic")
+def _app():
+    # valódi (elrejtett) Tk ablakot igényel; kijelző nélkül kimarad
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return None
+    root.withdraw()
+    from ui.app_fl import App_FL
+    app = App_FL(root, lazy_trend=False)
+    root.update()
+
+    def run(n):
+        for _ in range(n):
+            app.ctrl.tick_FL(1.0)
+            app._draw_dynamic()
+        root.update_idletasks()
+    return run, 300, root.destroy
+
+
+def _build(name: str):
+    # (futtató, tickszám, lebontás) vagy None, ha a forgatókönyv kimarad
+    made = SCENARIOS[name]()
+    if made is None:
+        return None
+    run, n, *rest = made
+    return run, n, (rest[0] if rest else None)
+
+
+def measure(name: str, repeat: int = 3) -> dict:
+    best = None
+    for _ in range(max(1, repeat)):
+        made = _build(name)
+        if made is None:
+            return {"skipped": True}
+        run, n, cleanup = made
+        gc.collect()
+        try:
+            t0 = time.perf_counter()
+            run(n)
+            dt = time.perf_counter() - t0
+        finally:
+            if cleanup is not None:
+                cleanup()
+        best = dt if best is None else min(best, dt)
+
+    # memória: külön futás tracemalloc alatt, hogy az időmérést ne torzítsa
+    run, n, cleanup = _build(name)
+    gc.collect()
+    blocks0 = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        run(n)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        if cleanup is not None:
+            cleanup()
+    gc.collect()
+    return {
+        "ticks": n,
+        "steps_per_s": n / best if best > 0 else float("inf"),
+        "us_per_tick": best / n * 1e6,
+        "peak_kb": peak / 1024.0,
+        "net_blocks": sys.getallocatedblocks() - blocks0,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float, mem_threshold: float) -> list:
+    fails = []
+    for name, res in results.items():
+        ref = baseline.get(name)
+        if not ref or res.get("skipped") or ref.get("skipped"):
+            continue
+        if res["us_per_tick"] > ref["us_per_tick"] * (1.0 + threshold):
+            fails.append(f"{name}: {res['us_per_tick']:.2f} µs/tick > {ref['us_per_tick']:.2f} × {1 + threshold:.2f}")
+        if res["peak_kb"] > ref["peak_kb"] * (1.0 + mem_threshold) + 64.0:
+            fails.append(f"{name}: {res['peak_kb']:.0f} kB csúcs > {ref['peak_kb']:.0f} × {1 + mem_threshold:.2f}")
+    return fails
+
+
+# Indulási mérés: modulonkénti importidő friss értelmezőben, és az első képkockáig
+# (séma) ill. a trendpanel betöltéséig eltelt idő. A core/controllers modulok
+# nem tölthetik be a GUI-t.
+STARTUP_MODULES = ("core.simulator", "controllers.app_controller_fl", "controllers.worker_fl",
+                   "ui.scene_fl", "ui.app_fl", "ui.trend_fl")
+GUI_MODULES = ("tkinter", "matplotlib")
+STARTUP_BUDGET_MS = {
+    "core.simulator": 500.0,
+    "controllers.app_controller_fl": 600.0,
+    "controllers.worker_fl": 600.0,
+    "ui.scene_fl": 100.0,
+    "ui.app_fl": 900.0,
+    "first_frame": 1500.0,
+    "trend_ready": 5000.0,
+}
+
+_IMPORT_PROBE = """
+import sys, time, json
+sys.path.insert(0, {src!r})
+t0 = time.perf_counter()
+import {mod}
+ms = (time.perf_counter() - t0) * 1e3
+print(json.dumps({{"ms": ms, "gui": [m for m in {gui!r} if m in sys.modules]}}))
+"""
+
+_FRAME_PROBE = """
+import sys, time, json
+sys.path.insert(0, {src!r})
+t0 = time.perf_counter()
+import tkinter as tk
+try:
+    root = tk.Tk()
+except tk.TclError:
+    print(json.dumps({{"skipped": True}}))
+    sys.exit(0)
+from ui.app_fl import App_FL
+root.geometry("1150x640")
+app = App_FL(root)
+root.update()
+first = time.perf_counter()
+while app.trend is None and time.perf_counter() - first < 30.0:
+    root.update()
+    time.sleep(0.005)
+ready = time.perf_counter()
+print(json.dumps({{"first_frame": (first - t0) * 1e3, "trend_ready": (ready - t0) * 1e3}}))
+root.destroy()
+"""
+
+
+def _probe(code: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=120)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else "probe failed")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure_startup(repeat: int = 3) -> dict:
+    res = {}
+    for mod in STARTUP_MODULES:
+        runs = [_probe(_IMPORT_PROBE.format(src=SRC, mod=mod, gui=GUI_MODULES)) for _ in range(max(1, repeat))]
+        res[mod] = {"ms": min(r["ms"] for r in runs), "gui": runs[0]["gui"]}
+    frames = [_probe(_FRAME_PROBE.format(src=SRC)) for _ in range(max(1, repeat))]
+    if frames[0].get("skipped"):
+        res["first_frame"] = res["trend_ready"] = {"skipped": True}
+    else:
+        for key in ("first_frame", "trend_ready"):
+            res[key] = {"ms": min(f[key] for f in frames)}
+    return res
+
+
+def check_startup(res: dict, budget: dict) -> list:
+    fails = []
+    for name, r in res.items():
+        if r.get("skipped"):
+            continue
+        if name.startswith(("core.", "controllers.")) and r.get("gui"):
+            fails.append(f"{name}: GUI-modult tölt be ({', '.join(r['gui'])})")
+        lim = budget.get(name)
+        if lim is not None and r["ms"] > lim:
+            fails.append(f"{name}: {r['ms']:.0f} ms > {lim:.0f} ms keret")
+    return fails
+
+
+def startup_main(args) -> int:
+    budget = dict(STARTUP_BUDGET_MS)
+    for item in args.budget or ():
+        name, _, ms = item.partition("=")
+        budget[name] = float(ms)
+    res = measure_startup(args.repeat)
+    print(f"{'indulás':<32}{'ms':>9}{'keret':>9}  GUI")
+    for name, r in res.items():
+        if r.get("skipped"):
+            print(f"{name:<32}{'kimarad (nincs kijelző)':>30}")
+            continue
+        lim = budget.get(name)
+        print(f"{name:<32}{r['ms']:>9.1f}{'' if lim is None else f'{lim:.0f}':>9}  {', '.join(r.get('gui', ())) or '-'}")
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2)
+    fails = check_startup(res, budget)
+    for msg in fails:
+        print("KERETEN TÚL:", msg)
+    return 1 if fails else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="Folyadékátvezetés szimulátor – teljesítménymérések")
+    ap.add_argument("scenarios", nargs="*", help=f"forgatókönyvek (alapértelmezés: mind): {', '.join(SCENARIOS)}")
+    ap.add_argument("--repeat", type=int, default=3, help="ismétlések száma; a legjobb idő számít")
+    ap.add_argument("--save", default=None, help="eredmények mentése alapvonalként (JSON)")
+    ap.add_argument("--baseline", default=None, help="összevetés egy korábbi alapvonallal (JSON)")
+    ap.add_argument("--threshold", type=float, default=0.20, help="megengedett időbeli romlás (0.2 = 20%%)")
+    ap.add_argument("--mem-threshold", dest="mem_threshold", type=float, default=0.50,
+                    help="megengedett csúcsmemória-növekedés")
+    ap.add_argument("--startup", action="store_true",
+                    help="indulási mérés: importidők és az első képkocka ideje a keretekhez képest")
+    ap.add_argument("--budget", action="append", metavar="NÉV=MS",
+                    help="indulási keret felülírása, pl. first_frame=1000 (ismételhető)")
+    return ap
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.startup:
+        return startup_main(args)
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Ismeretlen forgatókönyv: {', '.join(unknown)}")
+
+    results = {}
+    print(f"{'forgatókönyv':<22}{'lépés/s':>12}{'µs/tick':>10}{'csúcs kB':>10}{'blokk':>8}")
+    for name in names:
+        res = results[name] = measure(name, args.repeat)
+        if res.get("skipped"):
+            print(f"{name:<22}{'kimarad (nincs kijelző)':>40}")
+            continue
+        print(f"{name:<22}{res['steps_per_s']:>12.0f}{res['us_per_tick']:>10.2f}"
+              f"{res['peak_kb']:>10.0f}{res['net_blocks']:>8d}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            fails = compare(results, json.load(f), args.threshold, args.mem_threshold)
+        for msg in fails:
+            print("ROMLÁS:", msg)
+        return 1 if fails else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
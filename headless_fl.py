@@ -0,0 +1,216 @@
+import os, sys, csv, json, time, asyncio, argparse
+
+BASE = os.path.dirname(__file__)
+SRC = os.path.join(BASE, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from controllers.app_controller_fl import AppController_FL, CTRL_CHANNELS
+from controllers.event_integrator_fl import EventIntegrator_FL
+from controllers.telemetry_fl import TelemetryServer_FL
+from core.simulator import Simulator_FL
+from core.history import SIM_CHANNELS
+from core.historian import HistorianWriter_FL
+from core.hydraulics import HydraulicNetwork_FL
+
+
+class _Pacer:
+
+    # speed <= 0: amilyen gyorsan csak lehet; egyébként speed-szeres valós idő
+    def __init__(self, speed: float):
+        self.speed = float(speed)
+        self.t0 = time.perf_counter()
+
+    def wait(self, sim_elapsed_s: float) -> None:
+        if self.speed <= 0:
+            return
+        ahead = sim_elapsed_s / self.speed - (time.perf_counter() - self.t0)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+def _n_steps(duration_s: float, dt_s: float) -> int:
+    return max(0, int(round(float(duration_s) / float(dt_s))))
+
+
+def _attach_historian(sim, args) -> None:
+    if args.historian:
+        args.historian_writer = HistorianWriter_FL(args.historian, chunk_rows=args.chunk_rows)
+        sim.sinks.append(args.historian_writer)
+
+
+def _attach_hydraulics(sim, args) -> None:
+    if args.hydraulics:
+        sim.hydraulics = HydraulicNetwork_FL.from_simulator_FL(
+            sim, length_m=args.pipe_length, diameter_m=args.pipe_d, shutoff_m=args.shutoff)
+
+
+def run_controller(args, writer=None) -> dict:
+    ctrl = AppController_FL()
+    for name in ("L1", "L2", "L3", "T1", "T2", "T3"):
+        val = getattr(args, name)
+        if val is not None:
+            setattr(ctrl, name, float(val))
+    ctrl.set_p1(args.p1); ctrl.set_p2(args.p2); ctrl.set_drain(args.drain)
+    _attach_historian(ctrl.sim, args)
+    _attach_hydraulics(ctrl.sim, args)
+
+    def write_row():
+        l1, l2, l3 = ctrl.get_levels()
+        f12, f23, _, _ = ctrl.get_flows()
+        t1, t2, t3 = ctrl.get_temps()
+        writer.writerow((ctrl.time_s, l1, l2, l3, f12, f23, t1, t2, t3))
+
+    pacer = _Pacer(args.speed)
+    events = None
+    if args.serve is not None:
+        # a telemetria-szerver saját ciklusa lépteti a szimulációt
+        srv = TelemetryServer_FL(ctrl, host=args.host, port=args.serve, dt_s=args.dt, speed=args.speed)
+        asyncio.run(srv.serve(until_s=float(args.duration)))
+    elif args.integrator == "event":
+        ei = EventIntegrator_FL(ctrl)
+        end = float(args.duration)
+        while end - ctrl.time_s > 1e-9:
+            ei.step_FL(min(end - ctrl.time_s, args.max_dt))
+            if writer is not None:
+                write_row()
+            pacer.wait(ctrl.time_s)
+        events = [{"time_s": t, "kind": kind, "name": name} for t, kind, name in ei.events]
+    else:
+        for k in range(_n_steps(args.duration, args.dt)):
+            ctrl.tick_FL(args.dt)
+            if writer is not None and (k + 1) % args.every == 0:
+                write_row()
+            pacer.wait(ctrl.time_s)
+
+    ll1, hh1, ll2, hh2, ll3, hh3 = ctrl.get_alarms()
+    run1, run2, h1, h2 = ctrl.get_pumps()
+    state = {
+        "engine": "controller",
+        "time_s": ctrl.time_s,
+        "levels_l": ctrl.get_levels(),
+        "temps_c": ctrl.get_temps(),
+        "rhos_kgm3": ctrl.get_rhos(),
+        "flows_lps": ctrl.get_flows()[:2],
+        "flows_kgps": ctrl.get_flows()[2:],
+        "totals_l": ctrl.get_totals(),
+        "pumps": {"P1": {"running": run1, "hours": h1}, "P2": {"running": run2, "hours": h2}},
+        "alarms": {"T1": {"LL": ll1, "HH": hh1}, "T2": {"LL": ll2, "HH": hh2}, "T3": {"LL": ll3, "HH": hh3}},
+    }
+    if events is not None:
+        state["events"] = events
+    return state
+
+
+def run_simulator(args, writer=None) -> dict:
+    sim = Simulator_FL(history_capacity=1)
+    for tank, L, T in ((sim.t1, args.L1, args.T1), (sim.t2, args.L2, args.T2), (sim.t3, args.L3, args.T3)):
+        if L is not None:
+            tank.level_l = float(L)
+        if T is not None:
+            tank.temperature_c = float(T)
+    sim.p1.command = max(-1.0, min(1.0, args.p1))
+    sim.p2.command = max(-1.0, min(1.0, args.p2))
+    sim.drain_lps = max(0.0, args.drain)
+    _attach_historian(sim, args)
+    _attach_hydraulics(sim, args)
+
+    pacer = _Pacer(args.speed)
+    for k in range(_n_steps(args.duration, args.dt)):
+        sim.step_FL(args.dt)
+        if writer is not None and (k + 1) % args.every == 0:
+            writer.writerow(sim.history[-1])
+        pacer.wait(sim.t)
+
+    tanks = {}
+    for name, tank in (("T1", sim.t1), ("T2", sim.t2), ("T3", sim.t3)):
+        tanks[name] = {
+            "level_l": tank.level_l, "temperature_c": tank.temperature_c, "density_kgm3": tank.density_kgm3,
+            "LL": tank.alarm_ll, "HH": tank.alarm_hh,
+        }
+    return {
+        "engine": "simulator",
+        "time_s": sim.t,
+        "tanks": tanks,
+        "pumps": {p.name: {"command": p.command, "running": p.run_lamp, "hours": p.hours} for p in (sim.p1, sim.p2)},
+        "meters": {m.name: m.snapshot() for m in (sim.fq12, sim.fq23)},
+        "drain_lps": sim.drain_lps,
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="Folyadékátvezetés szimulátor – grafikus felület nélküli futtatás")
+    ap.add_argument("--engine", choices=("controller", "simulator"), default="controller")
+    ap.add_argument("--duration", type=float, default=8 * 3600.0, help="szimulált időtartam [s]")
+    ap.add_argument("--dt", type=float, default=1.0, help="időlépés [s]")
+    ap.add_argument("--speed", type=float, default=0.0, help="sebesség a valós időhöz képest (0 = max.)")
+    ap.add_argument("--integrator", choices=("fixed", "event"), default="fixed",
+                    help="fix lépésköz, vagy eseményvezérelt változó lépésköz (csak controller)")
+    ap.add_argument("--max-dt", dest="max_dt", type=float, default=float("inf"),
+                    help="legnagyobb lépésköz eseményvezérelt módban [s]")
+    ap.add_argument("--every", type=int, default=1, help="minden n. lépés kerül a nyomvonalba")
+    for name in ("L1", "L2", "L3"):
+        ap.add_argument(f"--{name}", type=float, default=None, help=f"kezdeti szint {name} [L]")
+    for name in ("T1", "T2", "T3"):
+        ap.add_argument(f"--{name}", type=float, default=None, help=f"kezdeti hőmérséklet {name} [°C]")
+    ap.add_argument("--p1", type=float, default=0.0, help="P1 parancs [-1..1]")
+    ap.add_argument("--p2", type=float, default=0.0, help="P2 parancs [-1..1]")
+    ap.add_argument("--drain", type=float, default=0.0, help="T3 leeresztés [L/s]")
+    ap.add_argument("--trace", default=None, help="nyomvonal CSV fájl")
+    ap.add_argument("--historian", default=None, help="teljes felbontású, tömörített előzményfájl")
+    ap.add_argument("--chunk-rows", dest="chunk_rows", type=int, default=4096,
+                    help="minták száma historian-blokkonként")
+    ap.add_argument("--serve", type=int, default=None, metavar="PORT",
+                    help="telemetria TCP-szerver a megadott porton (csak controller, fix lépésköz)")
+    ap.add_argument("--host", default="127.0.0.1", help="a telemetria-szerver címe")
+    ap.add_argument("--hydraulics", action="store_true",
+                    help="nyomásvezérelt csőhálózat: a szivattyúáram a szintekből, csősúrlódásból és jelleggörbéből")
+    ap.add_argument("--pipe-length", dest="pipe_length", type=float, default=20.0, help="szivattyúágak csőhossza [m]")
+    ap.add_argument("--pipe-d", dest="pipe_d", type=float, default=0.1, help="szivattyúágak belső átmérője [m]")
+    ap.add_argument("--shutoff", type=float, default=10.0, help="zárt tolózári emelőmagasság [m]")
+    ap.add_argument("--state", default=None, help="végállapot JSON fájl (alapértelmezés: stdout)")
+    return ap
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.dt <= 0:
+        raise SystemExit("--dt értéke pozitív kell legyen")
+    args.every = max(1, args.every)
+    if args.serve is not None and (args.engine != "controller" or args.integrator != "fixed"):
+        raise SystemExit("--serve csak controller motorral és fix lépésközzel használható")
+    if args.hydraulics and args.integrator != "fixed":
+        raise SystemExit("--hydraulics csak fix lépésközzel használható")
+    run = run_controller if args.engine == "controller" else run_simulator
+    header = CTRL_CHANNELS if args.engine == "controller" else SIM_CHANNELS
+
+    t0 = time.perf_counter()
+    args.historian_writer = None
+    try:
+        if args.trace:
+            with open(args.trace, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                state = run(args, writer)
+        else:
+            state = run(args)
+    finally:
+        if args.historian_writer is not None:
+            args.historian_writer.close()
+    state["wall_s"] = time.perf_counter() - t0
+    if args.historian_writer is not None:
+        hw = args.historian_writer
+        state["historian"] = {"path": hw.path, "rows": hw.rows, "bytes": hw.bytes_written, "stalls": hw.stalls,
+                              "dropped_rows": hw.dropped_rows}
+
+    text = json.dumps(state, indent=2, ensure_ascii=False)
+    if args.state:
+        with open(args.state, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
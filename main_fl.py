@@ -6,10 +6,15 @@ if SRC not in sys.path:
     sys.path.insert(0, SRC)
 
 from ui.app_fl import App_FL
+from core.profiler import PROFILER
 
 if __name__ == "__main__":
     root = tk.Tk()
     root.title("Folyadékátvezetés Szimulátor – 3T/2P (FL v1)")
     root.geometry("1150x640")
-    App_FL(root)
+    argv = sys.argv[1:]
+    replay = argv[argv.index("--replay") + 1] if "--replay" in argv[:-1] else None
+    App_FL(root, threaded="--threaded" in argv, replay=replay, profile="--profile" in argv)
     root.mainloop()
+    if "--profile" in argv:
+        PROFILER.export("profile_fl.json")
@@ -1,4 +1,11 @@
-from collections import deque
+from core.simulator import Simulator_FL, SimState_FL
+from core.checkpoint import save_checkpoint, load_checkpoint
+from core.profiler import PROFILER
+from core.pyramid import TrendPyramid_FL
+from core.events import EventEngine_FL
+
+CTRL_CHANNELS = ("t", "L1", "L2", "L3", "q12", "q23", "T1", "T2", "T3")
+
 
 class AppController_FL:
 
@@ -10,126 +17,137 @@ class AppController_FL:
     HYST_L = 5.0
     HIST_MAX = 200
 
-    def __init__(self):
-        self.L1, self.L2, self.L3 = 1000.0, 0.0, 0.0
-        self.T1, self.T2, self.T3 = 51.0, 20.0, 20.0
+    # A fizikát egyetlen Simulator_FL számolja; a vezérlő csak a parancsokat
+    # adja át, és minden get_* a motor tickenkénti állapotrekordjából olvas.
+
+    # trend=True: a teljes futás min/max/átlag piramisba is kerül (a trendpanel
+    # ebből kérdez ablak és pixelszélesség szerint); nélküle csak HIST_MAX minta marad
+    # events: élvezérelt riasztás-/retesz-/szivattyúnapló (EventEngine_FL), mindig aktív
+    def __init__(self, sim: Simulator_FL = None, trend: bool = True):
+        self.sim = sim if sim is not None else self._make_sim()
         self.p1_cmd = 0.0
         self.p2_cmd = 0.0
-        self.drain_lps = 0.0
-        self.p1_running = False
-        self.p2_running = False
-        self.p1_hours = 0.0
-        self.p2_hours = 0.0
-        self.f12_lps = self.f23_lps = 0.0
-        self.f12_kgps = self.f23_kgps = 0.0
-        self.tot12_L = self.tot23_L = 0.0
-        self.time_s = 0.0
-        self._hist = deque(maxlen=self.HIST_MAX)
+        self.state: SimState_FL = self.sim.state
+        self.events = EventEngine_FL(self.sim)
+        self.sim.sinks.append(self.events)
+        self.pyramid = None
+        if trend:
+            self._attach_pyramid(TrendPyramid_FL())
+            self.pyramid.extend(self.sim.history.columns())
+
+    def _attach_pyramid(self, pyr: TrendPyramid_FL) -> None:
+        if self.pyramid is not None:
+            self.sim.sinks.remove(self.pyramid)
+        self.pyramid = pyr
+        self.sim.sinks.append(pyr)
+
+    def _make_sim(self) -> Simulator_FL:
+        sim = Simulator_FL(history_capacity=self.HIST_MAX, hyst_l=self.LL_L + self.HYST_L)
+        sim.p1.max_flow_lps = self.P1_MAX_LPS
+        sim.p2.max_flow_lps = self.P2_MAX_LPS
+        for tank, L, T in zip((sim.t1, sim.t2, sim.t3), (1000.0, 0.0, 0.0), (51.0, 20.0, 20.0)):
+            tank.capacity_l = self.CAP_L
+            tank.level_l = L
+            tank.temperature_c = T
+            tank.set_alarms(100.0 * self.LL_L / self.CAP_L, 100.0 * self.HH_L / self.CAP_L)
+        sim.refresh_state_FL()
+        return sim
+
+    def refresh(self):
+        self.sim.invalidate_forecast_FL()
+        self.state = self.sim.refresh_state_FL()
+        self.events.detect_FL()
+
+
+    def _tank(self, i): return (self.sim.t1, self.sim.t2, self.sim.t3)[i]
+    def _set_level(self, i, v): self._tank(i).level_l = float(v); self.refresh()
+    def _set_temp(self, i, v): self._tank(i).temperature_c = float(v); self.refresh()
+
+    L1 = property(lambda self: self.state.levels[0], lambda self, v: self._set_level(0, v))
+    L2 = property(lambda self: self.state.levels[1], lambda self, v: self._set_level(1, v))
+    L3 = property(lambda self: self.state.levels[2], lambda self, v: self._set_level(2, v))
+    T1 = property(lambda self: self.state.temps[0], lambda self, v: self._set_temp(0, v))
+    T2 = property(lambda self: self.state.temps[1], lambda self, v: self._set_temp(1, v))
+    T3 = property(lambda self: self.state.temps[2], lambda self, v: self._set_temp(2, v))
+    f12_lps = property(lambda self: self.state.flows_lps[0])
+    f23_lps = property(lambda self: self.state.flows_lps[1])
+    f12_kgps = property(lambda self: self.state.flows_kgps[0])
+    f23_kgps = property(lambda self: self.state.flows_kgps[1])
+    tot12_L = property(lambda self: self.state.totals_l[0])
+    tot23_L = property(lambda self: self.state.totals_l[1])
+    p1_running = property(lambda self: self.state.running[0])
+    p2_running = property(lambda self: self.state.running[1])
+    p1_hours = property(lambda self: self.state.hours[0])
+    p2_hours = property(lambda self: self.state.hours[1])
+    time_s = property(lambda self: self.state.t)
+    drain_lps = property(lambda self: self.sim.drain_lps)
 
 
     def set_p1(self, cmd: float): self.p1_cmd = max(-1.0, min(1.0, float(cmd)))
     def set_p2(self, cmd: float): self.p2_cmd = max(-1.0, min(1.0, float(cmd)))
-    def set_drain(self, q_lps: float): self.drain_lps = max(0.0, float(q_lps))
-    def get_levels(self): return self.L1, self.L2, self.L3
-    def get_temps(self): return self.T1, self.T2, self.T3
-    def get_rhos(self): return tuple(self._rho(T) for T in (self.T1, self.T2, self.T3))
-    def get_alarms(self):
-        ll1, hh1 = self.L1 <= self.LL_L + 1e-6, self.L1 >= self.HH_L - 1e-6
-        ll2, hh2 = self.L2 <= self.LL_L + 1e-6, self.L2 >= self.HH_L - 1e-6
-        ll3, hh3 = self.L3 <= self.LL_L + 1e-6, self.L3 >= self.HH_L - 1e-6
-        return ll1, hh1, ll2, hh2, ll3, hh3
-    def get_pumps(self): return self.p1_running, self.p2_running, self.p1_hours, self.p2_hours
-    def get_flows(self): return self.f12_lps, self.f23_lps, self.f12_kgps, self.f23_kgps
-    def get_totals(self): return self.tot12_L, self.tot23_L
+    def set_drain(self, q_lps: float): self.sim.drain_lps = max(0.0, float(q_lps))
+    def get_levels(self): return self.state.levels
+    def get_temps(self): return self.state.temps
+    def get_rhos(self): return self.state.rhos
+    def get_alarms(self): return self.state.alarms
+    def get_pumps(self): return (*self.state.running, *self.state.hours)
+    def get_flows(self): return (*self.state.flows_lps, *self.state.flows_kgps)
+    def get_totals(self): return self.state.totals_l
     def get_pump_cmds(self):
-        eff1 = 0.0 if not self.p1_running else (1.0 if self.f12_lps>0 else (-1.0 if self.f12_lps<0 else 0.0))
-        eff2 = 0.0 if not self.p2_running else (1.0 if self.f23_lps>0 else (-1.0 if self.f23_lps<0 else 0.0))
-        if not self.p1_running: eff1 = 0.0 if abs(self.p1_cmd)<1e-6 else (1.0 if self.p1_cmd>0 else -1.0)
-        if not self.p2_running: eff2 = 0.0 if abs(self.p2_cmd)<1e-6 else (1.0 if self.p2_cmd>0 else -1.0)
+        run1, run2 = self.state.running
+        f12, f23 = self.state.flows_lps
+        eff1 = 0.0 if not run1 else (1.0 if f12>0 else (-1.0 if f12<0 else 0.0))
+        eff2 = 0.0 if not run2 else (1.0 if f23>0 else (-1.0 if f23<0 else 0.0))
+        if not run1: eff1 = 0.0 if abs(self.p1_cmd)<1e-6 else (1.0 if self.p1_cmd>0 else -1.0)
+        if not run2: eff2 = 0.0 if abs(self.p2_cmd)<1e-6 else (1.0 if self.p2_cmd>0 else -1.0)
         return eff1, eff2
-    def history(self): return list(self._hist)
+    def forecast_FL(self):
+        # a kezelő parancsa reteszeléskor is érvényes marad: csúszó üzem, nem tartós leállás
+        return self.sim.forecast_FL((self.p1_cmd, self.p2_cmd), latching=False)
+    # egyszálú vezérlőnél maga az olvasó a konzisztens pillanatkép
+    def snapshot(self): return self
+    def history(self): return list(self.sim.history)
+    def history_columns(self): return self.sim.history.columns()
+    def trend_FL(self, t0: float, t1: float, width_px: int):
+        if self.pyramid is None:
+            return None
+        return self.pyramid.query(t0, t1, width_px)
 
 
     def tick_FL(self, dt: float):
         dt = float(dt)
         if dt <= 0: return
-        p1 = self._apply_interlocks_p1(self.p1_cmd)
-        p2 = self._apply_interlocks_p2(self.p2_cmd)
-        q1_des = p1 * self.P1_MAX_LPS
-        q2_des = p2 * self.P2_MAX_LPS
-        q1 = self._clamp_bidir(q1_des, self.L1, self.L2, dt)
-        q2 = self._clamp_bidir(q2_des, self.L2, self.L3, dt)
-        q_drain = min(self.drain_lps, self.L3/dt if dt>0 else 0.0)
-
-        self._xfer_level(q1, '12', dt)
-        self._xfer_level(q2, '23', dt)
-        self.L3 = max(self.LL_L, min(self.HH_L, self.L3 - q_drain*dt))
-
-        self._mix_temps(q1, ('T1','T2'), dt)
-        self._mix_temps(q2, ('T2','T3'), dt)
-
-        self.f12_lps, self.f23_lps = q1, q2
-        r1, r2, r3 = self.get_rhos()
-        self.f12_kgps = abs(q1)*0.001*(r2 if q1<0 else r1)
-        self.f23_kgps = abs(q2)*0.001*(r2 if q2>0 else r3)
-        self.tot12_L += abs(q1)*dt
-        self.tot23_L += abs(q2)*dt
-
-        self.p1_running = abs(q1) > 1e-6
-        self.p2_running = abs(q2) > 1e-6
-        if self.p1_running: self.p1_hours += dt/3600.0
-        if self.p2_running: self.p2_hours += dt/3600.0
-
-        self.time_s += dt
-        self._hist.append((self.time_s, self.L1, self.L2, self.L3, self.f12_lps, self.f23_lps, self.T1, self.T2, self.T3))
+        pf = PROFILER.begin()
+        # a motor reteszeléskor nullázza a parancsot; a kezelő parancsa minden tickben újra érvényes
+        self.sim.p1.command = self.p1_cmd
+        self.sim.p2.command = self.p2_cmd
+        self.sim.step_FL(dt)
+        self.state = self.sim.state
+        if pf:
+            pf.lap("ctrl.tick")
+            pf.done()
 
 
     def tick(self, dt: float): self.tick_FL(dt)
 
 
-    @staticmethod
-    def _rho(T): return max(950.0, min(1000.0, 1000.0 - 0.3*(T-4.0)))
-    def _apply_interlocks_p1(self, cmd):
-        if cmd < 0:  # T2 -> T1
-            if self.L1 >= self.HH_L or self.L2 <= self.LL_L + self.HYST_L: return 0.0
-        elif cmd > 0:  # T1 -> T2
-            if self.L2 >= self.HH_L or self.L1 <= self.LL_L + self.HYST_L: return 0.0
-        return cmd
-    def _apply_interlocks_p2(self, cmd):
-        if cmd > 0:  # T2 -> T3
-            if self.L3 >= self.HH_L or self.L2 <= self.LL_L + self.HYST_L: return 0.0
-        elif cmd < 0:  # T3 -> T2
-            if self.L2 >= self.HH_L or self.L3 <= self.LL_L + self.HYST_L: return 0.0
-        return cmd
-    def _clamp_bidir(self, q_des, La, Lb, dt):
-        if abs(q_des) < 1e-9: return 0.0
-        if q_des > 0:
-            max_from_a = max(0.0, La - self.LL_L) / dt
-            max_to_b   = max(0.0, self.HH_L - Lb) / dt
-            return max(0.0, min(q_des, max_from_a, max_to_b))
-        else:
-            max_from_b = max(0.0, Lb - self.LL_L) / dt
-            max_to_a   = max(0.0, self.HH_L - La) / dt
-            return -max(0.0, min(abs(q_des), max_from_b, max_to_a))
-    def _xfer_level(self, q, pair, dt):
-        dL = q*dt
-        if pair=='12':
-            self.L1 = max(self.LL_L, min(self.HH_L, self.L1 - dL))
-            self.L2 = max(self.LL_L, min(self.HH_L, self.L2 + dL))
-        else:
-            self.L2 = max(self.LL_L, min(self.HH_L, self.L2 - dL))
-            self.L3 = max(self.LL_L, min(self.HH_L, self.L3 + dL))
-    def _mix_temps(self, q, pair, dt):
-        if abs(q) < 1e-9 or dt<=0: return
-        V = abs(q)*dt
-        if pair==('T1','T2'):
-            if q>0: self.T2 = self._mix(self.T2, self.L2, self.T1, V)
-            else:   self.T1 = self._mix(self.T1, self.L1, self.T2, V)
-        else:
-            if q>0: self.T3 = self._mix(self.T3, self.L3, self.T2, V)
-            else:   self.T2 = self._mix(self.T2, self.L2, self.T3, V)
-    @staticmethod
-    def _mix(Td, Ld, Ts, Vin):
-        if Ld <= 1e-9: return Ts
-        a = max(0.0, min(1.0, Vin/(Ld+Vin)))
-        return (1-a)*Td + a*Ts
+    def fork(self) -> "AppController_FL":
+        other = AppController_FL(self.sim.fork(), trend=False)
+        other.p1_cmd, other.p2_cmd = self.p1_cmd, self.p2_cmd
+        other.sim.sinks.remove(other.events)
+        other.events = self.events.fork(other.sim)
+        other.sim.sinks.append(other.events)
+        if self.pyramid is not None:
+            other._attach_pyramid(self.pyramid.fork())
+        return other
+
+    def save_checkpoint(self, path: str) -> int:
+        return save_checkpoint(self.sim, path, {"p1_cmd": self.p1_cmd, "p2_cmd": self.p2_cmd})
+
+    @classmethod
+    def load_checkpoint(cls, path: str, use_mmap: bool = True) -> "AppController_FL":
+        sim, extra = load_checkpoint(path, use_mmap=use_mmap)
+        ctrl = cls(sim)
+        ctrl.p1_cmd = extra.get("p1_cmd", 0.0)
+        ctrl.p2_cmd = extra.get("p2_cmd", 0.0)
+        return ctrl
@@ -0,0 +1,169 @@
+import math
+from typing import List, Tuple
+
+# a rezsim-számítás a core.forecast-ban él; innen is elérhető marad
+from core.forecast import PUMP_PAIRS, Regime_FL, solve_regime_FL, time_to_next_event_FL
+from .app_controller_fl import AppController_FL
+
+_TOL_L = 1e-9
+
+
+class EventIntegrator_FL:
+
+    # Változó lépésközű integrátor az AppController_FL modelljéhez: két esemény
+    # között a szintek lineárisan változnak, így pontosan az eseményig lép.
+    # Hőmérséklet: keveredési ODE, RK4 allépésekkel az intervallumon belül,
+    # utána a tartályok pontos hőveszteség-lépése. Az állapot a vezérlő
+    # Simulator_FL motorjába íródik.
+
+    SUBSTEP_FRAC = 0.1
+    MAX_SUBSTEPS = 2000
+
+    def __init__(self, ctrl: AppController_FL):
+        self.ctrl = ctrl
+        self.events: List[Tuple[float, str, str]] = []
+        self.steps = 0
+        self._locked = None
+
+    def thresholds(self) -> Tuple[float, float, float]:
+        c = self.ctrl
+        return (c.LL_L, c.LL_L + c.HYST_L, c.HH_L)
+
+    def regime(self) -> Regime_FL:
+        c = self.ctrl
+        return solve_regime_FL(
+            c.get_levels(), (c.p1_cmd, c.p2_cmd), (c.P1_MAX_LPS, c.P2_MAX_LPS),
+            c.drain_lps, c.LL_L, c.HH_L, c.HYST_L)
+
+    def next_event_FL(self) -> float:
+        return time_to_next_event_FL(self.ctrl.get_levels(), self.regime().rates, self.thresholds())[0]
+
+
+    def _mix_temps(self, T, L0, rates, q, dt):
+        # dT_i/dt = sum_be q (T_forrás - T_i) / L_i(t)
+        inflow = [[] for _ in range(3)]
+        for (a, b), qk in zip(PUMP_PAIRS, q):
+            if qk > 1e-12:
+                inflow[b].append((a, qk))
+            elif qk < -1e-12:
+                inflow[a].append((b, -qk))
+        if not any(inflow):
+            return T
+
+        h = dt
+        for i in range(3):
+            q_in = sum(qk for _, qk in inflow[i])
+            if q_in > 0:
+                L_lo = min(L0[i], L0[i] + rates[i] * dt)
+                L_ref = max(L_lo, 0.05 * max(L0[i], L0[i] + rates[i] * dt), _TOL_L)
+                h = min(h, self.SUBSTEP_FRAC * L_ref / q_in)
+        n = min(self.MAX_SUBSTEPS, max(1, math.ceil(dt / h)))
+        h = dt / n
+
+        def pin(T, tau):
+            # üres tartály a beáramló folyadék hőmérsékletét veszi fel
+            T = list(T)
+            for i in range(3):
+                if inflow[i] and L0[i] + rates[i] * tau <= _TOL_L:
+                    q_in = sum(qk for _, qk in inflow[i])
+                    T[i] = sum(qk * T[j] for j, qk in inflow[i]) / q_in
+            return T
+
+        def deriv(T, tau):
+            out = [0.0, 0.0, 0.0]
+            for i in range(3):
+                Li = L0[i] + rates[i] * tau
+                if Li > _TOL_L:
+                    out[i] = sum(qk * (T[j] - T[i]) for j, qk in inflow[i]) / Li
+            return out
+
+        T = pin(T, 0.0)
+        tau = 0.0
+        for _ in range(n):
+            k1 = deriv(T, tau)
+            k2 = deriv([x + 0.5 * h * k for x, k in zip(T, k1)], tau + 0.5 * h)
+            k3 = deriv([x + 0.5 * h * k for x, k in zip(T, k2)], tau + 0.5 * h)
+            k4 = deriv([x + h * k for x, k in zip(T, k3)], tau + h)
+            T = [x + h / 6.0 * (a + 2 * b + 2 * c + d) for x, a, b, c, d in zip(T, k1, k2, k3, k4)]
+            tau += h
+            T = pin(T, tau)
+        return T
+
+    def _log(self, kind: str, name: str) -> None:
+        self.events.append((self.ctrl.time_s, kind, name))
+
+    def _log_alarms(self, before, after) -> None:
+        names = ("T1", "T2", "T3")
+        for k, (old, new) in enumerate(zip(before, after)):
+            if old != new:
+                self._log(("LL" if k % 2 == 0 else "HH") + (" raise" if new else " clear"), names[k // 2])
+
+
+    def step_FL(self, max_dt: float) -> float:
+        c = self.ctrl
+        max_dt = float(max_dt)
+        if max_dt <= 0:
+            return 0.0
+        reg = self.regime()
+        if self._locked is not None:
+            for k, (old, new) in enumerate(zip(self._locked, reg.interlocked)):
+                if old != new:
+                    self._log("interlock trip" if new else "interlock reset", f"P{k + 1}")
+        self._locked = reg.interlocked
+
+        L0 = list(c.get_levels())
+        t_ev, hits = time_to_next_event_FL(L0, reg.rates, self.thresholds())
+        dt = min(max_dt, t_ev)
+
+        # a küszöbről induló tartály riasztása már a lépés elején megszűnik
+        alarms0 = list(c.get_alarms())
+        for i, r in enumerate(reg.rates):
+            if alarms0[2 * i] and r > 1e-12 and L0[i] + r * dt > c.LL_L + 1e-6:
+                alarms0[2 * i] = False
+            if alarms0[2 * i + 1] and r < -1e-12 and L0[i] + r * dt < c.HH_L - 1e-6:
+                alarms0[2 * i + 1] = False
+        self._log_alarms(c.get_alarms(), alarms0)
+
+        L = [x + r * dt for x, r in zip(L0, reg.rates)]
+        if dt == t_ev:
+            for i, thr in hits:
+                L[i] = thr
+        L = [max(c.LL_L, min(c.HH_L, x)) for x in L]
+        T = self._mix_temps(list(c.get_temps()), L0, reg.rates, reg.q, dt)
+
+        sim = c.sim
+        tanks = (sim.t1, sim.t2, sim.t3)
+        for tank, Li, Ti in zip(tanks, L, T):
+            tank.level_l = Li
+            tank.temperature_c = Ti
+            tank.thermal_losses(dt)
+
+        for (a, b), pump, meter, qk, qm in zip(PUMP_PAIRS, (sim.p1, sim.p2), (sim.fq12, sim.fq23),
+                                                reg.q, (c.P1_MAX_LPS, c.P2_MAX_LPS)):
+            src = tanks[a] if qk >= 0 else tanks[b]
+            meter.measure(abs(qk), src.density_kgm3, dt)
+            pump.command = qk / qm if qm > 0 else 0.0
+            pump.tick_hours(dt)
+        sim.last_q12_lps, sim.last_q23_lps = reg.q
+        sim.interlocked = reg.interlocked
+        sim.interlock_dir = tuple((1 if cmd > 0 else -1) if locked else 0
+                                  for locked, cmd in zip(reg.interlocked, (c.p1_cmd, c.p2_cmd)))
+        sim.draining = c.drain_lps > 0.0 and L0[2] > _TOL_L
+        sim.t += dt
+        sim.record_FL()
+        c.state = sim.state
+
+        self._log_alarms(alarms0, c.get_alarms())
+        self.steps += 1
+        return dt
+
+    def advance_FL(self, duration_s: float, max_dt: float = math.inf) -> int:
+        remaining = float(duration_s)
+        n = 0
+        while remaining > 1e-12:
+            dt = self.step_FL(min(remaining, max_dt))
+            if dt <= 0.0:
+                break
+            remaining -= dt
+            n += 1
+        return n
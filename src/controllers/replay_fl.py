@@ -0,0 +1,170 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+from core.historian import RUN_EPS, HistorianReader_FL, chunk_sums
+from core.history import SIM_CHANNELS
+from .app_controller_fl import AppController_FL
+
+_CH = {name: i for i, name in enumerate(SIM_CHANNELS)}
+
+
+class ReplaySource_FL:
+
+    # Rögzített historian-fájl lejátszása ugyanazzal az olvasó interfésszel, mint
+    # az AppController_FL. A fájl memmap-pel nyílik; a blokkindexben bináris
+    # kereséssel ugrik, és csak a kért időt tartalmazó blokkokat csomagolja ki
+    # (kis LRU-gyorsítótárral). A számlálók (FQ összeg, üzemóra) a felvétel
+    # elejétől számítva, a blokkindexben tárolt blokkösszegek előtag-összegéből
+    # adódnak; ugráskor csak a célblokk csomagolódik ki.
+
+    SPEED_MIN = 1.0
+    SPEED_MAX = 1000.0
+    CACHE_CHUNKS = 8
+
+    def __init__(self, path: str, speed: float = 1.0, window: int = AppController_FL.HIST_MAX,
+                 capacity_l: float = AppController_FL.CAP_L, ll_pct: float = 0.0, hh_pct: float = 100.0):
+        self.reader = HistorianReader_FL(path)
+        missing = [c for c in SIM_CHANNELS if c not in self.reader.channels]
+        if missing:
+            raise ValueError(f"A felvételből hiányzó csatornák: {', '.join(missing)}")
+        if len(self.reader) == 0:
+            raise ValueError("Üres felvétel")
+        self._map = [self.reader.channels.index(c) for c in SIM_CHANNELS]
+        self.window = max(1, int(window))
+        self.capacity_l = float(capacity_l)
+        self.ll_pct = float(ll_pct)
+        self.hh_pct = float(hh_pct)
+        self.t_start, self.t_end = self.reader.time_range
+        self.speed = 1.0
+        self.set_speed(speed)
+        self._cache: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        # _acc[k]: (FQ12 L, FQ23 L, P1 s, P2 s) a k. blokk előtt
+        rd = self.reader
+        if rd.totals == ("q12", "q23"):
+            self._acc = list(np.vstack([np.zeros(4), np.cumsum(rd.sums, axis=0)]))
+        else:
+            # 1. verziós felvétel, blokkösszegek nélkül: lustán, sorban töltődik
+            self._acc = [np.zeros(4)]
+        self.seek(self.t_start)
+
+
+    def _chunk(self, k: int) -> np.ndarray:
+        block = self._cache.get(k)
+        if block is None:
+            block = self.reader.chunk(k)[self._map]
+            self._cache[k] = block
+            if len(self._cache) > self.CACHE_CHUNKS:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(k)
+        return block
+
+    def _locate(self, t: float):
+        # az utolsó t-nél nem későbbi minta: (blokk, index)
+        k = int(np.searchsorted(self.reader.t0, t, side="right")) - 1
+        k = min(max(k, 0), len(self.reader.t0) - 1)
+        i = int(np.searchsorted(self._chunk(k)[_CH["t"]], t, side="right")) - 1
+        return k, max(i, 0)
+
+    def _sums(self, k: int, n: Optional[int]) -> np.ndarray:
+        # a k. blokk első n mintájának számlálónövekménye; az előző blokk vége
+        # az indexből, az első blokk előtti lépésköz a writerrel azonosan becsülve
+        block = self._chunk(k)
+        t = block[_CH["t"]]
+        t_prev = float(self.reader.t1[k - 1]) if k > 0 else (2 * t[0] - t[1] if len(t) > 1 else t[0])
+        return chunk_sums(block[[_CH["q12"], _CH["q23"]], :n], t[:n], t_prev)
+
+    def _counters(self, k: int, i: int) -> np.ndarray:
+        while len(self._acc) <= k:
+            j = len(self._acc) - 1
+            self._acc.append(self._acc[j] + self._sums(j, None))
+        return self._acc[k] + self._sums(k, i + 1)
+
+    def _refresh(self) -> None:
+        k, i = self._locate(self.time_s)
+        row = self._chunk(k)[:, i]
+        self._row = row
+        self._counts = self._counters(k, i)
+        self._pos = (k, i)
+
+
+    def seek(self, t: float) -> None:
+        self.time_s = min(self.t_end, max(self.t_start, float(t)))
+        self._refresh()
+
+    def set_speed(self, speed: float) -> None:
+        self.speed = min(self.SPEED_MAX, max(self.SPEED_MIN, float(speed)))
+
+    @property
+    def at_end(self) -> bool:
+        return self.time_s >= self.t_end
+
+    def tick_FL(self, dt: float) -> None:
+        # dt: eltelt valós idő [s]; a lejátszási idő speed-szeresen halad
+        self.seek(self.time_s + float(dt) * self.speed)
+
+    def tick(self, dt: float): self.tick_FL(dt)
+
+    # a lejátszás csak olvasható; a kezelői parancsokat figyelmen kívül hagyja
+    def set_p1(self, cmd: float): pass
+    def set_p2(self, cmd: float): pass
+    def set_drain(self, q_lps: float): pass
+
+
+    def _get(self, *names):
+        return tuple(float(self._row[_CH[n]]) for n in names)
+
+    def get_levels(self): return self._get("L1", "L2", "L3")
+    def get_temps(self): return self._get("T1", "T2", "T3")
+    def get_rhos(self): return self._get("rho1", "rho2", "rho3")
+
+    def get_flows(self):
+        q12, q23 = self._get("q12", "q23")
+        r1, r2, r3 = self.get_rhos()
+        kg12 = abs(q12) * 1e-3 * (r1 if q12 >= 0 else r2)
+        kg23 = abs(q23) * 1e-3 * (r2 if q23 >= 0 else r3)
+        return q12, q23, kg12, kg23
+
+    def get_totals(self): return float(self._counts[0]), float(self._counts[1])
+
+    def get_pumps(self):
+        q12, q23 = self._get("q12", "q23")
+        return abs(q12) > RUN_EPS, abs(q23) > RUN_EPS, float(self._counts[2]) / 3600.0, float(self._counts[3]) / 3600.0
+
+    def get_pump_cmds(self):
+        return tuple(0.0 if abs(q) <= RUN_EPS else (1.0 if q > 0 else -1.0) for q in self._get("q12", "q23"))
+
+    def get_alarms(self):
+        out = []
+        for L in self.get_levels():
+            pct = 100.0 * L / self.capacity_l if self.capacity_l > 0 else 0.0
+            out += [pct <= self.ll_pct, pct >= self.hh_pct]
+        return tuple(out)
+
+    def forecast_FL(self):
+        # felvételnél nincs előrejelzés: a jövő már ismert
+        return None
+
+    def history_columns(self) -> Dict[str, np.ndarray]:
+        # az aktuális időig tartó utolsó `window` minta
+        k, i = self._pos
+        parts = [self._chunk(k)[:, :i + 1]]
+        n = i + 1
+        while n < self.window and k > 0:
+            k -= 1
+            parts.insert(0, self._chunk(k))
+            n += parts[0].shape[1]
+        block = np.concatenate(parts, axis=1)[:, -self.window:] if len(parts) > 1 else parts[0][:, -self.window:]
+        return {name: block[j] for j, name in enumerate(SIM_CHANNELS)}
+
+    def snapshot(self): return self
+
+    def history(self):
+        cols = self.history_columns()
+        return list(zip(*(c.tolist() for c in cols.values())))
+
+    def close(self) -> None:
+        self._cache.clear()
+        self.reader.close()
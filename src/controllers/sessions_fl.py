@@ -0,0 +1,229 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .app_controller_fl import AppController_FL
+
+
+class Session_FL:
+
+    # Egy független üzem a kezelőben. A parancsok sorba kerülnek, és (mint a
+    # SimWorker_FL-nél) a session következő tickjének elején érvényesülnek.
+
+    __slots__ = ("sid", "ctrl", "dt_s", "speed", "paused", "ticks", "lag_s", "max_lag_s", "_group", "_cmds")
+
+    def __init__(self, sid: int, ctrl: AppController_FL, dt_s: float, speed: float):
+        self.sid = sid
+        self.ctrl = ctrl
+        self.dt_s = float(dt_s)
+        self.speed = float(speed)
+        self.paused = False
+        self.ticks = 0
+        self.lag_s = 0.0         # az utolsó tick befejezése mennyivel késett az ütemezett időhöz képest
+        self.max_lag_s = 0.0
+        self._group = None
+        self._cmds = queue.SimpleQueue()
+
+    @property
+    def key(self) -> Tuple[float, float]:
+        return (self.dt_s, self.speed)
+
+    @property
+    def period_s(self) -> float:
+        # egy tick valós időben
+        return self.dt_s / self.speed
+
+    def set_p1(self, cmd: float): self._cmds.put(("set_p1", float(cmd)))
+    def set_p2(self, cmd: float): self._cmds.put(("set_p2", float(cmd)))
+    def set_drain(self, q_lps: float): self._cmds.put(("set_drain", float(q_lps)))
+
+    def _drain_cmds(self) -> None:
+        while True:
+            try:
+                name, value = self._cmds.get_nowait()
+            except queue.Empty:
+                return
+            getattr(self.ctrl, name)(value)
+
+
+class _Group:
+
+    # Azonos (dt, sebesség) párú sessionök: egy közös ütemezési bejegyzés, együtt lépnek.
+    __slots__ = ("key", "dt_s", "period_s", "due", "members", "alive")
+
+    def __init__(self, key: Tuple[float, float], due: float):
+        self.key = key
+        self.dt_s = key[0]
+        self.period_s = key[0] / key[1]
+        self.due = due
+        self.members: Dict[int, Session_FL] = {}   # beszúrási sorrend, O(1) ki/be
+        self.alive = True
+
+
+class SessionManager_FL:
+
+    # Sok AppController_FL egyetlen prioritási sorral: a sorban csoportonként
+    # (azonos dt és sebesség) egy bejegyzés van, nem sessionönként, így a
+    # létrehozás, szüneteltetés és megszüntetés csak a csoport szótárát
+    # érinti (O(1)); új csoport egy heap-beszúrás. A kiürült csoport bejegyzése
+    # lustán, a sorból kivételkor törlődik.
+    #
+    # Ha az ütemező MAX_BURST periódusnál többel lemarad, a csoport ütemét a
+    # jelenhez igazítja (a szimulált idő ilyenkor lassabban halad, a késés a
+    # lag_s értékekben látszik).
+
+    MAX_BURST = 4
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.sessions: Dict[int, Session_FL] = {}
+        self._groups: Dict[Tuple[float, float], _Group] = {}
+        self._heap: List[Tuple[float, int, _Group]] = []
+        self._order = itertools.count()
+        self._ids = itertools.count(1)
+        self._thread = None
+        self._quit = threading.Event()
+        self._wake = threading.Event()
+        self._lock = threading.RLock()   # háttérszálas módban a kezelő hívások és a léptetés között
+        self.ticks = 0
+
+
+    def _join(self, s: Session_FL) -> None:
+        g = self._groups.get(s.key)
+        if g is None:
+            g = self._groups[s.key] = _Group(s.key, self.clock() + s.period_s)
+            heapq.heappush(self._heap, (g.due, next(self._order), g))
+            self._wake.set()
+        g.members[s.sid] = s
+        s._group = g
+
+    def _leave(self, s: Session_FL) -> None:
+        g = s._group
+        if g is None:
+            return
+        del g.members[s.sid]
+        s._group = None
+        if not g.members:
+            g.alive = False
+            del self._groups[g.key]
+
+    def create(self, ctrl: Optional[AppController_FL] = None, dt_s: float = 1.0, speed: float = 1.0,
+               paused: bool = False) -> Session_FL:
+        if dt_s <= 0 or speed <= 0:
+            raise ValueError("A lépésköznek és a sebességnek pozitívnak kell lennie")
+        # alapértelmezésben trendpiramis nélkül: sok üzemnél a teljes előzmény túl sok memória
+        s = Session_FL(next(self._ids), ctrl if ctrl is not None else AppController_FL(trend=False), dt_s, speed)
+        with self._lock:
+            self.sessions[s.sid] = s
+            s.paused = paused
+            if not paused:
+                self._join(s)
+        return s
+
+    def pause(self, sid: int) -> None:
+        with self._lock:
+            s = self.sessions[sid]
+            if not s.paused:
+                s.paused = True
+                self._leave(s)
+
+    def resume(self, sid: int) -> None:
+        with self._lock:
+            s = self.sessions[sid]
+            if s.paused:
+                s.paused = False
+                self._join(s)
+
+    def destroy(self, sid: int) -> Session_FL:
+        with self._lock:
+            s = self.sessions.pop(sid)
+            self._leave(s)
+        return s
+
+    def set_rate(self, sid: int, dt_s: Optional[float] = None, speed: Optional[float] = None) -> None:
+        if (dt_s is not None and dt_s <= 0) or (speed is not None and speed <= 0):
+            raise ValueError("A lépésköznek és a sebességnek pozitívnak kell lennie")
+        with self._lock:
+            s = self.sessions[sid]
+            self._leave(s)
+            if dt_s is not None:
+                s.dt_s = float(dt_s)
+            if speed is not None:
+                s.speed = float(speed)
+            if not s.paused:
+                self._join(s)
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+
+    def next_due(self) -> Optional[float]:
+        with self._lock:
+            while self._heap and not self._heap[0][2].alive:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def run_pending(self, now: Optional[float] = None) -> int:
+        # minden esedékes csoport léptetése; visszaadja a végrehajtott tickek számát
+        now = self.clock() if now is None else now
+        with self._lock:
+            n = self._run_due(now)
+        self.ticks += n
+        return n
+
+    def _run_due(self, now: float) -> int:
+        n = 0
+        while self._heap and self._heap[0][0] <= now:
+            due, _, g = heapq.heappop(self._heap)
+            if not g.alive:
+                continue
+            for s in list(g.members.values()):
+                s._drain_cmds()
+                s.ctrl.tick_FL(g.dt_s)
+                s.ticks += 1
+                s.lag_s = max(0.0, self.clock() - due)
+                if s.lag_s > s.max_lag_s:
+                    s.max_lag_s = s.lag_s
+            n += len(g.members)
+            g.due = due + g.period_s
+            if now - g.due > self.MAX_BURST * g.period_s:
+                g.due = now + g.period_s
+            if g.members:
+                heapq.heappush(self._heap, (g.due, next(self._order), g))
+            else:
+                g.alive = False
+                self._groups.pop(g.key, None)
+        return n
+
+    def lag_report(self) -> Dict[int, Tuple[float, float]]:
+        # sid → (utolsó késés, legnagyobb késés) [s]
+        with self._lock:
+            return {sid: (s.lag_s, s.max_lag_s) for sid, s in self.sessions.items()}
+
+
+    def _loop(self) -> None:
+        while not self._quit.is_set():
+            self._wake.clear()
+            due = self.next_due()
+            wait = 0.1 if due is None else min(0.1, due - self.clock())
+            if wait > 0:
+                self._wake.wait(wait)
+            if not self._quit.is_set():
+                self.run_pending()
+
+    def start(self) -> None:
+        # opcionális háttérszál; Tk alól elég az after() ciklusból run_pending()-et hívni
+        if self._thread is None:
+            self._quit.clear()
+            self._thread = threading.Thread(target=self._loop, name="SessionManager_FL", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        self._quit.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
@@ -0,0 +1,232 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .app_controller_fl import AppController_FL
+
+# Soronként egy JSON üzenet (NDJSON).
+#   szerver → kliens  {"type": "full",  "seq": n, "state": {...}}           első keret
+#                     {"type": "delta", "seq": n, "changes": {...}, "coalesced": k}
+#                     {"type": "ack",   "seq": n, "cmd": ..., "value": ...} alkalmazott parancs
+#                     {"type": "error", "msg": ...}
+#   kliens → szerver  {"cmd": "set_p1" | "set_p2" | "set_drain", "value": x}
+
+COMMANDS = ("set_p1", "set_p2", "set_drain")
+
+
+def telemetry_state(ctrl) -> Dict[str, object]:
+    # lapos mező → érték szótár; a lebegőpontos értékek kerekítve, hogy a zaj ne keltsen deltát
+    l1, l2, l3 = ctrl.get_levels()
+    T1, T2, T3 = ctrl.get_temps()
+    r1, r2, r3 = ctrl.get_rhos()
+    q12, q23, kg12, kg23 = ctrl.get_flows()
+    tot12, tot23 = ctrl.get_totals()
+    run1, run2, h1, h2 = ctrl.get_pumps()
+    ll1, hh1, ll2, hh2, ll3, hh3 = ctrl.get_alarms()
+    st = {
+        "t": ctrl.time_s,
+        "L1": l1, "L2": l2, "L3": l3, "T1": T1, "T2": T2, "T3": T3,
+        "rho1": r1, "rho2": r2, "rho3": r3,
+        "q12": q12, "q23": q23, "kg12": kg12, "kg23": kg23, "tot12": tot12, "tot23": tot23,
+        "P1_run": run1, "P2_run": run2, "P1_h": h1, "P2_h": h2,
+        "LL1": ll1, "HH1": hh1, "LL2": ll2, "HH2": hh2, "LL3": ll3, "HH3": hh3,
+    }
+    return {k: (round(float(v), 6) if isinstance(v, (float, int)) and not isinstance(v, bool) else bool(v))
+            for k, v in st.items()}
+
+
+class _Client:
+
+    __slots__ = ("writer", "task", "sent", "coalesced", "dropped", "frames")
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.task = asyncio.current_task()
+        self.sent: Optional[Dict[str, object]] = None   # az utoljára elküldött (a kliens által ismert) állapot
+        self.coalesced = 0
+        self.dropped = 0
+        self.frames = 0
+
+
+class TelemetryServer_FL:
+
+    # A szimulációt saját asyncio ciklusa lépteti (nincs külön zár): minden tick
+    # elején alkalmazza az addig beérkezett parancsokat, a végén kiküldi a
+    # változásokat. A lassú kliensnek nem ír, amíg a kimenő puffere a HIGH_WATER
+    # fölött van; a kimaradt keretek összevonódnak, mert a delta mindig a kliens
+    # által utoljára látott állapothoz képest készül.
+
+    HIGH_WATER = 64 * 1024
+
+    def __init__(self, ctrl: Optional[AppController_FL] = None, host: str = "127.0.0.1", port: int = 0,
+                 dt_s: float = 1.0, speed: float = 1.0):
+        self.ctrl = ctrl if ctrl is not None else AppController_FL()
+        self.host = host
+        self.port = int(port)
+        self.dt_s = float(dt_s)
+        self.speed = float(speed)
+        self.seq = 0
+        self.clients: List[_Client] = []
+        self._cmds: List[Tuple[_Client, str, float]] = []
+        self._server = None
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._stop = None
+
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client = _Client(writer)
+        self.clients.append(client)
+        self._send(client, {"type": "full", "seq": self.seq, "state": telemetry_state(self.ctrl)})
+        client.sent = telemetry_state(self.ctrl)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    msg = json.loads(line)
+                    cmd = msg["cmd"]
+                    if cmd not in COMMANDS:
+                        raise ValueError(f"ismeretlen parancs: {cmd}")
+                    self._cmds.append((client, cmd, float(msg["value"])))
+                except (ValueError, KeyError, TypeError) as e:
+                    self._send(client, {"type": "error", "msg": f"Hibás üzenet: {e}"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except (ValueError, asyncio.LimitOverrunError):
+            # a readline() a puffer-korlátnál hosszabb sornál; a kliens lekapcsolódik
+            self._send(client, {"type": "error", "msg": "Hibás üzenet: túl hosszú sor"})
+        finally:
+            self.clients.remove(client)
+            writer.close()
+
+    def _send(self, client: _Client, msg: dict) -> bool:
+        w = client.writer
+        if w.is_closing():
+            return False
+        w.write((json.dumps(msg, separators=(",", ":")) + "\n").encode("utf-8"))
+        client.frames += 1
+        return True
+
+    def _apply_cmds(self) -> None:
+        # a tick határán, egy kötegben
+        cmds, self._cmds = self._cmds, []
+        for client, cmd, value in cmds:
+            getattr(self.ctrl, cmd)(value)
+            self._send(client, {"type": "ack", "seq": self.seq, "cmd": cmd, "value": value})
+
+    def _broadcast(self) -> None:
+        state = telemetry_state(self.ctrl)
+        for client in self.clients:
+            if client.writer.transport.get_write_buffer_size() > self.HIGH_WATER:
+                client.coalesced += 1
+                client.dropped += 1
+                continue
+            changes = {k: v for k, v in state.items() if client.sent.get(k) != v}
+            msg = {"type": "delta", "seq": self.seq, "changes": changes}
+            if client.coalesced:
+                msg["coalesced"] = client.coalesced
+                client.coalesced = 0
+            if self._send(client, msg):
+                client.sent = state
+
+    def tick_FL(self) -> None:
+        self._apply_cmds()
+        self.ctrl.tick_FL(self.dt_s)
+        self.seq += 1
+        self._broadcast()
+
+
+    async def serve(self, until_s: Optional[float] = None) -> None:
+        # until_s: szimulált időpont, amelynél a szerver leáll (None: close()-ig fut)
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        t0 = time.perf_counter()
+        k0 = self.seq
+        try:
+            while not self._stop.is_set():
+                if until_s is not None and self.ctrl.time_s >= until_s - 1e-9:
+                    break
+                self.tick_FL()
+                if self.speed > 0:
+                    ahead = t0 + (self.seq - k0) * self.dt_s / self.speed - time.perf_counter()
+                    try:
+                        await asyncio.wait_for(self._stop.wait(), timeout=max(0.0, ahead))
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    await asyncio.sleep(0)
+        finally:
+            # a kliensek EOF-ot kapnak, a kezelőik rendben kilépnek
+            self._server.close()
+            clients = list(self.clients)
+            for client in clients:
+                client.writer.close()
+            await asyncio.gather(*(c.task for c in clients if c.task is not None), return_exceptions=True)
+            await self._server.wait_closed()
+
+    def start(self) -> int:
+        # háttérszálon, saját eseményciklussal; visszaadja a portot
+        if self._thread is None:
+            self._thread = threading.Thread(target=lambda: asyncio.run(self.serve()),
+                                            name="TelemetryServer_FL", daemon=True)
+            self._thread.start()
+            self._ready.wait(5.0)
+        return self.port
+
+    def close(self) -> None:
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+
+class TelemetryClient_FL:
+
+    # Egyszerű, blokkoló helyi kliens tesztpadokhoz: a delta kereteket a
+    # helyi állapotba fésüli.
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, timeout: float = 5.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self._rd = self.sock.makefile("rb")
+        self.state: Dict[str, object] = {}
+        self.seq = -1
+        self.coalesced = 0
+        self.acks: List[dict] = []
+
+    def read_frame(self) -> dict:
+        line = self._rd.readline()
+        if not line:
+            raise ConnectionError("A szerver bontotta a kapcsolatot")
+        msg = json.loads(line)
+        kind = msg.get("type")
+        if kind == "full":
+            self.state = dict(msg["state"])
+            self.seq = msg["seq"]
+        elif kind == "delta":
+            self.state.update(msg["changes"])
+            self.seq = msg["seq"]
+            self.coalesced += msg.get("coalesced", 0)
+        elif kind == "ack":
+            self.acks.append(msg)
+        return msg
+
+    def send(self, cmd: str, value: float) -> None:
+        self.sock.sendall((json.dumps({"cmd": cmd, "value": float(value)}) + "\n").encode("utf-8"))
+
+    def set_p1(self, cmd: float): self.send("set_p1", cmd)
+    def set_p2(self, cmd: float): self.send("set_p2", cmd)
+    def set_drain(self, q_lps: float): self.send("set_drain", q_lps)
+
+    def close(self) -> None:
+        self._rd.close()
+        self.sock.close()
@@ -0,0 +1,182 @@
+import queue
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+
+from core.forecast import Forecast_FL
+from core.pyramid import TrendPyramid_FL
+from .app_controller_fl import AppController_FL
+
+
+class Snapshot_FL(NamedTuple):
+
+    seq: int
+    time_s: float
+    levels: tuple
+    temps: tuple
+    rhos: tuple
+    flows: tuple
+    totals: tuple
+    pumps: tuple
+    alarms: tuple
+    pump_cmds: tuple
+    hist: Dict[str, np.ndarray]
+    forecast: Optional[Forecast_FL] = None
+    # a trendpiramis és szintjeinek hossza a publikáláskor; a lekérdezés ezekre korlátozódik
+    pyramid: Optional[TrendPyramid_FL] = None
+    trend_lengths: Optional[tuple] = None
+
+    # ugyanaz az olvasó interfész, mint az AppController_FL-é
+    def get_levels(self): return self.levels
+    def get_temps(self): return self.temps
+    def get_rhos(self): return self.rhos
+    def get_flows(self): return self.flows
+    def get_totals(self): return self.totals
+    def get_pumps(self): return self.pumps
+    def get_alarms(self): return self.alarms
+    def get_pump_cmds(self): return self.pump_cmds
+    def history_columns(self): return self.hist
+    def history(self): return list(zip(*(c.tolist() for c in self.hist.values())))
+    def forecast_FL(self): return self.forecast
+    def snapshot(self): return self
+
+    def trend_FL(self, t0: float, t1: float, width_px: int):
+        if self.pyramid is None:
+            return None
+        return self.pyramid.query(t0, t1, width_px, lengths=self.trend_lengths)
+
+
+def take_snapshot(ctrl: AppController_FL, seq: int) -> Snapshot_FL:
+    hist = {}
+    for name, col in ctrl.history_columns().items():
+        col = col.copy()
+        col.flags.writeable = False
+        hist[name] = col
+    pyr = getattr(ctrl, "pyramid", None)
+    return Snapshot_FL(
+        seq, ctrl.time_s, ctrl.get_levels(), ctrl.get_temps(), ctrl.get_rhos(), ctrl.get_flows(),
+        ctrl.get_totals(), ctrl.get_pumps(), ctrl.get_alarms(), ctrl.get_pump_cmds(), hist,
+        ctrl.forecast_FL(), pyr, pyr.lengths() if pyr is not None else None,
+    )
+
+
+class SimWorker_FL:
+
+    # A vezérlőt saját szálon lépteti. Minden tick után megváltoztathatatlan
+    # pillanatképet ír a hátsó pufferbe, majd átbillenti az olvasási indexet;
+    # a UI zár nélkül olvassa az elsőt. A parancsok sorban érkeznek, és a
+    # következő tick elején kerülnek alkalmazásra. Egy képkockát a UI egyetlen
+    # snapshot()-ból rajzol, így az értékek nem keverednek két tick között.
+    # Ha a léptetés kivételt dob, a szál megáll, a kivétel az error-ban marad.
+
+    def __init__(self, ctrl: Optional[AppController_FL] = None, dt_s: float = 1.0, speed: float = 1.0):
+        self.ctrl = ctrl if ctrl is not None else AppController_FL()
+        self.dt_s = float(dt_s)
+        self.speed = float(speed)
+        self._cmds = queue.SimpleQueue()
+        self._slots = [None, None]
+        self._front = 0
+        self._seq = 0
+        self._run = threading.Event()
+        self._quit = threading.Event()
+        self._thread = None
+        self.ticks = 0
+        self.lag_s = 0.0
+        self.error: Optional[BaseException] = None
+        self._publish()
+
+
+    def _publish(self) -> None:
+        back = 1 - self._front
+        self._seq += 1
+        self._slots[back] = take_snapshot(self.ctrl, self._seq)
+        self._front = back
+
+    def latest(self) -> Snapshot_FL:
+        return self._slots[self._front]
+
+    def _drain_cmds(self) -> bool:
+        applied = False
+        while True:
+            try:
+                name, value = self._cmds.get_nowait()
+            except queue.Empty:
+                return applied
+            getattr(self.ctrl, name)(value)
+            applied = True
+
+    def _loop(self) -> None:
+        while not self._quit.is_set():
+            if not self._run.wait(0.1):
+                if self._drain_cmds():
+                    self._publish()
+                continue
+            t0 = time.perf_counter()
+            k0 = self.ticks
+            while self._run.is_set() and not self._quit.is_set():
+                try:
+                    self._drain_cmds()
+                    self.ctrl.tick_FL(self.dt_s)
+                except Exception as e:
+                    self.error = e
+                    self._run.clear()
+                    break
+                self.ticks += 1
+                self._publish()
+                if self.speed > 0:
+                    due = t0 + (self.ticks - k0) * self.dt_s / self.speed
+                    ahead = due - time.perf_counter()
+                    self.lag_s = max(0.0, -ahead)
+                    if ahead > 0:
+                        self._quit.wait(ahead)
+
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="SimWorker_FL", daemon=True)
+            self._thread.start()
+
+    def resume(self) -> None:
+        if self.error is not None:
+            return
+        self.start()
+        self._run.set()
+
+    def pause(self) -> None:
+        self._run.clear()
+
+    def close(self) -> None:
+        self._quit.set()
+        self._run.clear()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._run.is_set()
+
+
+    def set_p1(self, cmd: float): self._cmds.put(("set_p1", float(cmd)))
+    def set_p2(self, cmd: float): self._cmds.put(("set_p2", float(cmd)))
+    def set_drain(self, q_lps: float): self._cmds.put(("set_drain", float(q_lps)))
+
+    def snapshot(self) -> Snapshot_FL: return self.latest()
+    def get_levels(self): return self.latest().levels
+    def get_temps(self): return self.latest().temps
+    def get_rhos(self): return self.latest().rhos
+    def get_flows(self): return self.latest().flows
+    def get_totals(self): return self.latest().totals
+    def get_pumps(self): return self.latest().pumps
+    def get_alarms(self): return self.latest().alarms
+    def get_pump_cmds(self): return self.latest().pump_cmds
+    def history_columns(self): return self.latest().hist
+    def history(self): return self.latest().history()
+    def forecast_FL(self): return self.latest().forecast
+    # a piramis a publikáláskor rögzített szinthosszakig olvasható zár nélkül a UI szálból
+    def trend_FL(self, t0, t1, width_px): return self.latest().trend_FL(t0, t1, width_px)
+    time_s = property(lambda self: self.latest().time_s)
+    # az eseménynapló (journal.since) zár nélkül olvasható; feliratkozó itt a munkaszálon futna
+    events = property(lambda self: self.ctrl.events)
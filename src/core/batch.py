@@ -0,0 +1,243 @@
+from typing import Optional, Sequence
+
+import numpy as np
+
+from .tank import Tank, thermal_step_arr
+from .properties import rho_water_arr
+from .simulator import Simulator_FL, CAP_L
+
+# oszlopindexek: tartályok (T1, T2, T3), szivattyúk/mérők (P1/FQ12, P2/FQ23)
+_PAIRS = ((0, 1), (1, 2))
+
+_EPS = Tank._eps
+_T_MIN = Tank._t_min
+_T_MAX = Tank._t_max
+
+
+def transfer_kernel(q_abs, L_src, L_dst, T_src, T_dst, cap_dst, dt_s, lim_dst=None):
+    # Simulator_FL._transfer_FL + Tank.remove/Tank.add, elemenként
+    if lim_dst is None:
+        lim_dst = cap_dst
+    active = (q_abs > 1e-12) & (L_src > 0) & (L_dst < lim_dst)
+    div = max(1.0, dt_s)
+    max_out = L_src / div
+    max_in = np.maximum(0.0, lim_dst - L_dst) / div
+    q = np.where(active, np.minimum(q_abs, np.minimum(max_out, max_in)), 0.0)
+
+    moved = np.minimum(L_src, np.maximum(0.0, q * dt_s))
+    L_src = L_src - moved
+    v_new = np.minimum(cap_dst, L_dst + moved)
+    dv = np.maximum(0.0, v_new - L_dst)
+    ok = dv > _EPS
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        mixed = np.where(L_dst <= _EPS, T_src, (L_dst * T_dst + dv * T_src) / (L_dst + dv))
+    T_dst = np.where(ok, np.clip(mixed, _T_MIN, _T_MAX), T_dst)
+    L_dst = np.where(ok, v_new, L_dst)
+    return q, L_src, L_dst, T_dst
+
+
+def meter_kernel(q_abs, rho, tau_s, y_lps, dt_s):
+    # FlowMeter.measure szűrő része; visszaad: (szűrt L/s, kg/s)
+    q_lps = np.maximum(0.0, q_abs)
+    alpha = dt_s / (tau_s + dt_s)
+    q_filt = np.where(tau_s > 0.0, y_lps + alpha * (q_lps - y_lps), q_lps)
+    return q_filt, np.maximum(0.0, rho) * (q_filt * 1e-3)
+
+
+class BatchSimulator_FL:
+
+
+    def __init__(self, n: int, template: Optional[Simulator_FL] = None):
+        self.n = int(n)
+        if template is None:
+            template = Simulator_FL()
+        self._load([template] * self.n)
+
+    @classmethod
+    def from_simulators(cls, sims: Sequence[Simulator_FL]) -> "BatchSimulator_FL":
+        if len(sims) == 0:
+            raise ValueError("Legalább egy szimulátor szükséges")
+        # a köteg egyetlen közös idővel lép, eltérő idejű szimulátorok nem vonhatók össze
+        if any(float(s.t) != float(sims[0].t) for s in sims):
+            raise ValueError("A szimulátorok ideje eltér: " + ", ".join(f"{float(s.t):g}" for s in sims))
+        obj = cls.__new__(cls)
+        obj.n = len(sims)
+        obj._load(sims)
+        return obj
+
+    def _load(self, sims: Sequence[Simulator_FL]) -> None:
+        tanks = [(s.t1, s.t2, s.t3) for s in sims]
+        pumps = [(s.p1, s.p2) for s in sims]
+        meters = [(s.fq12, s.fq23) for s in sims]
+
+        def col(objs, attr):
+            return np.array([[float(getattr(o, attr)) for o in row] for row in objs], dtype=float).reshape(self.n, -1)
+
+        self.capacity_l = col(tanks, "capacity_l")
+        self.level_l = col(tanks, "level_l")
+        self.temperature_c = col(tanks, "temperature_c")
+        self.ua_kW_per_K = col(tanks, "ua_kW_per_K")
+        self.ambient_c = col(tanks, "ambient_c")
+        self.ll_pct = col(tanks, "ll_pct")
+        self.hh_pct = col(tanks, "hh_pct")
+
+        self.command = col(pumps, "command")
+        self.max_flow_lps = col(pumps, "max_flow_lps")
+        self.hours = col(pumps, "hours")
+        self.run_lamp = col(pumps, "run_lamp").astype(bool)
+
+        self.tau_s = col(meters, "tau_s")
+        self.y_lps = col(meters, "_y_lps")
+        self.last_lps = col(meters, "last_lps")
+        self.last_kgps = col(meters, "last_kgps")
+        self.total_l = col(meters, "total_l")
+        self.total_kg = col(meters, "total_kg")
+        self.min_lps = col(meters, "min_lps")
+        self.max_lps = col(meters, "max_lps")
+
+        self.drain_lps = np.array([float(s.drain_lps) for s in sims], dtype=float)
+        self.hyst_l = np.array([float(s.hyst_l) for s in sims], dtype=float)
+        self.last_q_lps = np.array([[s.last_q12_lps, s.last_q23_lps] for s in sims], dtype=float).reshape(self.n, 2)
+        self.t = float(sims[0].t) if sims else 0.0
+
+
+    def _interlock_FL(self, k: int) -> np.ndarray:
+        a, b = _PAIRS[k]
+        q = np.clip(self.command[:, k], -1.0, 1.0) * self.max_flow_lps[:, k]
+        La = self.level_l[:, a]
+        Lb = self.level_l[:, b]
+        hy = self.hyst_l
+        trip = ((q > 0) & ((La <= hy) | (Lb >= CAP_L))) | ((q < 0) & ((Lb <= hy) | (La >= CAP_L)))
+        self.command[trip, k] = 0.0
+        q[trip] = 0.0
+        return q
+
+    def _transfer_FL(self, k: int, q_cmd: np.ndarray, dt_s: float) -> np.ndarray:
+        a, b = _PAIRS[k]
+        rev = q_cmd < -1e-12
+
+        La, Lb = self.level_l[:, a], self.level_l[:, b]
+        Ta, Tb = self.temperature_c[:, a], self.temperature_c[:, b]
+        L_src = np.where(rev, Lb, La)
+        L_dst = np.where(rev, La, Lb)
+        T_src = np.where(rev, Tb, Ta)
+        T_dst = np.where(rev, Ta, Tb)
+        cap_dst = np.where(rev, self.capacity_l[:, a], self.capacity_l[:, b])
+
+        q, L_src, L_dst, T_dst = transfer_kernel(np.abs(q_cmd), L_src, L_dst, T_src, T_dst, cap_dst, dt_s, CAP_L)
+
+        self.level_l[:, a] = np.where(rev, L_dst, L_src)
+        self.level_l[:, b] = np.where(rev, L_src, L_dst)
+        self.temperature_c[:, a] = np.where(rev, T_dst, Ta)
+        self.temperature_c[:, b] = np.where(rev, Tb, T_dst)
+        return np.where(rev, -q, q)
+
+    def _measure_FL(self, k: int, q: np.ndarray, dt_s: float) -> None:
+        if dt_s <= 0.0:
+            return
+        a, b = _PAIRS[k]
+        T_src = np.where(q >= 0, self.temperature_c[:, a], self.temperature_c[:, b])
+        q_filt, kgps = meter_kernel(np.abs(q), rho_water_arr(T_src), self.tau_s[:, k], self.y_lps[:, k], dt_s)
+        self.y_lps[:, k] = q_filt
+        self.last_lps[:, k] = q_filt
+        self.last_kgps[:, k] = kgps
+        self.total_l[:, k] += self.last_lps[:, k] * dt_s
+        self.total_kg[:, k] += self.last_kgps[:, k] * dt_s
+        np.minimum(self.min_lps[:, k], q_filt, out=self.min_lps[:, k])
+        np.maximum(self.max_lps[:, k], q_filt, out=self.max_lps[:, k])
+
+    def _tick_hours_FL(self, k: int, dt_s: float) -> None:
+        running = np.abs(np.clip(self.command[:, k], -1.0, 1.0)) * self.max_flow_lps[:, k] > 1e-6
+        self.run_lamp[:, k] = running
+        self.hours[running, k] += dt_s / 3600.0
+
+    def step_FL(self, dt_s: float = 1.0) -> None:
+        dt_s = float(dt_s)
+        for k in range(len(_PAIRS)):
+            q_cmd = self._interlock_FL(k)
+            q = self._transfer_FL(k, q_cmd, dt_s)
+            self.last_q_lps[:, k] = q
+            self._measure_FL(k, q, dt_s)
+            self._tick_hours_FL(k, dt_s)
+
+        L3 = self.level_l[:, 2]
+        drain = np.minimum(self.drain_lps * dt_s, L3)
+        self.level_l[:, 2] = L3 - np.minimum(L3, np.maximum(0.0, drain))
+
+        self.temperature_c = thermal_step_arr(self.temperature_c, self.level_l, self.ua_kW_per_K, self.ambient_c, dt_s)
+        self.t += dt_s
+
+    def step(self, dt_s: float = 1.0) -> None:
+        self.step_FL(dt_s)
+
+    def run_FL(self, n_steps: int, dt_s: float = 1.0) -> None:
+        for _ in range(int(n_steps)):
+            self.step_FL(dt_s)
+
+
+    @property
+    def density_kgm3(self) -> np.ndarray:
+        return rho_water_arr(self.temperature_c)
+
+    @property
+    def alarm_ll(self) -> np.ndarray:
+        return 100.0 * self.level_l / self.capacity_l <= self.ll_pct
+
+    @property
+    def alarm_hh(self) -> np.ndarray:
+        return 100.0 * self.level_l / self.capacity_l >= self.hh_pct
+
+
+    def simulator_FL(self, i: int) -> Simulator_FL:
+        sim = Simulator_FL(hyst_l=float(self.hyst_l[i]))
+        for j, tank in enumerate((sim.t1, sim.t2, sim.t3)):
+            tank.capacity_l = float(self.capacity_l[i, j])
+            tank.level_l = float(self.level_l[i, j])
+            tank.temperature_c = float(self.temperature_c[i, j])
+            tank.ua_kW_per_K = float(self.ua_kW_per_K[i, j])
+            tank.ambient_c = float(self.ambient_c[i, j])
+            tank.set_alarms(self.ll_pct[i, j], self.hh_pct[i, j])
+        for k, (pump, meter) in enumerate(((sim.p1, sim.fq12), (sim.p2, sim.fq23))):
+            pump.command = float(self.command[i, k])
+            pump.max_flow_lps = float(self.max_flow_lps[i, k])
+            pump.hours = float(self.hours[i, k])
+            pump.run_lamp = bool(self.run_lamp[i, k])
+            meter.tau_s = float(self.tau_s[i, k])
+            meter._y_lps = float(self.y_lps[i, k])
+            meter.last_lps = float(self.last_lps[i, k])
+            meter.last_kgps = float(self.last_kgps[i, k])
+            meter.total_l = float(self.total_l[i, k])
+            meter.total_kg = float(self.total_kg[i, k])
+            meter.min_lps = float(self.min_lps[i, k])
+            meter.max_lps = float(self.max_lps[i, k])
+        sim.drain_lps = float(self.drain_lps[i])
+        sim.last_q12_lps = float(self.last_q_lps[i, 0])
+        sim.last_q23_lps = float(self.last_q_lps[i, 1])
+        sim.t = self.t
+        sim.refresh_state_FL()
+        return sim
+
+    def compare_FL(self, i: int, sim: Simulator_FL) -> float:
+        ref = self.simulator_FL(i)
+        pairs = [
+            (ref.t1.level_l, sim.t1.level_l), (ref.t2.level_l, sim.t2.level_l), (ref.t3.level_l, sim.t3.level_l),
+            (ref.t1.temperature_c, sim.t1.temperature_c), (ref.t2.temperature_c, sim.t2.temperature_c),
+            (ref.t3.temperature_c, sim.t3.temperature_c),
+            (ref.p1.command, sim.p1.command), (ref.p2.command, sim.p2.command),
+            (ref.p1.hours, sim.p1.hours), (ref.p2.hours, sim.p2.hours),
+            (ref.fq12.total_l, sim.fq12.total_l), (ref.fq23.total_l, sim.fq23.total_l),
+            (ref.fq12.total_kg, sim.fq12.total_kg), (ref.fq23.total_kg, sim.fq23.total_kg),
+            (ref.last_q12_lps, sim.last_q12_lps), (ref.last_q23_lps, sim.last_q23_lps),
+            (ref.t, sim.t),
+        ]
+        return max(abs(a - b) for a, b in pairs)
+
+    def verify_FL(self, i: int, n_steps: int, dt_s: float = 1.0, tol: float = 1e-9) -> bool:
+        sim = self.simulator_FL(i)
+        probe = BatchSimulator_FL.from_simulators([self.simulator_FL(i)])
+        for _ in range(int(n_steps)):
+            sim.step_FL(dt_s)
+            probe.step_FL(dt_s)
+            if probe.compare_FL(0, sim) > tol:
+                return False
+        return True
@@ -0,0 +1,137 @@
+import json
+import mmap
+import struct
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .history import HistoryStore
+from .hydraulics import HydraulicNetwork_FL
+from .simulator import Simulator_FL
+
+# Fájlszerkezet (little-endian):
+#   fejléc   MAGIC, verzió, állapothossz, extra-hossz, csatornaszám, sorok, összes minta,
+#            kapacitás (0 = korlátlan), blokkméret, csatornanevek hossza,
+#            csőhálózat-leírás hossza (2. verziótól)
+#   nevek    '\0'-val elválasztott UTF-8
+#   hálózat  a csatolt HydraulicNetwork_FL JSON-leírása (üres, ha nincs)
+#   állapot  float64 vektor (STATE_FIELDS, majd FLAG_FIELDS sorrendben), utána az extra értékek
+#   előzmény 64 bájtra igazítva, float64 (csatorna, minta) tömb – memmap-pel olvasható
+
+MAGIC = b"FLCP"
+VERSION = 2
+_HEADER = struct.Struct("<4sIIIIQQIIII")
+_HEADER_V1 = struct.Struct("<4sIIIIQQIII")
+# a csőhálózat ezekre a szimulátor-objektumokra hivatkozhat név szerint
+_SIM_OBJECTS = ("t1", "t2", "t3", "p1", "p2")
+_ALIGN = 64
+
+_TANK_FIELDS = ("capacity_l", "level_l", "temperature_c", "ua_kW_per_K", "ambient_c", "ll_pct", "hh_pct")
+_PUMP_FIELDS = ("max_flow_lps", "command", "run_lamp", "hours")
+_METER_FIELDS = ("tau_s", "_y_lps", "last_lps", "last_kgps", "total_l", "total_kg", "min_lps", "max_lps")
+
+STATE_FIELDS = (
+    [("", f) for f in ("t", "drain_lps", "hyst_l", "last_q12_lps", "last_q23_lps")]
+    + [(o, f) for o in ("t1", "t2", "t3") for f in _TANK_FIELDS]
+    + [(o, f) for o in ("p1", "p2") for f in _PUMP_FIELDS]
+    + [(o, f) for o in ("fq12", "fq23") for f in _METER_FIELDS]
+)
+# az utolsó tick eseményjelzői (EventEngine_FL); betöltés után nem keletkezik
+# hamis retesz- vagy leeresztés-él. Nem paraméterezhetők, ezért külön listában.
+# A retesz a tiltott irány (+1/−1, 0 ha nincs): a nullázott parancsú szivattyúé is.
+FLAG_FIELDS = ("interlock_dir_p1", "interlock_dir_p2", "draining")
+STATE_LEN = len(STATE_FIELDS) + len(FLAG_FIELDS)
+
+
+def pack_state(sim: Simulator_FL) -> np.ndarray:
+    out = np.empty(STATE_LEN)
+    for k, (obj, name) in enumerate(STATE_FIELDS):
+        out[k] = float(getattr(getattr(sim, obj) if obj else sim, name))
+    out[len(STATE_FIELDS):] = (*sim.interlock_dir, sim.draining)
+    return out
+
+def unpack_state(sim: Simulator_FL, vec) -> None:
+    # a jelzők nélküli (régebbi) vektor is elfogadott; ekkor a jelzők nem változnak
+    if len(vec) not in (len(STATE_FIELDS), STATE_LEN):
+        raise ValueError(f"Hibás állapotvektor-hossz: {len(vec)} (várt: {STATE_LEN})")
+    for (obj, name), v in zip(STATE_FIELDS, vec):
+        v = float(v)
+        if name == "run_lamp":
+            v = v != 0.0
+        setattr(getattr(sim, obj) if obj else sim, name, v)
+    if len(vec) == STATE_LEN:
+        d1, d2, drain = (float(v) for v in vec[len(STATE_FIELDS):])
+        sim.interlock_dir = (int(np.sign(d1)), int(np.sign(d2)))
+        sim.interlocked = (d1 != 0.0, d2 != 0.0)
+        sim.draining = drain != 0.0
+    sim.refresh_state_FL()
+
+
+def save_checkpoint(sim: Simulator_FL, path: str, extra: Optional[Dict[str, float]] = None) -> int:
+    hist = sim.history
+    cols = hist.columns()
+    extra = dict(extra or {})
+    state = np.concatenate([pack_state(sim), np.asarray(list(extra.values()), dtype=float)]).astype("<f8")
+    names = "\0".join(list(hist.channels) + list(extra)).encode("utf-8")
+    net = b""
+    if sim.hydraulics is not None:
+        refs = {id(getattr(sim, n)): n for n in _SIM_OBJECTS}
+        net = json.dumps(sim.hydraulics.to_config_FL(refs), separators=(",", ":")).encode("utf-8")
+
+    head = _HEADER.pack(MAGIC, VERSION, STATE_LEN, len(extra), len(hist.channels),
+                        len(hist), hist.total, hist.capacity or 0, hist.chunk_size, len(names), len(net))
+    body = head + names + net + state.tobytes()
+    pad = -len(body) % _ALIGN
+    with open(path, "wb") as f:
+        f.write(body)
+        f.write(b"\0" * pad)
+        for name in hist.channels:
+            f.write(np.asarray(cols[name], dtype="<f8").tobytes())
+    return len(body) + pad + 8 * len(hist) * len(hist.channels)
+
+
+def _read_header(buf) -> Tuple[tuple, int]:
+    # az 1. verziós fejlécet 0 hosszú hálózatleírással egészíti ki
+    if len(buf) < _HEADER_V1.size:
+        raise ValueError("Csonka ellenőrzőpont-fájl")
+    magic, version = struct.unpack_from("<4sI", buf, 0)
+    if magic != MAGIC:
+        raise ValueError("Nem ellenőrzőpont-fájl (hibás azonosító)")
+    if version == 1:
+        return _HEADER_V1.unpack_from(buf, 0) + (0,), _HEADER_V1.size
+    if version != VERSION:
+        raise ValueError(f"Nem támogatott ellenőrzőpont-verzió: {version}")
+    if len(buf) < _HEADER.size:
+        raise ValueError("Csonka ellenőrzőpont-fájl")
+    return _HEADER.unpack_from(buf, 0), _HEADER.size
+
+
+def load_checkpoint(path: str, sim: Optional[Simulator_FL] = None,
+                    use_mmap: bool = True) -> Tuple[Simulator_FL, Dict[str, float]]:
+    # use_mmap=True mellett a korlátlan előzmény teljes blokkjai a fájlra mutató
+    # nézetek maradnak; csak a ténylegesen olvasott lapok kerülnek memóriába.
+    with open(path, "rb") as f:
+        if use_mmap:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buf = f.read()
+    (_, _, n_state, n_extra, n_ch, n_rows, total, cap, chunk, n_names, n_net), pos = _read_header(buf)
+    names = bytes(buf[pos:pos + n_names]).decode("utf-8").split("\0") if n_names else []
+    pos += n_names
+    net = json.loads(bytes(buf[pos:pos + n_net]).decode("utf-8")) if n_net else None
+    pos += n_net
+    if n_state not in (len(STATE_FIELDS), STATE_LEN) or len(names) != n_ch + n_extra:
+        raise ValueError("Az ellenőrzőpont szerkezete nem egyezik a szimulátoréval")
+    state = np.frombuffer(buf, dtype="<f8", count=n_state + n_extra, offset=pos)
+    pos += state.nbytes
+    pos += -pos % _ALIGN
+    data = np.frombuffer(buf, dtype="<f8", count=n_ch * n_rows, offset=pos).reshape(n_ch, n_rows)
+
+    sim = sim if sim is not None else Simulator_FL()
+    unpack_state(sim, state[:n_state])
+    sim.history = HistoryStore.from_array(data, names[:n_ch], total=total, chunk_size=chunk,
+                                          capacity=cap or None)
+    sim.hydraulics = None if net is None else HydraulicNetwork_FL.from_config_FL(
+        net, {n: getattr(sim, n) for n in _SIM_OBJECTS})
+    extra = {name: float(v) for name, v in zip(names[n_ch:], state[n_state:])}
+    return sim, extra
@@ -0,0 +1,214 @@
+import math
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Az eseménynevek az EventIntegrator_FL naplójával egyeznek.
+EVENT_KINDS = ("LL raise", "LL clear", "HH raise", "HH clear", "pump start", "pump stop",
+               "interlock trip", "interlock reset", "drain start", "drain stop")
+EVENT_SOURCES = ("T1", "T2", "T3", "P1", "P2")
+
+# rekordonként 14 bájt: idő, típus- és forráskód, a kapcsolódó mért érték
+EVENT_COLUMNS = (("t", np.float64), ("kind", np.uint8), ("source", np.uint8), ("value", np.float32))
+
+_KIND = {name: k for k, name in enumerate(EVENT_KINDS)}
+_SOURCE = {name: k for k, name in enumerate(EVENT_SOURCES)}
+
+
+class Event_FL(NamedTuple):
+
+    t: float
+    kind: str
+    source: str
+    value: float      # tartálynál a szint [L], szivattyúnál |q| [L/s], leeresztésnél a beállított [L/s]
+
+
+class EventJournal_FL:
+
+    # Csak hozzáfűzhető eseménynapló, oszloponként egy típusos tömb (duplázódó
+    # kapacitással). Egy motorból az idők monoton nőnek, így maga az idő-oszlop
+    # az index; ha mégis korábbi idő érkezik (pl. visszatöltött állapot), a
+    # lekérdezés lustán felépített, stabil rendezési indexet használ.
+    #
+    # Egy másik szál (UI) zár nélkül olvashat since()-szel: az író előbb ír,
+    # utána növeli a darabszámot.
+
+    def __init__(self, capacity: int = 256):
+        cap = max(1, int(capacity))
+        self._cols = {name: np.empty(cap, dtype=dt) for name, dt in EVENT_COLUMNS}
+        self.n = 0
+        self._t_last = -math.inf
+        self._order: Optional[np.ndarray] = None
+        self._sorted = True
+
+    def __len__(self) -> int:
+        return self.n
+
+    @property
+    def nbytes(self) -> int:
+        return sum(c.nbytes for c in self._cols.values())
+
+    def fork(self) -> "EventJournal_FL":
+        other = EventJournal_FL(len(self._cols["t"]))
+        for name, col in self._cols.items():
+            other._cols[name][:self.n] = col[:self.n]
+        other.n, other._t_last, other._sorted = self.n, self._t_last, self._sorted
+        return other
+
+    def append(self, t: float, kind: str, source: str, value: float = 0.0) -> None:
+        n = self.n
+        cols = self._cols
+        if n == len(cols["t"]):
+            grown = {}
+            for name, col in cols.items():
+                grown[name] = np.empty(2 * n, dtype=col.dtype)
+                grown[name][:n] = col
+            self._cols = cols = grown
+        if t < self._t_last:
+            self._sorted = False
+        else:
+            self._t_last = t
+        cols["t"][n] = t
+        cols["kind"][n] = _KIND[kind]
+        cols["source"][n] = _SOURCE[source]
+        cols["value"][n] = value
+        self._order = None
+        self.n = n + 1
+
+
+    def records(self, start: Optional[int] = None, stop: Optional[int] = None) -> Dict[str, np.ndarray]:
+        # beszúrási sorrendben, oszloponként nézet
+        n = self.n
+        return {name: col[:n][start:stop] for name, col in self._cols.items()}
+
+    def since(self, seq: int) -> Tuple[Dict[str, np.ndarray], int]:
+        # a seq. utáni rekordok és az új sorszám (a következő híváshoz)
+        n = self.n
+        return {name: col[seq:n] for name, col in self._cols.items()}, n
+
+    def _span(self, t0: float, t1: float) -> Tuple[int, int]:
+        t = self._cols["t"][:self.n]
+        if not self._sorted:
+            if self._order is None:
+                self._order = np.argsort(t, kind="stable")
+            t = t[self._order]
+        a = int(np.searchsorted(t, t0, "left"))
+        return a, max(a, int(np.searchsorted(t, t1, "right")))
+
+    def count(self, t0: float = -math.inf, t1: float = math.inf) -> int:
+        a, b = self._span(t0, t1)
+        return b - a
+
+    def range(self, t0: float = -math.inf, t1: float = math.inf) -> Dict[str, np.ndarray]:
+        # a [t0, t1] időablak rekordjai időrendben; rendezett naplón nézet
+        a, b = self._span(t0, t1)
+        if self._sorted:
+            return {name: col[a:b] for name, col in self._cols.items()}
+        idx = self._order[a:b]
+        return {name: col[idx] for name, col in self._cols.items()}
+
+    def events(self, t0: float = -math.inf, t1: float = math.inf) -> List[Event_FL]:
+        return decode(self.range(t0, t1))
+
+
+def decode(recs: Dict[str, np.ndarray]) -> List[Event_FL]:
+    return [Event_FL(t, EVENT_KINDS[k], EVENT_SOURCES[s], v) for t, k, s, v in
+            zip(recs["t"].tolist(), recs["kind"].tolist(), recs["source"].tolist(), recs["value"].tolist())]
+
+
+# figyelt jelzők sorrendje: (forrás, felfutó él, lefutó él)
+_WATCH = (
+    ("T1", "LL raise", "LL clear"), ("T1", "HH raise", "HH clear"),
+    ("T2", "LL raise", "LL clear"), ("T2", "HH raise", "HH clear"),
+    ("T3", "LL raise", "LL clear"), ("T3", "HH raise", "HH clear"),
+    ("P1", "pump start", "pump stop"), ("P2", "pump start", "pump stop"),
+    ("P1", "interlock trip", "interlock reset"), ("P2", "interlock trip", "interlock reset"),
+    ("T3", "drain start", "drain stop"),
+)
+SIGNALS = ("T1.LL", "T1.HH", "T2.LL", "T2.HH", "T3.LL", "T3.HH",
+           "P1.run", "P2.run", "P1.interlock", "P2.interlock", "T3.drain")
+
+# (típuskód, forráskód) → (jelzőindex, új érték)
+_EDGE = {(_KIND[kind], _SOURCE[src]): (k, on)
+         for k, (src, up, down) in enumerate(_WATCH) for kind, on in ((up, True), (down, False))}
+
+
+def apply_events(signals: List[bool], recs: Dict[str, np.ndarray]) -> List[int]:
+    # napló-rekordok alkalmazása egy SIGNALS sorrendű jelzőlistára; a változott indexek
+    changed = []
+    for kind, source in zip(recs["kind"].tolist(), recs["source"].tolist()):
+        k, on = _EDGE[(kind, source)]
+        if signals[k] != on:
+            signals[k] = on
+            changed.append(k)
+    return changed
+
+
+class EventEngine_FL:
+
+    # Élvezérelt eseményfigyelő egy Simulator_FL fölött. Sinkként tickenként
+    # egyszer fut: a figyelt jelzőket egyetlen tuple-ben hasonlítja az előzőhöz,
+    # így változatlan állapotnál ez az egész költség. Változáskor a
+    # különbségeket a naplóba írja, és a feliratkozókat egyszer, a tick összes
+    # új eseményével hívja.
+    #
+    # Induláskor a már aktív jelzők felfutó eseménnyel kerülnek a naplóba,
+    # így a napló elejétől visszajátszva bármely időpont állapota előáll.
+
+    def __init__(self, sim, journal: Optional[EventJournal_FL] = None):
+        self.sim = sim
+        self.journal = journal if journal is not None else EventJournal_FL()
+        self._subs: List[Callable[[List[Event_FL]], None]] = []
+        self._prev = (False,) * len(_WATCH)
+        self.detect_FL()
+
+    def fork(self, sim) -> "EventEngine_FL":
+        other = EventEngine_FL.__new__(EventEngine_FL)
+        other.sim = sim
+        other.journal = self.journal.fork()
+        other._subs = []
+        other._prev = self._prev
+        return other
+
+    def subscribe(self, fn: Callable[[List[Event_FL]], None]) -> Callable[[List[Event_FL]], None]:
+        self._subs.append(fn)
+        return fn
+
+    def unsubscribe(self, fn) -> None:
+        if fn in self._subs:
+            self._subs.remove(fn)
+
+    @property
+    def active(self) -> Tuple[bool, ...]:
+        # a figyelt jelzők utoljára látott értéke (SIGNALS sorrendben)
+        return self._prev
+
+    def append(self, row) -> None:
+        self.detect_FL()
+
+    def detect_FL(self) -> int:
+        sim = self.sim
+        st = sim.state
+        cur = (*st.alarms, *st.running, *sim.interlocked, sim.draining)
+        prev = self._prev
+        if cur == prev:
+            return 0
+        self._prev = cur
+        t = st.t
+        new = []
+        for k, (old, now) in enumerate(zip(prev, cur)):
+            if old == now:
+                continue
+            source, up, down = _WATCH[k]
+            if k < 6:
+                value = st.levels[k // 2]
+            elif k < 10:
+                value = abs(st.flows_lps[k % 2])
+            else:
+                value = sim.drain_lps
+            ev = Event_FL(t, up if now else down, source, value)
+            self.journal.append(*ev)
+            new.append(ev)
+        for fn in self._subs:
+            fn(new)
+        return len(new)
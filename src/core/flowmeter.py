@@ -1,3 +1,6 @@
+from .remeter import remeter_FL, apply_FL
+
+
 class FlowMeter:
 
 
@@ -53,6 +56,13 @@ class FlowMeter:
 
 
 
+    def measure_array(self, lps, rho_kgm3, dt_s):
+        # measure() egész tömbökre, vektorosan; a mérő állapota a végére áll.
+        # Visszaadja a szűrt L/s és kg/s sorozatot.
+        res = remeter_FL(lps, rho_kgm3, dt_s, self.tau_s, meter=self)
+        apply_FL(self, res)
+        return res["lps"][0], res["kgps"][0]
+
     def reset_totals(self):
 
         self.total_l = 0.0
@@ -0,0 +1,167 @@
+import math
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+_TOL_L = 1e-9
+
+# (forrás, cél) tartályindexek: P1 = T1↔T2, P2 = T2↔T3; a leeresztés T3-ból
+PUMP_PAIRS = ((0, 1), (1, 2))
+
+
+class Regime_FL(NamedTuple):
+
+    q: Tuple[float, float]      # előjeles szivattyú-áramok [L/s]
+    q_drain: float              # tényleges leeresztés [L/s]
+    rates: Tuple[float, float, float]  # dL/dt tartályonként [L/s]
+    interlocked: Tuple[bool, bool]     # parancs van, de a retesz (részben) tiltja
+
+
+def solve_regime_FL(levels, cmds, q_max, drain_lps, ll_l, hh_l, hyst_l) -> Regime_FL:
+    # Állandó parancsok mellett érvényes áramok. A retesz határán álló szivattyú
+    # (forrás pontosan LL+HYST-en, vagy cél pontosan HH-n) csúszó üzemben annyit
+    # szállít, amennyit a szomszédos áramok megengednek – ez a diszkrét
+    # be/ki kapcsolgatás folytonos határértéke.
+    L = list(levels)
+    trip_lo = ll_l + hyst_l
+    pumps = []
+    for (a, b), c, qm in zip(PUMP_PAIRS, cmds, q_max):
+        Q = abs(c) * qm
+        if Q <= 1e-9:
+            pumps.append((a, b, 1.0, 0.0, "off"))
+            continue
+        s, d, sign = (a, b, 1.0) if c > 0 else (b, a, -1.0)
+        if L[d] >= hh_l - _TOL_L:
+            mode = "dst"
+        elif L[s] <= trip_lo + _TOL_L:
+            mode = "src" if abs(L[s] - trip_lo) <= _TOL_L else "off"
+        else:
+            mode = "free"
+        if mode == "dst" and L[s] <= trip_lo + _TOL_L:
+            mode = "off" if abs(L[s] - trip_lo) > _TOL_L else "both"
+        pumps.append((s, d, sign, Q, mode))
+
+    q = [Q if mode == "free" else 0.0 for (_, _, _, Q, mode) in pumps]
+    drain_free = L[2] > ll_l + _TOL_L
+    qd = drain_lps if drain_free else 0.0
+
+    def balance(i, skip_pump=None, skip_drain=False):
+        net = 0.0
+        for k, (s, d, _, _, _) in enumerate(pumps):
+            if k == skip_pump:
+                continue
+            if d == i:
+                net += q[k]
+            if s == i:
+                net -= q[k]
+        if i == 2 and not skip_drain:
+            net -= qd
+        return net
+
+    for _ in range(8):
+        changed = False
+        for k, (s, d, _, Q, mode) in enumerate(pumps):
+            if mode not in ("src", "dst", "both"):
+                continue
+            lim = Q
+            if mode in ("src", "both"):
+                lim = min(lim, max(0.0, balance(s, skip_pump=k)))
+            if mode in ("dst", "both"):
+                lim = min(lim, max(0.0, -balance(d, skip_pump=k)))
+            if abs(lim - q[k]) > 1e-12:
+                q[k] = lim; changed = True
+        if not drain_free:
+            lim = min(drain_lps, max(0.0, balance(2, skip_drain=True)))
+            if abs(lim - qd) > 1e-12:
+                qd = lim; changed = True
+        if not changed:
+            break
+
+    rates = tuple(balance(i) for i in range(3))
+    signed = tuple(p[2] * qk for p, qk in zip(pumps, q))
+    interlocked = tuple(p[4] != "free" and p[3] > 0 and qk < p[3] - 1e-9 for p, qk in zip(pumps, q))
+    return Regime_FL(signed, qd, rates, interlocked)
+
+
+def time_to_next_event_FL(levels, rates, thresholds) -> Tuple[float, List[Tuple[int, float]]]:
+    # A legközelebbi küszöbátlépés ideje, és az akkor küszöbre érő (tartály, küszöb) párok
+    best, hits = math.inf, []
+    for i, (L, r) in enumerate(zip(levels, rates)):
+        if abs(r) <= 1e-12:
+            continue
+        for thr in thresholds:
+            if r > 0 and thr > L + _TOL_L:
+                t = (thr - L) / r
+            elif r < 0 and thr < L - _TOL_L:
+                t = (L - thr) / -r
+            else:
+                continue
+            if t < best - 1e-12:
+                best, hits = t, [(i, thr)]
+            elif abs(t - best) <= 1e-12:
+                hits.append((i, thr))
+    return best, hits
+
+
+
+
+class Forecast_FL(NamedTuple):
+
+    t0: float                   # a számítás szimulációs ideje [s]
+    valid_until: float          # a következő küszöbátlépés (lehetséges rezsimváltás) ideje [s]
+    events: Dict[str, float]    # pl. "T3.full", "T1.LL", "P1.trip" -> abszolút idő [s]; inf = nem következik be
+
+    def countdown(self, now: float) -> Dict[str, float]:
+        # hátralévő idő eseményenként, a lejártak és a soha be nem következők nélkül
+        return {k: t - now for k, t in self.events.items() if math.isfinite(t) and t >= now}
+
+
+def forecast_FL(t0: float, levels: Sequence[float], cmds: Sequence[float], q_max: Sequence[float],
+                drain_lps: float, hyst_l: float, ll_l: Sequence[float], hh_l: Sequence[float],
+                cap_l: float, latching: bool = False, max_events: int = 64) -> Forecast_FL:
+    # Szakaszonként lineáris előrevetítés: minden szakaszban solve_regime_FL adja
+    # a szintváltozási sebességeket, time_to_next_event_FL a szakasz hosszát.
+    # latching=True: a reteszelt szivattyú parancsa nullázódik (Simulator_FL),
+    # különben a parancs érvényes marad, és a szivattyú csúszó üzemben fut (vezérlő).
+    L = [float(x) for x in levels]
+    cmds = [float(c) for c in cmds]
+    names = ("T1", "T2", "T3")
+    events = {f"{n}.{kind}": math.inf for n in names for kind in ("LL", "HH", "empty", "full")}
+    events.update({"P1.trip": math.inf, "P2.trip": math.inf})
+    thresholds = sorted({0.0, hyst_l, cap_l, *ll_l, *hh_l})
+    t = 0.0
+    valid = math.inf
+    # csak a belépés számít esemény: ami már t0-ban fennáll, az nem kerül be
+    active = {}
+
+    def mark(key, on):
+        if on and not active.get(key, True) and events[key] == math.inf:
+            events[key] = t0 + t
+        active[key] = on
+
+    for _ in range(max_events):
+        for i, n in enumerate(names):
+            mark(f"{n}.LL", L[i] <= ll_l[i] + _TOL_L)
+            mark(f"{n}.HH", L[i] >= hh_l[i] - _TOL_L)
+            mark(f"{n}.empty", L[i] <= _TOL_L)
+            mark(f"{n}.full", L[i] >= cap_l - _TOL_L)
+
+        reg = solve_regime_FL(L, cmds, q_max, drain_lps, 0.0, cap_l, hyst_l)
+        tripped = False
+        for k, locked in enumerate(reg.interlocked):
+            mark(f"P{k + 1}.trip", locked)
+            if locked and latching and cmds[k] != 0.0:
+                cmds[k] = 0.0
+                tripped = True
+        if tripped:
+            continue
+
+        dt, hits = time_to_next_event_FL(L, reg.rates, thresholds)
+        if not math.isfinite(dt):
+            break
+        if valid == math.inf:
+            valid = t0 + t + dt
+        L = [x + r * dt for x, r in zip(L, reg.rates)]
+        for i, thr in hits:
+            L[i] = thr
+        t += dt
+
+    return Forecast_FL(float(t0), valid, events)
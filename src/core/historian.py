@@ -0,0 +1,271 @@
+import mmap
+import queue
+import struct
+import threading
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .history import SIM_CHANNELS
+
+# Fájlszerkezet (little-endian):
+#   fejléc    MAGIC, verzió, csatornaszám, nevek hossza, '\0'-val elválasztott nevek,
+#             összegzett csatornák száma és sorszámai (2. verziótól)
+#   blokkok   [t0, t1, sorok, hasznos hossz, összegek] + zlib( bájtkeverés( XOR(előző minta) ) )
+#   index     blokkonként (t0, t1, sorok, eltolás, összegek), majd [INDEX_MAGIC, index eltolás]
+# Az összegek az összegzett csatornákra blokkonként Σ|x|·dt, majd Σ(|x| > RUN_EPS)·dt
+# (pl. átvezetett mennyiség [L] és üzemidő [s]); a dt a blokkhatáron átnyúlik, így a
+# felvétel elejétől vett számláló az index összegeiből, kicsomagolás nélkül adódik.
+# A blokkfejlécek a hasznos adat kicsomagolása nélkül is végigolvashatók, így
+# lezáratlan (futás közben olvasott vagy megszakadt) fájl is indexelhető.
+
+MAGIC = b"FLHS"
+INDEX_MAGIC = b"FLHX"
+VERSION = 2
+TOTAL_CHANNELS = ("q12", "q23")
+RUN_EPS = 1e-6
+_FILE_HEAD = struct.Struct("<4sIII")
+_COUNT = struct.Struct("<I")
+_TAIL = struct.Struct("<4sQ")
+
+
+def _layout(n_sums: int) -> Tuple[struct.Struct, struct.Struct]:
+    # blokkfejléc és indexsor az összegek számával
+    return struct.Struct(f"<ddII{n_sums}d"), struct.Struct(f"<ddIQ{n_sums}d")
+
+
+def encode_chunk(block: np.ndarray, level: int = 6) -> bytes:
+    # (csatorna, sor) float64 → az előző mintával XOR-olt bitminták, bájtsíkokra
+    # rendezve; lassan változó jelnél a felső bájtok többnyire nullák
+    bits = np.ascontiguousarray(block, dtype="<f8").view("<u8")
+    x = bits.copy()
+    x[:, 1:] ^= bits[:, :-1]
+    planes = x.view(np.uint8).reshape(x.shape[0], x.shape[1], 8).transpose(0, 2, 1)
+    return zlib.compress(np.ascontiguousarray(planes).tobytes(), level)
+
+def decode_chunk(payload: bytes, n_channels: int, n_rows: int) -> np.ndarray:
+    planes = np.frombuffer(zlib.decompress(payload), dtype=np.uint8).reshape(n_channels, 8, n_rows)
+    x = np.ascontiguousarray(planes.transpose(0, 2, 1)).view("<u8").reshape(n_channels, n_rows)
+    return np.bitwise_xor.accumulate(x, axis=1).view("<f8")
+
+
+class HistorianWriter_FL:
+
+    # A tick szálán csak egy előre lefoglalt blokkba másol; a teli blokk egy
+    # korlátos sorba kerül, a tömörítést és a lemezírást háttérszál végzi.
+    # Teli sor esetén a blokk helyben várakozik (pending), a tick nem áll meg.
+    # A várakozó blokkok száma legfeljebb max_pending (elakadt lemeznél sem nő
+    # korlátlanul a memória): felette a legrégebbi eldobódik, a kiesett sorok
+    # száma a dropped_rows számlálóban látszik.
+
+    def __init__(self, path: str, channels: Sequence[str] = SIM_CHANNELS, chunk_rows: int = 4096,
+                 queue_size: int = 16, level: int = 6, totals: Sequence[str] = TOTAL_CHANNELS,
+                 max_pending: int = 64):
+        self.path = path
+        self.channels = tuple(channels)
+        self.totals = tuple(c for c in totals if c in self.channels)
+        self._tot_idx = [self.channels.index(c) for c in self.totals]
+        self._chunk_head, self._index_row = _layout(2 * len(self.totals))
+        self._t_prev: Optional[float] = None
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.level = int(level)
+        self._buf = np.empty((len(self.channels), self.chunk_rows))
+        self._fill = 0
+        self._q = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._pending: List[np.ndarray] = []
+        self.max_pending = max(1, int(max_pending))
+        self._index: List[tuple] = []
+        self.rows = 0
+        self.bytes_raw = 0
+        self.bytes_written = 0
+        self.stalls = 0
+        self.dropped_rows = 0
+        self.error: Optional[BaseException] = None
+
+        self._f = open(path, "wb")
+        names = "\0".join(self.channels).encode("utf-8")
+        self._f.write(_FILE_HEAD.pack(MAGIC, VERSION, len(self.channels), len(names)) + names)
+        self._f.write(_COUNT.pack(len(self._tot_idx)) + struct.pack(f"<{len(self._tot_idx)}I", *self._tot_idx))
+        self._thread = threading.Thread(target=self._loop, name="HistorianWriter_FL", daemon=True)
+        self._thread.start()
+
+
+    def append(self, row: Sequence[float]) -> None:
+        self._buf[:, self._fill] = row
+        self._fill += 1
+        self.rows += 1
+        if self._fill == self.chunk_rows:
+            self._hand_off(self._buf)
+            self._buf = np.empty((len(self.channels), self.chunk_rows))
+            self._fill = 0
+
+    def _hand_off(self, block: np.ndarray) -> None:
+        self._pending.append(block)
+        while self._pending:
+            try:
+                self._q.put_nowait(self._pending[0])
+            except queue.Full:
+                self.stalls += 1
+                if len(self._pending) > self.max_pending:
+                    self.dropped_rows += self._pending.pop(0).shape[1]
+                return
+            self._pending.pop(0)
+
+    def flush(self) -> None:
+        # a félkész blokkot is kiírja, és megvárja a háttérszálat
+        if self._fill:
+            self._hand_off(self._buf[:, :self._fill].copy())
+            self._fill = 0
+        for block in self._pending:
+            self._q.put(block)
+        self._pending.clear()
+        self._q.join()
+        if self.error is not None:
+            raise IOError(f"Historian írási hiba: {self.error}") from self.error
+
+    def close(self) -> None:
+        if self._f is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._q.put(None)
+            self._thread.join()
+            pos = self._f.tell()
+            for row in self._index:
+                self._f.write(self._index_row.pack(*row))
+            self._f.write(_TAIL.pack(INDEX_MAGIC, pos))
+            self._f.close()
+            self._f = None
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+
+    def _loop(self) -> None:
+        while True:
+            block = self._q.get()
+            try:
+                if block is None:
+                    return
+                if self.error is None:
+                    self._write_chunk(block)
+            except BaseException as e:
+                self.error = e
+            finally:
+                self._q.task_done()
+
+    def _write_chunk(self, block: np.ndarray) -> None:
+        payload = encode_chunk(block, self.level)
+        t = block[self.channels.index("t")] if "t" in self.channels else np.arange(block.shape[1], dtype=float)
+        t0, t1, n = float(t[0]), float(t[-1]), block.shape[1]
+        sums = chunk_sums(block[self._tot_idx], t, self._t_prev)
+        self._t_prev = t1
+        offset = self._f.tell()
+        self._f.write(self._chunk_head.pack(t0, t1, n, len(payload), *sums))
+        self._f.write(payload)
+        self._f.flush()
+        self._index.append((t0, t1, n, offset, *sums))
+        self.bytes_raw += block.nbytes
+        self.bytes_written += self._chunk_head.size + len(payload)
+
+
+def chunk_sums(x: np.ndarray, t: np.ndarray, t_prev: Optional[float] = None) -> np.ndarray:
+    # (csatorna, sor) blokk: [Σ|x|·dt …, Σ(|x| > RUN_EPS)·dt …]; t_prev az előző
+    # blokk utolsó ideje, az első blokk előtti lépésközt a következővel becsüli
+    if t_prev is None:
+        t_prev = 2 * t[0] - t[1] if len(t) > 1 else t[0]
+    dt = np.diff(t, prepend=t_prev)
+    a = np.abs(x)
+    return np.concatenate([(a * dt).sum(axis=1), ((a > RUN_EPS) * dt).sum(axis=1)])
+
+
+class HistorianReader_FL:
+
+    # Időtartomány olvasása: a blokkindexben bináris kereséssel találja meg az
+    # érintett blokkokat, és csak azokat csomagolja ki.
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_ch, n_names = _FILE_HEAD.unpack_from(self._data, 0)
+        if magic != MAGIC:
+            raise ValueError("Nem historian-fájl (hibás azonosító)")
+        if version not in (1, VERSION):
+            raise ValueError(f"Nem támogatott historian-verzió: {version}")
+        start = _FILE_HEAD.size
+        self.channels = tuple(self._data[start:start + n_names].decode("utf-8").split("\0"))
+        if len(self.channels) != n_ch:
+            raise ValueError("Sérült historian-fejléc")
+        start += n_names
+        tot_idx = ()
+        if version >= 2:
+            (n_tot,) = _COUNT.unpack_from(self._data, start)
+            tot_idx = struct.unpack_from(f"<{n_tot}I", self._data, start + _COUNT.size)
+            start += _COUNT.size + 4 * n_tot
+        # az 1. verziós fájlban nincsenek blokkösszegek (totals üres)
+        self.totals = tuple(self.channels[i] for i in tot_idx)
+        self._chunk_head, self._index_row = _layout(2 * len(self.totals))
+        self._first = start
+        rows = self._read_index()
+        self.t0 = np.array([r[0] for r in rows])
+        self.t1 = np.array([r[1] for r in rows])
+        self.n_rows = np.array([r[2] for r in rows], dtype=np.int64)
+        self.offsets = np.array([r[3] for r in rows], dtype=np.int64)
+        # (blokk, 2·összegzett csatorna): lásd chunk_sums()
+        self.sums = np.array([r[4:] for r in rows], dtype=float).reshape(len(rows), 2 * len(self.totals))
+
+    def _read_index(self) -> List[tuple]:
+        d = self._data
+        if len(d) >= self._first + _TAIL.size:
+            magic, pos = _TAIL.unpack_from(d, len(d) - _TAIL.size)
+            if magic == INDEX_MAGIC:
+                return list(self._index_row.iter_unpack(d[pos:len(d) - _TAIL.size]))
+        # lezáratlan fájl: a blokkfejlécek végigjárása
+        head = self._chunk_head
+        rows, pos = [], self._first
+        while pos + head.size <= len(d):
+            t0, t1, n, size, *sums = head.unpack_from(d, pos)
+            if pos + head.size + size > len(d):
+                break
+            rows.append((t0, t1, n, pos, *sums))
+            pos += head.size + size
+        return rows
+
+    def __len__(self) -> int:
+        return int(self.n_rows.sum())
+
+    @property
+    def time_range(self) -> Tuple[float, float]:
+        if not len(self.t0):
+            return (0.0, 0.0)
+        return float(self.t0[0]), float(self.t1[-1])
+
+    def chunk(self, k: int) -> np.ndarray:
+        pos = int(self.offsets[k])
+        _, _, n, size = self._chunk_head.unpack_from(self._data, pos)[:4]
+        pos += self._chunk_head.size
+        return decode_chunk(self._data[pos:pos + size], len(self.channels), n)
+
+    def read(self, t_start: float = -np.inf, t_end: float = np.inf,
+             channels: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        names = tuple(channels or self.channels)
+        k0 = int(np.searchsorted(self.t1, t_start, side="left"))
+        k1 = int(np.searchsorted(self.t0, t_end, side="right"))
+        idx = [self.channels.index(c) for c in names]
+        parts = [self.chunk(k) for k in range(k0, k1)]
+        if not parts:
+            return {c: np.empty(0) for c in names}
+        block = np.concatenate(parts, axis=1)
+        if "t" in self.channels:
+            t = block[self.channels.index("t")]
+            block = block[:, (t >= t_start) & (t <= t_end)]
+        return {c: block[i] for c, i in zip(names, idx)}
+
+    def close(self) -> None:
+        self._data.close()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
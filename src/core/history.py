@@ -0,0 +1,190 @@
+import copy
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SIM_CHANNELS = ("t", "L1", "L2", "L3", "q12", "q23", "T1", "T2", "T3", "rho1", "rho2", "rho3")
+
+
+class HistoryStore:
+
+    # Csatornánként egy típusos tömb (a blokk egy sora).
+    # capacity=None: korlátlan, chunk_size méretű előre lefoglalt blokkokban nő.
+    # capacity=N: gyűrűpuffer az utolsó N mintára; minden minta kétszer íródik
+    # (i és i+N helyre), így bármely ablak folytonos, másolásmentes nézetként olvasható.
+    # fork(): a két tár ugyanazokat a tömböket látja; az első írás előtt az író
+    # fél lemásolja azt, amit felülírna (blokkos módban csak az utolsó blokkot).
+
+    def __init__(self, channels: Sequence[str] = SIM_CHANNELS, chunk_size: int = 4096,
+                 capacity: Optional[int] = None, dtype=np.float64):
+        self.channels = tuple(channels)
+        self._index = {name: i for i, name in enumerate(self.channels)}
+        self.dtype = np.dtype(dtype)
+        self.capacity = None if capacity is None else max(1, int(capacity))
+        self.chunk_size = max(1, int(chunk_size))
+        self.clear()
+
+    def clear(self) -> None:
+        self.total = 0
+        if self.capacity is not None:
+            self._ring = np.empty((len(self.channels), 2 * self.capacity), dtype=self.dtype)
+            self._chunks = []
+        else:
+            self._ring = None
+            self._chunks = [np.empty((len(self.channels), self.chunk_size), dtype=self.dtype)]
+        self._fill = 0
+        self._shared = False
+
+    @classmethod
+    def from_array(cls, data: np.ndarray, channels: Sequence[str] = SIM_CHANNELS, total: Optional[int] = None,
+                   chunk_size: int = 4096, capacity: Optional[int] = None) -> "HistoryStore":
+        # (csatorna, minta) alakú tömbből; blokkos módban a teljes blokkok nézetek
+        # maradnak (pl. memmap), csak az első hozzáfűzés másolja az utolsót
+        store = cls(channels, chunk_size=chunk_size, capacity=capacity, dtype=data.dtype)
+        n = data.shape[1]
+        if store._ring is not None:
+            k = min(n, store.capacity)
+            store.total = n if total is None else int(total)
+            pos = (store.total - k + np.arange(k)) % store.capacity
+            store._ring[:, pos] = data[:, n - k:]
+            store._ring[:, pos + store.capacity] = data[:, n - k:]
+            return store
+        cs = store.chunk_size
+        if n:
+            store._chunks = [data[:, a:a + cs] for a in range(0, n, cs)]
+            store._fill = n - (len(store._chunks) - 1) * cs
+            store._shared = True
+        store.total = n
+        return store
+
+    def fork(self) -> "HistoryStore":
+        other = copy.copy(self)
+        other._chunks = list(self._chunks)
+        self._shared = other._shared = True
+        return other
+
+    def _unshare(self) -> None:
+        if self._ring is not None:
+            self._ring = self._ring.copy()
+        elif self._fill < self.chunk_size:
+            tail = np.empty((len(self.channels), self.chunk_size), dtype=self.dtype)
+            tail[:, :self._fill] = self._chunks[-1][:, :self._fill]
+            self._chunks[-1] = tail
+        self._shared = False
+
+
+    def append(self, row: Sequence[float]) -> None:
+        if self._shared:
+            self._unshare()
+        if self._ring is not None:
+            pos = self.total % self.capacity
+            self._ring[:, pos] = row
+            self._ring[:, pos + self.capacity] = row
+        else:
+            if self._fill == self.chunk_size:
+                self._chunks.append(np.empty((len(self.channels), self.chunk_size), dtype=self.dtype))
+                self._fill = 0
+            self._chunks[-1][:, self._fill] = row
+            self._fill += 1
+        self.total += 1
+
+    def append_block(self, block: np.ndarray) -> None:
+        # (csatorna, minta) alakú blokk egyben; blokkos módban szeletenként másol
+        m = block.shape[1]
+        if self._ring is not None or m == 0:
+            for j in range(m):
+                self.append(block[:, j])
+            return
+        if self._shared:
+            self._unshare()
+        a = 0
+        while a < m:
+            if self._fill == self.chunk_size:
+                self._chunks.append(np.empty((len(self.channels), self.chunk_size), dtype=self.dtype))
+                self._fill = 0
+            k = min(m - a, self.chunk_size - self._fill)
+            self._chunks[-1][:, self._fill:self._fill + k] = block[:, a:a + k]
+            self._fill += k
+            self.total += k
+            a += k
+
+    def __len__(self) -> int:
+        if self._ring is not None:
+            return min(self.total, self.capacity)
+        return self.total
+
+    @property
+    def nbytes(self) -> int:
+        if self._ring is not None:
+            return self._ring.nbytes
+        return sum(c.nbytes for c in self._chunks)
+
+
+    def _block(self, start: int, stop: int) -> np.ndarray:
+        # [start, stop) a megőrzött mintákon belül; nézet, ha lehetséges
+        if stop <= start:
+            return np.empty((len(self.channels), 0), dtype=self.dtype)
+        if self._ring is not None:
+            n = len(self)
+            end = (self.total - 1) % self.capacity + self.capacity + 1
+            return self._ring[:, end - n + start:end - n + stop]
+        cs = self.chunk_size
+        c0, c1 = start // cs, (stop - 1) // cs
+        if c0 == c1:
+            return self._chunks[c0][:, start - c0 * cs:stop - c0 * cs]
+        parts = [self._chunks[c][:, max(start - c * cs, 0):min(stop - c * cs, cs)] for c in range(c0, c1 + 1)]
+        return np.concatenate(parts, axis=1)
+
+    def _range(self, start: Optional[int], stop: Optional[int]) -> Tuple[int, int]:
+        start, stop, _ = slice(start, stop).indices(len(self))
+        return start, max(start, stop)
+
+    def column(self, name: str, start: Optional[int] = None, stop: Optional[int] = None) -> np.ndarray:
+        start, stop = self._range(start, stop)
+        return self._block(start, stop)[self._index[name]]
+
+    def columns(self, names: Optional[Sequence[str]] = None,
+                start: Optional[int] = None, stop: Optional[int] = None) -> Dict[str, np.ndarray]:
+        start, stop = self._range(start, stop)
+        block = self._block(start, stop)
+        return {name: block[self._index[name]] for name in (names or self.channels)}
+
+    def searchsorted(self, name: str, value: float, side: str = "left", n: Optional[int] = None) -> int:
+        # monoton csatornán (pl. "t"); blokkos módban előbb a blokkok első elemei között keres.
+        # n: csak az első n mintában (egy másik szál által rögzített darabszám; a még
+        # meg nem írt, frissen lefoglalt blokk nem számít)
+        i = self._index[name]
+        n = len(self) if n is None else min(int(n), len(self))
+        cs = self.chunk_size
+        nc = -(-n // cs)
+        if self._ring is not None or nc <= 1:
+            return int(np.searchsorted(self._block(0, n)[i], value, side))
+        firsts = np.array([c[i, 0] for c in self._chunks[:nc]])
+        c = max(0, int(np.searchsorted(firsts, value, side)) - 1)
+        stop = min(n, (c + 1) * cs) - c * cs
+        return c * cs + int(np.searchsorted(self._chunks[c][i, :stop], value, side))
+
+    def last(self, n: int) -> Dict[str, np.ndarray]:
+        return self.columns(start=-int(n) if n > 0 else len(self))
+
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            return [self[k] for k in range(start, stop, step)]
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("history index out of range")
+        return tuple(self._block(i, i + 1)[:, 0].tolist())
+
+    def __iter__(self) -> Iterator[tuple]:
+        n = len(self)
+        step = self.chunk_size if self._ring is None else max(1, n)
+        for a in range(0, n, step):
+            block = self._block(a, min(n, a + step))
+            yield from (tuple(r) for r in block.T.tolist())
+
+    def rows(self) -> List[tuple]:
+        return list(self)
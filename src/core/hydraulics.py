@@ -0,0 +1,445 @@
+import copy
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .tank import Tank
+from .pump import Pump
+from .properties import mu_water_arr, rho_water_arr
+
+G = 9.80665
+
+
+@dataclass
+class HydNode:
+
+    name: str
+    elevation_m: float = 0.0
+    tank: Optional[Tank] = None     # None: csomópont (ismeretlen nyomómagasság)
+    height_m: float = 2.0           # tartálynál a teli tartály folyadékoszlopa
+    demand_lps: float = 0.0         # csomóponti elvétel
+
+
+@dataclass
+class HydLink:
+
+    name: str
+    a: str
+    b: str
+    length_m: float
+    diameter_m: float
+    roughness_mm: float = 0.045
+    minor_k: float = 0.0
+    pump: Optional[Pump] = None     # szivattyúág: a csőszakasz súrlódása + jelleggörbe
+    shutoff_m: float = 10.0         # zárt tolózári emelőmagasság teljes fordulaton
+
+
+class HydraulicNetwork_FL:
+
+    # Nyomásvezérelt csőhálózat: tartályok (ismert nyomómagasság a szintből),
+    # csomópontok, csövek (Darcy–Weisbach, a súrlódási tényező a viszkozitásból:
+    # f = max(64/Re, Swamee–Jain)) és szivattyúágak H = s²·H0 − H0·(Q/Qmax)²
+    # jelleggörbével, ahol s = |parancs|, Qmax = Pump.max_flow_lps (nulla
+    # emelőmagasságnál), az irány a parancs előjele. A szivattyúág
+    # visszacsapószelepes: álló vagy visszafelé áramló szivattyú zárt ág.
+    #
+    # Megoldás: globális gradiens módszer (Todini–Pilati). Newton-lépésenként
+    # csak a csomóponti nyomómagasságokra kell egy szimmetrikus, pozitív
+    # definit rendszert megoldani (A = C·D⁻¹·Cᵀ, súlyozott Laplace-mátrix). A
+    # ritka (CSR) szerkezet a hálózat felépítésekor egyszer készül; iterációnként
+    # csak az értékek töltődnek (bincount), a megoldó Jacobi-előkondicionált
+    # konjugált gradiens. Az áramok és nyomómagasságok az előző megoldásból
+    # indulnak, így lassan változó szintek mellett tickenként 1–2 iteráció elég.
+
+    R_CLOSED = 1e8        # zárt ág lineáris ellenállása [m/(m³/s)]
+    MAX_ITER = 30
+    MAX_STATUS = 6        # visszacsapószelep-állapotváltások újramegoldásai
+    TOL_H = 1e-4          # energiaegyenlet maradéka ágonként [m]
+    TOL_Q = 1e-7          # csomóponti folytonosság maradéka [m³/s]
+    CG_RTOL = 1e-2        # pontatlan Newton: a lineáris rendszer relatív pontossága
+    CG_MIN_RTOL = 1e-4
+    _PUMP_STATE = ("max_flow_lps", "command", "run_lamp", "hours")   # saját szivattyú a leírásban
+
+    def __init__(self):
+        self.nodes: Dict[str, HydNode] = {}
+        self.links: List[HydLink] = []
+        self._compiled = False
+
+    def add_tank(self, name: str, tank: Tank, elevation_m: float = 0.0, height_m: float = 2.0) -> HydNode:
+        if height_m <= 0:
+            raise ValueError(f"A tartálymagasságnak pozitívnak kell lennie: {name}")
+        return self._add_node(HydNode(name, float(elevation_m), tank, float(height_m)))
+
+    def add_junction(self, name: str, elevation_m: float = 0.0, demand_lps: float = 0.0) -> HydNode:
+        return self._add_node(HydNode(name, float(elevation_m), demand_lps=float(demand_lps)))
+
+    def _add_node(self, node: HydNode) -> HydNode:
+        if node.name in self.nodes:
+            raise ValueError(f"Duplikált csomópontnév: {node.name}")
+        self.nodes[node.name] = node
+        self._compiled = False
+        return node
+
+    def add_pipe(self, name: str, a: str, b: str, length_m: float, diameter_m: float,
+                 roughness_mm: float = 0.045, minor_k: float = 0.0) -> HydLink:
+        return self._add_link(HydLink(name, a, b, float(length_m), float(diameter_m),
+                                      float(roughness_mm), float(minor_k)))
+
+    def add_pump(self, name: str, a: str, b: str, pump: Optional[Pump] = None, length_m: float = 10.0,
+                 diameter_m: float = 0.1, roughness_mm: float = 0.045, minor_k: float = 0.0,
+                 shutoff_m: float = 10.0) -> HydLink:
+        if shutoff_m <= 0:
+            raise ValueError(f"A zárt tolózári emelőmagasságnak pozitívnak kell lennie: {name}")
+        return self._add_link(HydLink(name, a, b, float(length_m), float(diameter_m), float(roughness_mm),
+                                      float(minor_k), pump if pump is not None else Pump(name=name),
+                                      float(shutoff_m)))
+
+    def _add_link(self, link: HydLink) -> HydLink:
+        for n in (link.a, link.b):
+            if n not in self.nodes:
+                raise KeyError(f"Ismeretlen csomópont: {n}")
+        if link.a == link.b:
+            raise ValueError(f"Az ág két vége azonos: {link.name}")
+        if link.length_m <= 0 or link.diameter_m <= 0:
+            raise ValueError(f"A csőhossznak és az átmérőnek pozitívnak kell lennie: {link.name}")
+        if any(lk.name == link.name for lk in self.links):
+            raise ValueError(f"Duplikált ágnév: {link.name}")
+        self.links.append(link)
+        self._compiled = False
+        return link
+
+    @classmethod
+    def from_simulator_FL(cls, sim, length_m: float = 20.0, diameter_m: float = 0.1,
+                          roughness_mm: float = 0.045, shutoff_m: float = 10.0,
+                          height_m: float = 2.0) -> "HydraulicNetwork_FL":
+        # a 3 tartályos / 2 szivattyús alapelrendezés; csatolás: sim.hydraulics = net
+        net = cls()
+        for name in ("T1", "T2", "T3"):
+            net.add_tank(name, getattr(sim, name.lower()), height_m=height_m)
+        for name, a, b in (("P1", "T1", "T2"), ("P2", "T2", "T3")):
+            net.add_pump(name, a, b, getattr(sim, name.lower()), length_m, diameter_m, roughness_mm,
+                         shutoff_m=shutoff_m)
+        return net
+
+
+    def to_config_FL(self, refs: Dict[int, str]) -> dict:
+        # JSON-ba írható leírás (pl. ellenőrzőponthoz); refs: id(tartály/szivattyú) → név
+        # a külső objektumokra. Saját (a hálózat által létrehozott) szivattyú állapota
+        # a leírásba kerül.
+        nodes = []
+        for nd in self.nodes.values():
+            tank = None
+            if nd.tank is not None:
+                tank = refs.get(id(nd.tank))
+                if tank is None:
+                    raise ValueError(f"A tartály nem menthető (külső objektum): {nd.name}")
+            nodes.append({"name": nd.name, "elevation_m": nd.elevation_m, "tank": tank,
+                          "height_m": nd.height_m, "demand_lps": nd.demand_lps})
+        links = []
+        for lk in self.links:
+            pump = None
+            if lk.pump is not None:
+                pump = refs.get(id(lk.pump))
+                if pump is None:
+                    pump = {"name": lk.pump.name, **{f: getattr(lk.pump, f) for f in self._PUMP_STATE}}
+            links.append({"name": lk.name, "a": lk.a, "b": lk.b, "length_m": lk.length_m,
+                          "diameter_m": lk.diameter_m, "roughness_mm": lk.roughness_mm,
+                          "minor_k": lk.minor_k, "pump": pump, "shutoff_m": lk.shutoff_m})
+        return {"nodes": nodes, "links": links}
+
+    @classmethod
+    def from_config_FL(cls, cfg: dict, objs: Dict[str, object]) -> "HydraulicNetwork_FL":
+        # a to_config_FL() leírásából; objs: név → tartály/szivattyú objektum
+        def ref(name):
+            try:
+                return objs[name]
+            except KeyError:
+                raise KeyError(f"Ismeretlen hivatkozás a hálózatleírásban: {name}") from None
+
+        net = cls()
+        for nd in cfg["nodes"]:
+            tank = ref(nd["tank"]) if nd["tank"] is not None else None
+            net._add_node(HydNode(nd["name"], float(nd["elevation_m"]), tank, float(nd["height_m"]),
+                                  float(nd["demand_lps"])))
+        for lk in cfg["links"]:
+            pump = lk["pump"]
+            if isinstance(pump, str):
+                pump = ref(pump)
+            elif pump is not None:
+                state = pump
+                pump = Pump(state["max_flow_lps"], state["name"])
+                for f in cls._PUMP_STATE:
+                    setattr(pump, f, state[f])
+            net._add_link(HydLink(lk["name"], lk["a"], lk["b"], float(lk["length_m"]), float(lk["diameter_m"]),
+                                  float(lk["roughness_mm"]), float(lk["minor_k"]), pump, float(lk["shutoff_m"])))
+        return net
+
+    def compile_FL(self) -> None:
+        names = list(self.nodes)
+        index = {n: i for i, n in enumerate(names)}
+        nodes = [self.nodes[n] for n in names]
+        links = self.links
+        self.node_names = names
+        self.link_names = [lk.name for lk in links]
+        self._link_index = {n: k for k, n in enumerate(self.link_names)}
+        n, m = len(nodes), len(links)
+
+        self.fixed = np.array([nd.tank is not None for nd in nodes], dtype=bool)
+        self._tanks = [nd.tank for nd in nodes if nd.tank is not None]
+        self._fixed_idx = np.flatnonzero(self.fixed)
+        self._junc_idx = np.flatnonzero(~self.fixed)
+        jmap = np.full(n, -1, dtype=np.intp)
+        jmap[self._junc_idx] = np.arange(len(self._junc_idx))
+        nj = len(self._junc_idx)
+        self.n_junctions = nj
+
+        self.elev = np.array([nd.elevation_m for nd in nodes])
+        self.tank_height = np.array([nd.height_m for nd in nodes])[self._fixed_idx]
+        self.demand = np.array([nd.demand_lps for nd in nodes])[self._junc_idx] * 1e-3
+
+        self.a = np.array([index[lk.a] for lk in links], dtype=np.intp)
+        self.b = np.array([index[lk.b] for lk in links], dtype=np.intp)
+        self.length = np.array([lk.length_m for lk in links])
+        self.diam = np.array([lk.diameter_m for lk in links])
+        self.area = 0.25 * math.pi * self.diam ** 2
+        self.rel_rough = np.array([lk.roughness_mm for lk in links]) * 1e-3 / self.diam
+        self.minor = np.array([lk.minor_k for lk in links])
+        self._pump_links = np.array([k for k, lk in enumerate(links) if lk.pump is not None], dtype=np.intp)
+        self._pumps = [links[k].pump for k in self._pump_links]
+        self.shutoff = np.array([links[k].shutoff_m for k in self._pump_links])
+
+        # csomóponti végek: ja/jb a csomópont sorszáma, -1 ha a vég tartály
+        self.ja, self.jb = jmap[self.a], jmap[self.b]
+
+        # A = C·diag(w)·Cᵀ szerkezete: minden ág a két csomóponti végének
+        # átlóelemébe +w-t, a két vég közötti elemekbe −w-t ad
+        rows, cols, sign, lk = [], [], [], []
+        for k in range(m):
+            ja, jb = int(self.ja[k]), int(self.jb[k])
+            for r, c, s in ((ja, ja, 1.0), (jb, jb, 1.0), (ja, jb, -1.0), (jb, ja, -1.0)):
+                if r >= 0 and c >= 0:
+                    rows.append(r); cols.append(c); sign.append(s); lk.append(k)
+        # az átló mindig része a mintának (elszigetelt csomópontnál is)
+        rows += list(range(nj)); cols += list(range(nj)); sign += [0.0] * nj; lk += [0] * nj
+        rows, cols = np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)
+        key = rows * max(1, nj) + cols
+        uniq, slot = np.unique(key, return_inverse=True)
+        self._csr_row = (uniq // max(1, nj)).astype(np.intp)
+        self._csr_col = (uniq % max(1, nj)).astype(np.intp)
+        self._slot = slot.astype(np.intp)
+        self._slot_sign = np.array(sign)
+        self._slot_link = np.array(lk, dtype=np.intp)
+        self._diag_pos = np.flatnonzero(self._csr_row == self._csr_col)
+        self.nnz = len(uniq)
+
+        # induló becslés: 1 m/s a cső irányában, a csomópontokon a tartályok átlagos nyomómagassága
+        self.Q = self.area * 1.0
+        self.H = self.elev.copy()
+        self.closed = np.zeros(m, dtype=bool)
+        self._check = np.zeros(len(self._pump_links), dtype=bool)     # visszacsapószelep zárva
+        self._stopped = np.ones(len(self._pump_links), dtype=bool)
+        self._dH_prev = None
+        self._key = None
+        self._warm = False
+        self.iterations = 0
+        self.cg_iterations = 0
+        self.solves = 0
+        self._compiled = True
+
+    def rebind(self, mapping: Dict[int, object]) -> "HydraulicNetwork_FL":
+        # másolat más tartály/szivattyú objektumokra (id(régi) → új), pl. Simulator_FL.fork()
+        if not self._compiled:
+            self.compile_FL()
+        other = copy.copy(self)
+        other.nodes = {n: copy.copy(nd) for n, nd in self.nodes.items()}
+        for nd in other.nodes.values():
+            if nd.tank is not None:
+                nd.tank = mapping.get(id(nd.tank), nd.tank)
+        other.links = [copy.copy(lk) for lk in self.links]
+        for lk in other.links:
+            if lk.pump is not None:
+                lk.pump = mapping.get(id(lk.pump), lk.pump)
+        other._tanks = [mapping.get(id(t), t) for t in self._tanks]
+        other._pumps = [mapping.get(id(p), p) for p in self._pumps]
+        for name in ("Q", "H", "closed", "_check", "_stopped"):
+            setattr(other, name, getattr(self, name).copy())
+        return other
+
+
+    def _gradient(self, Q: np.ndarray, mu: np.ndarray, rho: np.ndarray, speed: np.ndarray,
+                  qmax: np.ndarray, direction: np.ndarray):
+        # g(Q) = H_a − H_b és dg/dQ ágonként; a derivált a súrlódási tényező
+        # Re-függését is tartalmazza (pontos Newton, négyzetes konvergencia)
+        aq = np.abs(Q)
+        re = np.maximum(rho * aq / self.area * self.diam / mu, 1.0)
+        t = 5.74 / re ** 0.9
+        x = self.rel_rough / 3.7 + t
+        lnx = np.log(x)
+        f = 0.25 * (math.log(10.0) / lnx) ** 2
+        dlnf = 1.8 * t / (x * lnx)          # d ln f / d ln Q (<= 0)
+        k_lam = 32.0 * mu * self.length / (rho * G * self.diam ** 2 * self.area)
+        r_f = f * self.length / self.diam / (2.0 * G * self.area ** 2)
+        r_m = self.minor / (2.0 * G * self.area ** 2)
+        r_t = r_f + r_m
+        turb = r_t * aq > k_lam
+        g = Q * np.where(turb, r_t * aq, k_lam)
+        dg = np.where(turb, (r_f * (2.0 + dlnf) + 2.0 * r_m) * aq, k_lam)
+
+        p = self._pump_links
+        if len(p):
+            c = self.shutoff / np.maximum(qmax, 1e-12) ** 2
+            qd = direction * Q[p]
+            g[p] -= direction * (speed ** 2 * self.shutoff - c * qd * np.abs(qd))
+            dg[p] += 2.0 * c * np.abs(qd)
+        shut = self.closed
+        g[shut] = self.R_CLOSED * Q[shut]
+        dg[shut] = self.R_CLOSED
+        return g, dg
+
+    def _pcg(self, data: np.ndarray, rhs: np.ndarray, x0: Optional[np.ndarray] = None) -> np.ndarray:
+        # A·x = rhs, A a CSR mintán (_csr_row, _csr_col, data); Jacobi-előkondicionálás
+        nj = self.n_junctions
+        row, col = self._csr_row, self._csr_col
+        m_inv = 1.0 / data[self._diag_pos]
+        if x0 is None:
+            x = np.zeros(nj)
+            r = rhs.copy()
+        else:
+            x = x0.copy()
+            r = rhs - np.bincount(row, weights=data * x[col], minlength=nj)
+        # a cél a folytonossági tűrés fele, de a relatív javulás CG_MIN_RTOL..CG_RTOL közé esik
+        rmax = np.abs(rhs).max()
+        tol = max(min(self.CG_RTOL * rmax, 0.5 * self.TOL_Q), self.CG_MIN_RTOL * rmax)
+        if np.abs(r).max() <= tol:
+            return x
+        z = m_inv * r
+        p = z.copy()
+        rz = r @ z
+        for it in range(1, 10 * nj + 50):
+            ap = np.bincount(row, weights=data * p[col], minlength=nj)
+            alpha = rz / (p @ ap)
+            x += alpha * p
+            r -= alpha * ap
+            if np.abs(r).max() <= tol:
+                break
+            z = m_inv * r
+            rz, rz_old = r @ z, rz
+            p = z + (rz / rz_old) * p
+        self.cg_iterations += it
+        return x
+
+    def _newton(self, mu, rho, speed, qmax, direction) -> int:
+        Q, H = self.Q, self.H
+        nj = self.n_junctions
+        ja, jb = self.ja, self.jb
+        in_a, in_b = ja >= 0, jb >= 0
+        # a visszaadott érték a Newton-lépések (lineáris megoldások) száma
+        for it in range(self.MAX_ITER + 1):
+            g, dg = self._gradient(Q, mu, rho, speed, qmax, direction)
+            E = g - (H[self.a] - H[self.b])
+            F = (np.bincount(jb[in_b], weights=Q[in_b], minlength=nj)
+                 - np.bincount(ja[in_a], weights=Q[in_a], minlength=nj) - self.demand) if nj else None
+            # zárt ágon a maradék az R_CLOSED-dal skálázódik; ott az áramot nézzük
+            e_open = np.abs(E[~self.closed]).max(initial=0.0)
+            if (e_open <= self.TOL_H and np.abs(Q[self.closed]).max(initial=0.0) <= self.TOL_Q
+                    and (F is None or np.abs(F).max() <= self.TOL_Q)):
+                return it
+            if it == self.MAX_ITER:
+                break
+            w = 1.0 / dg
+            if nj:
+                data = np.bincount(self._slot, weights=self._slot_sign * w[self._slot_link], minlength=self.nnz)
+                # elszigetelt csomópont: kis átló, hogy a rendszer reguláris maradjon
+                data[self._diag_pos] = np.maximum(data[self._diag_pos], 1e-12)
+                wE = w * E
+                rhs = F - (np.bincount(jb[in_b], weights=wE[in_b], minlength=nj)
+                           - np.bincount(ja[in_a], weights=wE[in_a], minlength=nj))
+                # egyenletesen változó szinteknél az előző tick első korrekciója jó kezdőpont
+                dH = self._pcg(data, rhs, self._dH_prev if it == 0 else None)
+                if it == 0:
+                    self._dH_prev = dH
+                H[self._junc_idx] += dH
+                dHe = np.where(in_b, dH[jb], 0.0) - np.where(in_a, dH[ja], 0.0)
+                dQ = -w * (E + dHe)
+            else:
+                dQ = -w * E
+            Q += dQ
+        return self.MAX_ITER
+
+    def solve_FL(self) -> np.ndarray:
+        # ágankénti áram [L/s] (a → b pozitív) az aktuális szintekből és parancsokból
+        if not self._compiled:
+            self.compile_FL()
+        if not len(self.links):
+            return np.zeros(0)
+        tanks, pumps = self._tanks, self._pumps
+        key = (tuple(t.level_l for t in tanks), tuple(t.temperature_c for t in tanks),
+               tuple(t.capacity_l for t in tanks), tuple((p.command, p.max_flow_lps) for p in pumps))
+        if self._warm and key == self._key:
+            # változatlan bemenet (álló szintek, azonos parancsok): az előző megoldás érvényes
+            self.iterations = 0
+            return self.Q * 1e3
+        self._key = key
+        level = np.array(key[0])
+        cap = np.maximum(np.array(key[2]), 1e-9)
+        T = np.array(key[1])
+        H = self.H
+        H[self._fixed_idx] = self.elev[self._fixed_idx] + self.tank_height * np.clip(level / cap, 0.0, 1.0)
+        if not self._warm and self.n_junctions:
+            H[self._junc_idx] = H[self._fixed_idx].mean() if len(tanks) else 0.0
+
+        # folyadékhőmérséklet ágonként: a felvízi tartályé, csomópontok között a térfogattal súlyozott átlag
+        T_node = np.full(len(self.node_names), float((T * level).sum() / max(level.sum(), 1e-9)) if len(T) else 20.0)
+        T_node[self._fixed_idx] = T
+        T_link = np.where(self.Q >= 0.0, T_node[self.a], T_node[self.b])
+        mu, rho = mu_water_arr(T_link), rho_water_arr(T_link)
+
+        cmd = np.array([max(-1.0, min(1.0, float(p.command))) for p in pumps])
+        qmax = np.array([p.max_flow_lps for p in pumps]) * 1e-3
+        speed = np.abs(cmd)
+        direction = np.where(cmd < 0.0, -1.0, 1.0)
+        p = self._pump_links
+        stopped = (speed <= 1e-6) | (qmax <= 0.0)
+        # (újra)induló szivattyú nyitott ágként, névleges árammal indul; a
+        # visszacsapószelep zárását az állapotellenőrzés dönti el
+        start = ~stopped & (self._stopped | (not self._warm))
+        self.Q[p[start]] = (direction * speed * qmax)[start]
+        self._check[start | stopped] = False
+        self._stopped = stopped
+        self.closed[p] = stopped | self._check
+
+        total = 0
+        for _ in range(self.MAX_STATUS):
+            total += self._newton(mu, rho, speed, qmax, direction)
+            # visszacsapószelep: visszaáramlásnál zár, nyit ha a szivattyú legyőzi a nyomómagasság-különbséget
+            lift = direction * (self.H[self.b[p]] - self.H[self.a[p]])
+            back = ~self.closed[p] & (direction * self.Q[p] < -self.TOL_Q)
+            reopen = self.closed[p] & ~stopped & (speed ** 2 * self.shutoff > lift)
+            if not (back.any() or reopen.any()):
+                break
+            self._check[back] = True
+            self._check[reopen] = False
+            self.closed[p] = stopped | self._check
+            self.Q[p[reopen]] = (direction * speed * qmax)[reopen] * 0.1
+        self.Q[self.closed] = 0.0
+        self._warm = True
+        self.iterations = total
+        self.solves += 1
+        return self.Q * 1e3
+
+    def flow_lps(self, name: str) -> float:
+        try:
+            k = self._link_index[name]
+        except (AttributeError, KeyError):
+            raise KeyError(f"Ismeretlen ág: {name}") from None
+        return float(self.Q[k]) * 1e3
+
+    @property
+    def flows_lps(self) -> np.ndarray:
+        return self.Q * 1e3
+
+    @property
+    def heads_m(self) -> Dict[str, float]:
+        return dict(zip(self.node_names, self.H.tolist()))
@@ -0,0 +1,91 @@
+import json
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class _Lap:
+
+    # Egy mérési kör (pl. egy tick): a fázisidők összegződnek, és a done()
+    # hívásakor fázisonként egy mintaként kerülnek a hisztogramba.
+    __slots__ = ("prof", "last", "acc")
+
+    def __init__(self, prof: "Profiler_FL"):
+        self.prof = prof
+        self.acc: Dict[str, float] = {}
+        self.last = time.perf_counter()
+
+    def lap(self, name: str) -> None:
+        now = time.perf_counter()
+        self.acc[name] = self.acc.get(name, 0.0) + (now - self.last)
+        self.last = now
+
+    def skip(self) -> None:
+        # az eddig eltelt időt nem számolja egyik fázishoz sem
+        self.last = time.perf_counter()
+
+    def done(self) -> None:
+        for name, dt in self.acc.items():
+            self.prof.add(name, dt)
+
+
+class Profiler_FL:
+
+    # Fázisonkénti gördülő mintatár (utolsó `window` minta) p50/p99 lekérdezéssel.
+    # Kikapcsolva begin() None-t ad, a mért kódban csak egy `if pf:` marad.
+
+    def __init__(self, window: int = 2048):
+        self.window = max(16, int(window))
+        self.enabled = False
+        self.reset()
+
+    def reset(self) -> None:
+        self._buf: Dict[str, np.ndarray] = {}
+        self._n: Dict[str, int] = {}
+
+    def enable(self, on: bool = True) -> None:
+        self.enabled = bool(on)
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def begin(self) -> Optional[_Lap]:
+        return _Lap(self) if self.enabled else None
+
+    def add(self, name: str, seconds: float) -> None:
+        buf = self._buf.get(name)
+        if buf is None:
+            buf = self._buf[name] = np.zeros(self.window)
+            self._n[name] = 0
+        n = self._n[name]
+        buf[n % self.window] = seconds
+        self._n[name] = n + 1
+
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for name in sorted(self._buf):
+            n = self._n[name]
+            s = self._buf[name][:min(n, self.window)] * 1e6
+            p50, p99 = np.percentile(s, (50, 99))
+            out[name] = {"n": n, "mean_us": float(s.mean()), "p50_us": float(p50),
+                         "p99_us": float(p99), "max_us": float(s.max())}
+        return out
+
+    def report(self) -> str:
+        lines = [f"{'fázis':<22}{'p50 µs':>9}{'p99 µs':>9}{'db':>8}"]
+        for name, st in self.stats().items():
+            lines.append(f"{name:<22}{st['p50_us']:>9.1f}{st['p99_us']:>9.1f}{st['n']:>8d}")
+        return "\n".join(lines)
+
+    def export(self, path: str) -> None:
+        # .json: összesítés; egyéb kiterjesztés: szöveges táblázat
+        with open(path, "w", encoding="utf-8") as f:
+            if path.lower().endswith(".json"):
+                json.dump(self.stats(), f, indent=2)
+            else:
+                f.write(self.report() + "\n")
+
+
+PROFILER = Profiler_FL()
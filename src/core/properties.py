@@ -1,13 +1,22 @@
 from __future__ import annotations
-from typing import Dict
+import math
+from typing import Dict, Optional
+
+import numpy as np
 
 
 _T_MIN = 0.0
 _T_MAX = 100.0
 
+_MU_REF = 1.002e-3
+_MU_K = 0.017
+
 def _clamp_T(T_c: float) -> float:
     return max(_T_MIN, min(_T_MAX, float(T_c)))
 
+def _clamp_T_arr(T_c) -> np.ndarray:
+    return np.clip(np.asarray(T_c, dtype=float), _T_MIN, _T_MAX)
+
 
 def rho_water(T_c: float) -> float:
 
@@ -24,9 +33,7 @@ def cp_water(T_c: float) -> float:
 def mu_water(T_c: float) -> float:
 
     T = _clamp_T(T_c)
-    mu_ref = 1.002e-3
-    k = 0.017
-    return mu_ref * (2.718281828 ** (-k * (T - 20.0)))
+    return _MU_REF * math.exp(-_MU_K * (T - 20.0))
 
 
 def k_water(T_c: float) -> float:
@@ -52,6 +59,86 @@ def water_props(T_c: float) -> Dict[str, float]:
     }
 
 
+
+def rho_water_arr(T_c) -> np.ndarray:
+
+    T = _clamp_T_arr(T_c)
+    return np.maximum(950.0, 998.2 * (1.0 - 0.0003 * (T - 20.0)))
+
+
+def cp_water_arr(T_c) -> np.ndarray:
+
+    return np.full(np.shape(T_c), 4.18)
+
+
+def mu_water_arr(T_c) -> np.ndarray:
+
+    T = _clamp_T_arr(T_c)
+    return _MU_REF * np.exp(-_MU_K * (T - 20.0))
+
+
+def k_water_arr(T_c) -> np.ndarray:
+
+    T = _clamp_T_arr(T_c)
+    return 0.561 + 0.00116 * T
+
+
+def beta_water_arr(T_c) -> np.ndarray:
+
+    T = _clamp_T_arr(T_c)
+    return 1.8e-4 + 3.0e-6 * (T - 20.0)
+
+
+def water_props_arr(T_c) -> Dict[str, np.ndarray]:
+
+    return {
+        "rho_kgm3": rho_water_arr(T_c),
+        "cp_kJkgK": cp_water_arr(T_c),
+        "mu_Pas":   mu_water_arr(T_c),
+        "k_WmK":    k_water_arr(T_c),
+        "beta_1K":  beta_water_arr(T_c),
+    }
+
+
+
+class WaterTable:
+
+    # Előre számolt táblázat 0–100 °C között, lineáris interpolációval.
+    # Egyenletes rács: az index közvetlenül számolható, nincs keresés.
+
+    def __init__(self, step_c: float = 0.1):
+        self.step_c = float(step_c)
+        n = int(round((_T_MAX - _T_MIN) / self.step_c)) + 1
+        self.T = np.linspace(_T_MIN, _T_MAX, n)
+        self.cols = water_props_arr(self.T)
+
+    def lookup(self, name: str, T_c) -> np.ndarray:
+        y = self.cols[name]
+        x = (_clamp_T_arr(T_c) - _T_MIN) / self.step_c
+        i = np.minimum(x.astype(np.intp), len(y) - 2)
+        f = x - i
+        return y[i] + f * (y[i + 1] - y[i])
+
+    def rho(self, T_c) -> np.ndarray: return self.lookup("rho_kgm3", T_c)
+    def cp(self, T_c) -> np.ndarray: return self.lookup("cp_kJkgK", T_c)
+    def mu(self, T_c) -> np.ndarray: return self.lookup("mu_Pas", T_c)
+    def k(self, T_c) -> np.ndarray: return self.lookup("k_WmK", T_c)
+    def beta(self, T_c) -> np.ndarray: return self.lookup("beta_1K", T_c)
+
+    def props(self, T_c) -> Dict[str, np.ndarray]:
+        return {name: self.lookup(name, T_c) for name in self.cols}
+
+
+_TABLE: Optional[WaterTable] = None
+
+def water_table() -> WaterTable:
+    global _TABLE
+    if _TABLE is None:
+        _TABLE = WaterTable()
+    return _TABLE
+
+
+
 def lps_to_m3h(lps: float) -> float:
 
     return float(lps) * 3.6e-3
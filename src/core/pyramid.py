@@ -0,0 +1,183 @@
+import copy
+import math
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .history import HistoryStore, SIM_CHANNELS
+
+
+def bucket_channels(channels: Sequence[str]) -> tuple:
+    # egy vödörsor: kezdő és záró idő, csatornánként min/max/átlag
+    out = ["t", "t_end"]
+    for c in channels:
+        out += [f"{c}_min", f"{c}_max", f"{c}_mean"]
+    return tuple(out)
+
+
+class TrendPyramid_FL:
+
+    # Többszintű min/max/átlag index az előzmények fölött. A 0. szint a nyers
+    # minták (korlátlan, blokkos HistoryStore); a k. szint minden vödre pontosan
+    # fan**k mintát fog össze. Vödör csak akkor záródik, ha betelt, így az
+    # átlagok átlaga pontos. A lezárás BATCH mintánként, szintenként egyetlen
+    # vektoros redukcióval történik (a hozzáfűzés amortizáltan O(1)); a még le
+    # nem zárt jobb szélt a lekérdezés menet közben redukálja.
+    #
+    # A lezárt vödrök nem változnak, ezért egy másik szálból (UI) zár nélkül is
+    # olvashatók, ha a lekérdezés az író szálon rögzített szinthosszakhoz
+    # (lengths()) kötött: a HistoryStore a darabszámot az írás után növeli, így
+    # ezeken belül minden minta kész, a közben hozzáfűzöttek pedig nem látszanak.
+    #
+    # Sinkként (Simulator_FL.sinks) tickenként a teljes SIM_CHANNELS sort kapja.
+
+    BATCH = 256
+
+    def __init__(self, channels: Sequence[str] = SIM_CHANNELS, fan: int = 4, chunk_size: int = 4096):
+        self.channels = tuple(channels)
+        if self.channels[0] != "t":
+            raise ValueError("Az első csatorna az idő (t) kell legyen")
+        self.values = self.channels[1:]
+        self.fan = max(2, int(fan))
+        self.chunk_size = max(1, int(chunk_size))
+        self.bucket_channels = bucket_channels(self.values)
+        self.clear()
+
+    def clear(self) -> None:
+        self.raw = HistoryStore(self.channels, chunk_size=self.chunk_size)
+        self.levels: List[HistoryStore] = [self.raw]
+        self._pending = 0
+
+    def __len__(self) -> int:
+        return self.raw.total
+
+    def fork(self) -> "TrendPyramid_FL":
+        # a szintek másolás-íráskor válnak szét (HistoryStore.fork)
+        other = copy.copy(self)
+        other.levels = [s.fork() for s in self.levels]
+        other.raw = other.levels[0]
+        return other
+
+    @property
+    def depth(self) -> int:
+        return len(self.levels)
+
+    def lengths(self) -> tuple:
+        # szintenkénti darabszám; az író szálon hívva egy konzisztens állapot
+        return tuple(len(s) for s in self.levels)
+
+
+    def _reduce(self, block: np.ndarray, k: int) -> np.ndarray:
+        # a k. szint m*fan eleméből m darab k+1. szintű vödörsor
+        nv = len(self.values)
+        m = block.shape[1] // self.fan
+        out = np.empty((2 + 3 * nv, m))
+        out[0] = block[0, ::self.fan]
+        if k == 0:
+            v = block[1:].reshape(nv, m, self.fan)
+            out[1] = block[0, self.fan - 1::self.fan]
+            out[2::3] = v.min(axis=2)
+            out[3::3] = v.max(axis=2)
+            out[4::3] = v.mean(axis=2)
+        else:
+            out[1] = block[1, self.fan - 1::self.fan]
+            out[2::3] = block[2::3].reshape(nv, m, self.fan).min(axis=2)
+            out[3::3] = block[3::3].reshape(nv, m, self.fan).max(axis=2)
+            out[4::3] = block[4::3].reshape(nv, m, self.fan).mean(axis=2)
+        return out
+
+    def _catch_up(self) -> None:
+        # minden szinten lezárja a betelt vödröket, szintenként egy vektoros redukcióval
+        k = 0
+        while True:
+            src = self.levels[k]
+            if k + 1 == len(self.levels):
+                if len(src) < self.fan:
+                    return
+                self.levels.append(HistoryStore(self.bucket_channels, chunk_size=self.chunk_size))
+            dst = self.levels[k + 1]
+            done = len(dst) * self.fan
+            m = (len(src) - done) // self.fan
+            if m == 0:
+                return
+            dst.append_block(self._reduce(src._block(done, done + m * self.fan), k))
+            k += 1
+
+    def append(self, row: Sequence[float]) -> None:
+        self.raw.append(row)
+        self._pending += 1
+        if self._pending >= self.BATCH:
+            self._pending = 0
+            self._catch_up()
+
+    def extend(self, cols: Dict[str, np.ndarray]) -> None:
+        # meglévő előzmények betöltése (pl. fork vagy checkpoint után)
+        block = np.vstack([np.asarray(cols[c], dtype=float) for c in self.channels])
+        for j in range(block.shape[1]):
+            self.append(block[:, j])
+
+
+    def _as_buckets(self, block: np.ndarray, k: int) -> Dict[str, np.ndarray]:
+        if k > 0:
+            return {name: block[j] for j, name in enumerate(self.bucket_channels)}
+        out = {"t": block[0], "t_end": block[0]}
+        for j, c in enumerate(self.values, start=1):
+            out[f"{c}_min"] = out[f"{c}_max"] = out[f"{c}_mean"] = block[j]
+        return out
+
+    def level_for(self, t0: float, t1: float, width_px: int, lengths: Optional[Sequence[int]] = None) -> int:
+        # a legfinomabb szint, amelyen az ablak legfeljebb width_px vödör
+        lengths = self.lengths() if lengths is None else lengths
+        raw, n_raw = self.raw, lengths[0]
+        n = raw.searchsorted("t", t1, "right", n_raw) - raw.searchsorted("t", t0, "left", n_raw)
+        if n <= width_px:
+            return 0
+        k = int(math.ceil(math.log(n / max(1, width_px), self.fan)))
+        return min(k, len(lengths) - 1)
+
+    def query(self, t0: float = -math.inf, t1: float = math.inf, width_px: int = 800,
+              level: Optional[int] = None, lengths: Optional[Sequence[int]] = None) -> Dict[str, np.ndarray]:
+        # A [t0, t1] ablakot fedő vödrök a kiválasztott szinten. A jobb szél még
+        # le nem zárt részét a lekérdezés maga redukálja (a tárolt szinteket nem
+        # módosítja); a teljes vödörré össze nem álló maradék finomabb
+        # felbontással, a végére kerül. lengths: másik szálból a lengths()
+        # pillanatképe; csak az addig megírt mintákat olvassa.
+        lengths = self.lengths() if lengths is None else lengths
+        levels = self.levels
+        if level is None:
+            k = self.level_for(t0, t1, int(width_px), lengths)
+        else:
+            k = min(int(level), len(lengths) - 1)
+        store, n = levels[k], lengths[k]
+        a = store.searchsorted("t_end" if k > 0 else "t", t0, "left", n)
+        b = store.searchsorted("t", t1, "right", n)
+        parts = [self._as_buckets(store._block(a, max(a, b)), k)]
+        if b >= n:
+            virt = None
+            leftovers = []
+            for j in range(k):
+                src = levels[j]
+                done = lengths[j + 1] * self.fan
+                rows = src._block(done, lengths[j])
+                if virt is not None:
+                    rows = np.concatenate([rows, virt], axis=1)
+                full = rows.shape[1] // self.fan * self.fan
+                virt = self._reduce(rows[:, :full], j) if full else None
+                leftovers.append((rows[:, full:], j))
+            if virt is not None:
+                leftovers.append((virt, k))
+            for block, j in reversed(leftovers):
+                tail = self._as_buckets(block, j)
+                keep = (tail["t_end"] >= t0) & (tail["t"] <= t1)
+                if keep.any():
+                    parts.append({name: col[keep] for name, col in tail.items()})
+        if len(parts) == 1:
+            out = dict(parts[0])
+        else:
+            out = {name: np.concatenate([p[name] for p in parts]) for name in self.bucket_channels}
+        out["level"] = k
+        return out
+
+    @property
+    def nbytes(self) -> int:
+        return sum(s.nbytes for s in self.levels)
@@ -0,0 +1,124 @@
+from typing import Dict, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
+# Egy blokkon belül a szűrő csillapítási szorzata legfeljebb exp(-_LOG_SPAN) lehet,
+# így a zárt alakú megoldás 1/P tényezője nem csordul túl.
+_LOG_SPAN = 600.0
+
+
+def _lowpass_row(x: np.ndarray, alpha: np.ndarray, y0: float, out: np.ndarray) -> None:
+    # y_n = (1 - a_n) y_{n-1} + a_n x_n zárt alakban, blokkonként:
+    #   P_n = Π (1 - a_k),  y_n = P_n (y_prev + Σ a_k x_k / P_k)
+    # x >= 0, így az összegben nincs kioltás. Nagyon kis tau/dt mellett a blokk
+    # akár egyetlen minta is lehet.
+    logg = np.log(np.maximum(1.0 - alpha, 1e-300))
+    d = float(-logg.min()) if len(x) else 0.0
+    step = len(x) if d <= 0.0 else max(1, int(_LOG_SPAN / d))
+    y = float(y0)
+    for a in range(0, len(x), step):
+        b = min(len(x), a + step)
+        logp = np.cumsum(logg[a:b])
+        s = np.cumsum(alpha[a:b] * x[a:b] * np.exp(-logp))
+        out[a:b] = np.exp(logp) * (y + s)
+        y = float(out[b - 1])
+
+
+def remeter_FL(lps: ArrayLike, rho_kgm3: ArrayLike, dt_s: ArrayLike, tau_s: Optional[ArrayLike] = None,
+               meter=None, series: bool = True) -> Dict[str, np.ndarray]:
+    # FlowMeter.measure egész tömbökre, egyszerre több tau jelölttel.
+    # A kiinduló állapot (_y_lps, összegek, min/max) a megadott mérőé; a mérő nem változik.
+    # Visszaad (K = jelöltek száma):
+    #   tau_s, last_lps, last_kgps, total_l, total_kg, min_lps, max_lps   (K,)
+    #   series=True esetén még: lps, kgps, cum_l, cum_kg                    (K, N)
+    lps = np.atleast_1d(np.asarray(lps, dtype=float))
+    n = len(lps)
+    rho = np.broadcast_to(np.asarray(rho_kgm3, dtype=float), (n,))
+    dt = np.broadcast_to(np.asarray(dt_s, dtype=float), (n,))
+    if tau_s is None:
+        tau_s = meter.tau_s if meter is not None else 0.0
+    taus = np.maximum(0.0, np.atleast_1d(np.asarray(tau_s, dtype=float)))
+    k = len(taus)
+
+    # dt <= 0: a mérés kimarad (mint a measure-ben): nincs szűrés, összeg és csúcs
+    valid = dt > 0.0
+    dt_eff = np.where(valid, dt, 0.0)
+    q = np.maximum(0.0, lps)
+    rho_c = np.maximum(0.0, rho) * 1e-3
+
+    y0 = float(meter._y_lps) if meter is not None else 0.0
+    tot_l0 = float(meter.total_l) if meter is not None else 0.0
+    tot_kg0 = float(meter.total_kg) if meter is not None else 0.0
+    mn0 = float(meter.min_lps) if meter is not None else np.inf
+    mx0 = float(meter.max_lps) if meter is not None else -np.inf
+    last_l0 = float(meter.last_lps) if meter is not None else 0.0
+    last_kg0 = float(meter.last_kgps) if meter is not None else 0.0
+
+    res = {name: np.empty(k) for name in ("last_lps", "last_kgps", "total_l", "total_kg", "min_lps", "max_lps")}
+    res["tau_s"] = taus
+    if series:
+        for name in ("lps", "kgps", "cum_l", "cum_kg"):
+            res[name] = np.empty((k, n))
+    y = np.empty(n)
+    idx = np.flatnonzero(valid)
+    last = idx[-1] if len(idx) else None
+
+    for j, tau in enumerate(taus):
+        if tau > 0.0:
+            _lowpass_row(q, dt_eff / (tau + dt_eff), y0, y)
+        elif n:
+            # szűrés nélkül y = q; a kimaradt minták az előző értéket tartják
+            src = np.maximum.accumulate(np.where(valid, np.arange(n), -1))
+            y[:] = np.where(src >= 0, q[np.maximum(src, 0)], y0)
+        kg = rho_c * y
+        cum_l = tot_l0 + np.cumsum(y * dt_eff)
+        cum_kg = tot_kg0 + np.cumsum(kg * dt_eff)
+        if last is None:
+            res["last_lps"][j], res["last_kgps"][j] = last_l0, last_kg0
+            res["total_l"][j], res["total_kg"][j] = tot_l0, tot_kg0
+            res["min_lps"][j], res["max_lps"][j] = mn0, mx0
+        else:
+            res["last_lps"][j], res["last_kgps"][j] = y[last], kg[last]
+            res["total_l"][j], res["total_kg"][j] = cum_l[-1], cum_kg[-1]
+            res["min_lps"][j] = min(mn0, float(y[idx].min()))
+            res["max_lps"][j] = max(mx0, float(y[idx].max()))
+        if series:
+            res["lps"][j], res["kgps"][j], res["cum_l"][j], res["cum_kg"][j] = y, kg, cum_l, cum_kg
+    return res
+
+
+def remeter_history_FL(cols: Mapping[str, np.ndarray], meter: str = "FQ12", tau_s: Optional[ArrayLike] = None,
+                       base=None, dt0_s: Optional[float] = None, series: bool = True) -> Dict[str, np.ndarray]:
+    # Rögzített előzményből (history_columns(), HistoryStore.columns(), historian read()):
+    # FQ12 a q12-t a forrástartály (T1 vagy T2) sűrűségével méri, FQ23 a q23-at (T2 vagy T3).
+    # A sűrűség a felvett, tick végi érték; a motor a hőveszteség előtti értékkel mér,
+    # így a kg-összeg tickenként a hűlés mértékében térhet el.
+    if meter == "FQ12":
+        q, up, down = cols["q12"], cols["rho1"], cols["rho2"]
+    elif meter == "FQ23":
+        q, up, down = cols["q23"], cols["rho2"], cols["rho3"]
+    else:
+        raise ValueError(f"Ismeretlen mérő: {meter} (FQ12 vagy FQ23)")
+    q = np.asarray(q, dtype=float)
+    t = np.asarray(cols["t"], dtype=float)
+    if len(t) == 0:
+        return remeter_FL(q, 0.0, 0.0, tau_s, base, series)
+    if dt0_s is None:
+        # az első minta előtti lépésköz nem ismert; a következővel becsüljük
+        dt0_s = t[1] - t[0] if len(t) > 1 else 1.0
+    dt = np.diff(t, prepend=t[0] - float(dt0_s))
+    rho = np.where(q >= 0.0, up, down)
+    return remeter_FL(np.abs(q), rho, dt, tau_s, base, series)
+
+
+def apply_FL(meter, res: Mapping[str, np.ndarray], k: int = 0) -> None:
+    # a k. jelölt végállapotának visszaírása a mérőbe (mintha measure() futott volna)
+    meter.tau_s = float(res["tau_s"][k])
+    meter._y_lps = meter.last_lps = float(res["last_lps"][k])
+    meter.last_kgps = float(res["last_kgps"][k])
+    meter.total_l = float(res["total_l"][k])
+    meter.total_kg = float(res["total_kg"][k])
+    meter.min_lps = float(res["min_lps"][k])
+    meter.max_lps = float(res["max_lps"][k])
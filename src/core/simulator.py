@@ -1,11 +1,33 @@
+import copy
+import math
+from typing import NamedTuple, Tuple
+
 from .tank import Tank
 from .pump import Pump
 from .flowmeter import FlowMeter
+from .history import HistoryStore, SIM_CHANNELS
+from .profiler import PROFILER
+from .forecast import Forecast_FL, forecast_FL
 
 CAP_L = 1000.0
 
+
+class SimState_FL(NamedTuple):
+
+    t: float
+    levels: Tuple[float, float, float]
+    temps: Tuple[float, float, float]
+    rhos: Tuple[float, float, float]
+    flows_lps: Tuple[float, float]
+    flows_kgps: Tuple[float, float]
+    totals_l: Tuple[float, float]
+    running: Tuple[bool, bool]
+    hours: Tuple[float, float]
+    alarms: Tuple[bool, bool, bool, bool, bool, bool]
+
+
 class Simulator_FL:
-    def __init__(self):
+    def __init__(self, history_capacity=None, hyst_l: float = 0.0):
         self.t1 = Tank(1000, 700, 60.0)
         self.t2 = Tank(1000, 250, 35.0)
         self.t3 = Tank(1000, 100, 25.0)
@@ -18,11 +40,28 @@ class Simulator_FL:
 
         self.drain_lps = 0.0
         self.t = 0.0
-        self.history = []
+        # tickenkénti jelzők az eseményfigyelőnek (EventEngine_FL); a retesz fennálló
+        # állapot: a tiltott irány (+1/−1, 0 ha nincs) a parancs nullázása után is
+        # megmarad, amíg a tiltó feltétel fennáll
+        self.interlock_dir = (0, 0)
+        self.interlocked = (False, False)
+        self.draining = False
+        # opcionális nyomásvezérelt csőhálózat (HydraulicNetwork_FL, "P1"/"P2" szivattyúágakkal);
+        # ha be van kötve, a szivattyúáramot ez adja a parancs * max_flow_lps helyett
+        self.hydraulics = None
+        self.history = HistoryStore(SIM_CHANNELS, capacity=history_capacity)
+        # további tickenkénti fogyasztók (pl. HistorianWriter_FL); append(row)-t kapnak
+        self.sinks = []
 
         self.last_q12_lps = 0.0
         self.last_q23_lps = 0.0
 
+        # a forrás szivattyúzása ezen a szinten (és alatta) reteszelve van
+        self.hyst_l = float(hyst_l)
+        self._forecast = None
+        self._forecast_key = None
+        self.refresh_state_FL()
+
 
     def _transfer_FL(self, src: Tank, dst: Tank, q_cmd_lps: float, dt_s: float) -> float:
         if abs(q_cmd_lps) <= 1e-12:
@@ -51,50 +90,153 @@ class Simulator_FL:
 
 
     def step_FL(self, dt_s: float = 1.0):
-
-        q1_cmd = self.p1.signed_flow_lps()
-        if q1_cmd > 0 and (self.t1.level_l <= 0 or self.t2.level_l >= CAP_L):
-            self.p1.command = 0.0; q1_cmd = 0.0
-        if q1_cmd < 0 and (self.t2.level_l <= 0 or self.t1.level_l >= CAP_L):
-            self.p1.command = 0.0; q1_cmd = 0.0
+        pf = PROFILER.begin()
+
+        hyd = self.hydraulics
+        if hyd is not None:
+            hyd.solve_FL()
+            if pf: pf.lap("sim.hydraulics")
+        q1_cmd = self.p1.signed_flow_lps() if hyd is None else hyd.flow_lps("P1")
+        # a vizsgált irány: a parancsé, parancs nélkül a korábban reteszelt irány
+        d1 = (q1_cmd > 0) - (q1_cmd < 0) or self.interlock_dir[0]
+        if (d1 > 0 and (self.t1.level_l <= self.hyst_l or self.t2.level_l >= CAP_L)
+                or d1 < 0 and (self.t2.level_l <= self.hyst_l or self.t1.level_l >= CAP_L)):
+            if q1_cmd:
+                self.p1.command = 0.0; q1_cmd = 0.0
+        else:
+            d1 = 0
+        if pf: pf.lap("sim.interlock")
 
         q12 = self._transfer_FL(self.t1, self.t2, q1_cmd, dt_s)
         self.last_q12_lps = q12
+        if pf: pf.lap("sim.transfer")
         rho_src12 = self.t1.density_kgm3 if q12 >= 0 else self.t2.density_kgm3
         self.fq12.measure(abs(q12), rho_src12, dt_s)
         self.p1.tick_hours(dt_s)
+        if pf: pf.lap("sim.measure")
 
 
-        q2_cmd = self.p2.signed_flow_lps()
-        if q2_cmd > 0 and (self.t2.level_l <= 0 or self.t3.level_l >= CAP_L):
-            self.p2.command = 0.0; q2_cmd = 0.0
-        if q2_cmd < 0 and (self.t3.level_l <= 0 or self.t2.level_l >= CAP_L):
-            self.p2.command = 0.0; q2_cmd = 0.0
+        q2_cmd = self.p2.signed_flow_lps() if hyd is None else hyd.flow_lps("P2")
+        d2 = (q2_cmd > 0) - (q2_cmd < 0) or self.interlock_dir[1]
+        if (d2 > 0 and (self.t2.level_l <= self.hyst_l or self.t3.level_l >= CAP_L)
+                or d2 < 0 and (self.t3.level_l <= self.hyst_l or self.t2.level_l >= CAP_L)):
+            if q2_cmd:
+                self.p2.command = 0.0; q2_cmd = 0.0
+        else:
+            d2 = 0
+        self.interlock_dir = (d1, d2)
+        self.interlocked = (d1 != 0, d2 != 0)
+        if pf: pf.lap("sim.interlock")
 
         q23 = self._transfer_FL(self.t2, self.t3, q2_cmd, dt_s)
         self.last_q23_lps = q23
+        if pf: pf.lap("sim.transfer")
         rho_src23 = self.t2.density_kgm3 if q23 >= 0 else self.t3.density_kgm3
         self.fq23.measure(abs(q23), rho_src23, dt_s)
         self.p2.tick_hours(dt_s)
+        if pf: pf.lap("sim.measure")
 
 
         drain = min(self.drain_lps * dt_s, self.t3.level_l)
         self.t3.remove(drain)
+        self.draining = drain > 0.0
+        if pf: pf.lap("sim.drain")
 
 
         self.t1.thermal_losses(dt_s)
         self.t2.thermal_losses(dt_s)
         self.t3.thermal_losses(dt_s)
+        if pf: pf.lap("sim.thermal")
 
 
         self.t += dt_s
-        self.history.append((
+        self.record_FL()
+        if pf:
+            pf.lap("sim.history")
+            pf.done()
+
+
+    def refresh_state_FL(self) -> SimState_FL:
+        t1, t2, t3 = self.t1, self.t2, self.t3
+        self.state = SimState_FL(
             self.t,
-            self.t1.level_l, self.t2.level_l, self.t3.level_l,
-            q12, q23,
-            self.t1.temperature_c, self.t2.temperature_c, self.t3.temperature_c,
-            self.t1.density_kgm3, self.t2.density_kgm3, self.t3.density_kgm3
-        ))
+            (t1.level_l, t2.level_l, t3.level_l),
+            (t1.temperature_c, t2.temperature_c, t3.temperature_c),
+            (t1.density_kgm3, t2.density_kgm3, t3.density_kgm3),
+            (self.last_q12_lps, self.last_q23_lps),
+            (self.fq12.last_kgps, self.fq23.last_kgps),
+            (self.fq12.total_l, self.fq23.total_l),
+            (self.p1.run_lamp, self.p2.run_lamp),
+            (self.p1.hours, self.p2.hours),
+            (t1.alarm_ll, t1.alarm_hh, t2.alarm_ll, t2.alarm_hh, t3.alarm_ll, t3.alarm_hh),
+        )
+        return self.state
+
+    def record_FL(self) -> None:
+        st = self.refresh_state_FL()
+        row = (st.t, *st.levels, *st.flows_lps, *st.temps, *st.rhos)
+        self.history.append(row)
+        for sink in self.sinks:
+            sink.append(row)
+
+
+    def forecast_FL(self, cmds=None, latching: bool = True) -> Forecast_FL:
+        # Zárt alakú előrejelzés (LL/HH/üres/tele, retesz) az aktuális állapotból.
+        # Gyorsítótárazott: csak parancs-/beállításváltozáskor, vagy ha a
+        # szimuláció elérte a következő küszöbátlépést, számolódik újra.
+        tanks = (self.t1, self.t2, self.t3)
+        if cmds is None:
+            cmds = (self.p1.command, self.p2.command)
+        q_max = (self.p1.max_flow_lps, self.p2.max_flow_lps)
+        if self.hydraulics is not None:
+            cmds, q_max = self._hydraulic_regime_FL(cmds)
+        key = (tuple(cmds), *q_max, self.drain_lps, self.hyst_l, latching,
+               tuple((t.capacity_l, t.ll_pct, t.hh_pct) for t in tanks))
+        fc = self._forecast
+        if fc is not None and key == self._forecast_key and self.t < fc.valid_until:
+            return fc
+        self._forecast = forecast_FL(
+            self.t, [t.level_l for t in tanks], cmds, q_max,
+            self.drain_lps, self.hyst_l, [t.capacity_l * t.ll_pct / 100.0 for t in tanks],
+            [t.capacity_l * t.hh_pct / 100.0 for t in tanks], CAP_L, latching)
+        self._forecast_key = key
+        return self._forecast
+
+    def _hydraulic_regime_FL(self, cmds):
+        # Csőhálózatnál a szivattyúáram a szintektől függ: a hálózat a mostani
+        # szintekre és a kért parancsokra megoldva adja az állandónak vett
+        # áramokat (irány, |q|). Mivel ezek tickenként változnak, a kulcsuk is,
+        # így az előrejelzés minden tickben frissül.
+        hyd = self.hydraulics
+        pumps = (self.p1, self.p2)
+        saved = tuple(p.command for p in pumps)
+        try:
+            for p, c in zip(pumps, cmds):
+                p.command = c
+            hyd.solve_FL()
+            q = (hyd.flow_lps("P1"), hyd.flow_lps("P2"))
+        finally:
+            for p, c in zip(pumps, saved):
+                p.command = c
+        return tuple(0.0 if abs(x) <= 1e-9 else math.copysign(1.0, x) for x in q), tuple(abs(x) for x in q)
+
+    def invalidate_forecast_FL(self) -> None:
+        # kívülről módosított szintek után
+        self._forecast = None
+
+
+    def fork(self) -> "Simulator_FL":
+        # Független ág: a skaláris állapot másolódik, az előzmény közös, amíg
+        # valamelyik ág nem ír bele (copy-on-write).
+        other = copy.copy(self)
+        for name in ("t1", "t2", "t3", "p1", "p2", "fq12", "fq23"):
+            setattr(other, name, copy.copy(getattr(self, name)))
+        other.history = self.history.fork()
+        other.sinks = []
+        if self.hydraulics is not None:
+            other.hydraulics = self.hydraulics.rebind(
+                {id(getattr(self, n)): getattr(other, n) for n in ("t1", "t2", "t3", "p1", "p2")})
+        return other
 
 
     def step(self, dt_s: float = 1.0):
@@ -0,0 +1,174 @@
+import csv
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from .batch import BatchSimulator_FL
+from .checkpoint import STATE_FIELDS, pack_state, unpack_state
+from .simulator import Simulator_FL
+
+# Paraméterek elérési úttal: "drain_lps", "t1.ua_kW_per_K", "p1.max_flow_lps", "fq12.tau_s" …
+SWEEP_PARAMS = tuple(f"{obj}.{name}" if obj else name for obj, name in STATE_FIELDS if name != "t")
+
+_TANKS = ("T1", "T2", "T3")
+_METERS = ("FQ12", "FQ23")
+SWEEP_KPIS = (
+    tuple(f"t_LL_{t}" for t in _TANKS) + tuple(f"t_HH_{t}" for t in _TANKS)
+    + tuple(f"total_l_{m}" for m in _METERS) + tuple(f"total_kg_{m}" for m in _METERS)
+    + tuple(f"peak_lps_{m}" for m in _METERS)
+    + tuple(f"L_final_{t}" for t in _TANKS) + tuple(f"T_final_{t}" for t in _TANKS)
+)
+
+
+def param_grid(grid: Mapping[str, Sequence[float]]) -> List[Dict[str, float]]:
+    unknown = [k for k in grid if k not in SWEEP_PARAMS]
+    if unknown:
+        raise ValueError(f"Ismeretlen sweep-paraméter: {', '.join(unknown)}")
+    names = list(grid)
+    return [dict(zip(names, map(float, combo))) for combo in itertools.product(*(grid[k] for k in names))]
+
+
+def _apply(sim: Simulator_FL, params: Mapping[str, float]) -> None:
+    for path, value in params.items():
+        obj, _, name = path.rpartition(".")
+        setattr(getattr(sim, obj) if obj else sim, name, value)
+
+
+def run_chunk_FL(base_state: np.ndarray, runs: Sequence[Dict[str, float]],
+                 duration_s: float, dt_s: float = 1.0) -> Dict[str, np.ndarray]:
+    # Egy köteg futás vektorosan, BatchSimulator_FL-en; csak a KPI-k térnek vissza.
+    sims = []
+    for params in runs:
+        sim = Simulator_FL(history_capacity=1)
+        unpack_state(sim, base_state)
+        _apply(sim, params)
+        sims.append(sim)
+    b = BatchSimulator_FL.from_simulators(sims)
+    n = b.n
+    t0 = b.t
+    tot_l0, tot_kg0 = b.total_l.copy(), b.total_kg.copy()
+    peak = np.zeros((n, 2))
+    t_ll = np.where(b.alarm_ll, 0.0, np.nan)
+    t_hh = np.where(b.alarm_hh, 0.0, np.nan)
+
+    for _ in range(max(0, int(round(float(duration_s) / float(dt_s))))):
+        b.step_FL(dt_s)
+        np.maximum(peak, b.last_lps, out=peak)
+        t_ll[np.isnan(t_ll) & b.alarm_ll] = b.t - t0
+        t_hh[np.isnan(t_hh) & b.alarm_hh] = b.t - t0
+
+    cols = {}
+    for j, t in enumerate(_TANKS):
+        cols[f"t_LL_{t}"] = t_ll[:, j]
+        cols[f"t_HH_{t}"] = t_hh[:, j]
+        cols[f"L_final_{t}"] = b.level_l[:, j].copy()
+        cols[f"T_final_{t}"] = b.temperature_c[:, j].copy()
+    for k, m in enumerate(_METERS):
+        cols[f"total_l_{m}"] = b.total_l[:, k] - tot_l0[:, k]
+        cols[f"total_kg_{m}"] = b.total_kg[:, k] - tot_kg0[:, k]
+        cols[f"peak_lps_{m}"] = peak[:, k]
+    return {name: cols[name] for name in SWEEP_KPIS}
+
+
+def _trim_partial(path: str) -> None:
+    # megszakadt írás után az utolsó, sorvég nélküli (csonka) sor levágása
+    if not os.path.exists(path):
+        return
+    with open(path, "r+b") as f:
+        size = f.seek(0, os.SEEK_END)
+        pos = size
+        while pos > 0:
+            step = min(4096, pos)
+            f.seek(pos - step)
+            nl = f.read(step).rfind(b"\n")
+            if nl >= 0:
+                pos = pos - step + nl + 1
+                break
+            pos -= step
+        if pos < size:
+            f.truncate(pos)
+
+
+def _read_done(path: str, header: Sequence[str]) -> Dict[int, list]:
+    done = {}
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return done
+    with open(path, newline="", encoding="utf-8") as f:
+        rd = csv.reader(f)
+        if next(rd, None) != list(header):
+            raise ValueError(f"A meglévő eredményfájl fejléce eltér: {path}")
+        for row in rd:
+            if len(row) == len(header):
+                done[int(row[0])] = [float(v) for v in row[1:]]
+    return done
+
+
+def run_sweep_FL(grid: Mapping[str, Sequence[float]], duration_s: float, dt_s: float = 1.0,
+                 base: Optional[Simulator_FL] = None, chunk_size: int = 64,
+                 max_workers: Optional[int] = None, results_path: Optional[str] = None) -> Dict[str, np.ndarray]:
+    # A rács futásait chunk_size-os kötegekben osztja szét egy ProcessPoolExecutor
+    # munkásai között (max_workers=0: helyben fut). results_path megadásakor
+    # minden kész köteg azonnal a CSV-hez fűződik, és újraindításkor a már kész
+    # futások kimaradnak; a .meta.json a rácsot és a futási beállításokat őrzi.
+    runs = param_grid(grid)
+    names = list(grid)
+    header = ["run"] + names + list(SWEEP_KPIS)
+    base_state = pack_state(base if base is not None else Simulator_FL())
+
+    done: Dict[int, list] = {}
+    out = None
+    if results_path:
+        meta = {"grid": {k: [float(v) for v in grid[k]] for k in names}, "duration_s": float(duration_s),
+                "dt_s": float(dt_s), "base": base_state.tolist()}
+        meta_path = results_path + ".meta.json"
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                if json.load(f) != meta:
+                    raise ValueError(f"Az eredményfájl másik sweephez tartozik: {results_path}")
+        else:
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+        _trim_partial(results_path)
+        done = _read_done(results_path, header)
+        new_file = not os.path.exists(results_path) or os.path.getsize(results_path) == 0
+        out = open(results_path, "a", newline="", encoding="utf-8")
+        writer = csv.writer(out)
+        if new_file:
+            writer.writerow(header)
+
+    todo = [i for i in range(len(runs)) if i not in done]
+    cs = max(1, int(chunk_size))
+    chunks = [todo[a:a + cs] for a in range(0, len(todo), cs)]
+
+    def collect(idx, kpis):
+        for r, i in enumerate(idx):
+            row = [runs[i][k] for k in names] + [float(kpis[name][r]) for name in SWEEP_KPIS]
+            done[i] = row
+            if out is not None:
+                writer.writerow([i] + row)
+        if out is not None:
+            out.flush()
+
+    try:
+        if max_workers == 0:
+            for idx in chunks:
+                collect(idx, run_chunk_FL(base_state, [runs[i] for i in idx], duration_s, dt_s))
+        elif chunks:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                futs = {pool.submit(run_chunk_FL, base_state, [runs[i] for i in idx], duration_s, dt_s): idx
+                        for idx in chunks}
+                for fut in as_completed(futs):
+                    collect(futs[fut], fut.result())
+    finally:
+        if out is not None:
+            out.close()
+
+    order = sorted(done)
+    table = np.array([done[i] for i in order], dtype=float).reshape(len(order), len(header) - 1)
+    result = {"run": np.array(order, dtype=np.int64)}
+    result.update({name: table[:, j] for j, name in enumerate(header[1:])})
+    return result
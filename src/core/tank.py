@@ -1,6 +1,10 @@
+import math
 from dataclasses import dataclass, field
 from typing import Optional
-from .properties import rho_water, cp_water
+
+import numpy as np
+
+from .properties import rho_water, cp_water, rho_water_arr, cp_water_arr
 
 @dataclass
 class Tank:
@@ -18,6 +22,11 @@ class Tank:
     _t_min: float = field(default=-50.0, repr=False)
     _t_max: float = field(default=200.0, repr=False)
 
+    # sűrűség/cp gyorsítótár; csak a hőmérséklet változásakor számolódik újra
+    _prop_T: float = field(default=float("nan"), repr=False, compare=False)
+    _rho: float = field(default=0.0, repr=False, compare=False)
+    _cp: float = field(default=0.0, repr=False, compare=False)
+
 
     def add(self, q_l: float, t_in_c: Optional[float] = None) -> None:
         q_l = max(0.0, float(q_l))
@@ -52,26 +61,33 @@ class Tank:
 
 
     def thermal_losses(self, dt_s: float) -> None:
+        self.thermal_step(dt_s, 0.0)
+
+    def thermal_step(self, dt_s: float, power_kW: float = 0.0) -> None:
+        # C dT/dt = P - UA (T - Tamb) pontos megoldása (C a lépés elején rögzítve):
+        # T -> T_inf + (T - T_inf) exp(-UA dt / C),  T_inf = Tamb + P / UA
         if self.level_l <= self._eps or dt_s <= 0.0:
             return
 
         T = self.temperature_c
-        if abs(T - self.ambient_c) <= 1e-9 or self.ua_kW_per_K <= 0.0:
+        ua = max(0.0, float(self.ua_kW_per_K))
+        P = float(power_kW)
+        if abs(P) <= 1e-12 and (ua <= 0.0 or abs(T - self.ambient_c) <= 1e-9):
             return
 
-        UA_kJ_per_sK = float(self.ua_kW_per_K)
-        dQ_kJ = UA_kJ_per_sK * (T - self.ambient_c) * float(dt_s)
-
         rho = self.density_kgm3
         V_m3 = self.level_l * 1e-3
         m_kg = rho * V_m3
-        cp_kJ_per_kgK = cp_water(T)
+        C_kJ_per_K = m_kg * self.cp_kJkgK
+        if C_kJ_per_K <= self._eps:
+            return
 
-        denom = m_kg * cp_kJ_per_kgK
-        if denom > self._eps:
-            dT = - dQ_kJ / denom
-            self.temperature_c += dT
-            self._clamp_temp()
+        if ua <= 0.0:
+            self.temperature_c = T + P * float(dt_s) / C_kJ_per_K
+        else:
+            T_inf = self.ambient_c + P / ua
+            self.temperature_c = T_inf + (T - T_inf) * math.exp(-ua * float(dt_s) / C_kJ_per_K)
+        self._clamp_temp()
 
     def add_heat(self, power_kW: float, dt_s: float) -> None:
         if self.level_l <= self._eps or dt_s <= 0.0 or abs(power_kW) <= 1e-12:
@@ -80,7 +96,7 @@ class Tank:
         rho = self.density_kgm3
         V_m3 = self.level_l * 1e-3
         m_kg = rho * V_m3
-        cp_kJ_per_kgK = cp_water(self.temperature_c)
+        cp_kJ_per_kgK = self.cp_kJkgK
 
         denom = m_kg * cp_kJ_per_kgK
         if denom > self._eps:
@@ -101,9 +117,22 @@ class Tank:
     def alarm_hh(self) -> bool:
         return self.level_pct >= self.hh_pct
 
+    def _props(self) -> None:
+        T = self.temperature_c
+        if T != self._prop_T:
+            self._rho = rho_water(T)
+            self._cp = cp_water(T)
+            self._prop_T = T
+
     @property
     def density_kgm3(self) -> float:
-        return rho_water(self.temperature_c)
+        self._props()
+        return self._rho
+
+    @property
+    def cp_kJkgK(self) -> float:
+        self._props()
+        return self._cp
 
     def set_alarms(self, ll_pct: float, hh_pct: float) -> None:
         self.ll_pct = float(ll_pct)
@@ -115,3 +144,23 @@ class Tank:
             self.temperature_c = self._t_min
         elif self.temperature_c > self._t_max:
             self.temperature_c = self._t_max
+
+
+def thermal_step_arr(T_c, level_l, ua_kW_per_K, ambient_c, dt_s: float, power_kW=0.0) -> np.ndarray:
+    # Tank.thermal_step sok tartályra egyetlen hívással
+    T = np.asarray(T_c, dtype=float)
+    if dt_s <= 0.0:
+        return T.copy()
+    L = np.asarray(level_l, dtype=float)
+    ua = np.maximum(0.0, ua_kW_per_K)
+    P = np.asarray(power_kW, dtype=float)
+
+    C = rho_water_arr(T) * (L * 1e-3) * cp_water_arr(T)
+    active = (L > Tank._eps) & (C > Tank._eps) & (
+        (np.abs(P) > 1e-12) | ((ua > 0.0) & (np.abs(T - ambient_c) > 1e-9)))
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        T_inf = ambient_c + P / ua
+        T_exp = T_inf + (T - T_inf) * np.exp(-ua * dt_s / C)
+        T_lin = T + P * dt_s / C
+        T_new = np.where(ua > 0.0, T_exp, T_lin)
+    return np.where(active, np.clip(T_new, Tank._t_min, Tank._t_max), T)
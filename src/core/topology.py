@@ -0,0 +1,311 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .tank import Tank, thermal_step_arr
+from .properties import rho_water_arr
+from .pump import Pump
+from .flowmeter import FlowMeter
+from .simulator import Simulator_FL
+from .history import HistoryStore
+from .batch import transfer_kernel, meter_kernel
+
+_EPS = Tank._eps
+
+
+@dataclass
+class PumpEdge:
+
+    name: str
+    src: str
+    dst: str
+    pump: Pump
+    meter: Optional[FlowMeter] = None
+
+
+class Topology_FL:
+
+
+    def __init__(self):
+        self.tanks: Dict[str, Tank] = {}
+        self.edges: List[PumpEdge] = []
+        self.drains: Dict[str, float] = {}
+        # a forrás szivattyúzása ezen a szinten (és alatta) reteszelve van
+        self.hyst_l = 0.0
+
+    def add_tank(self, name: str, tank: Optional[Tank] = None) -> Tank:
+        if name in self.tanks:
+            raise ValueError(f"Duplikált tartálynév: {name}")
+        self.tanks[name] = tank if tank is not None else Tank()
+        return self.tanks[name]
+
+    def add_pump(self, name: str, src: str, dst: str,
+                 pump: Optional[Pump] = None, meter: Optional[FlowMeter] = None) -> PumpEdge:
+        for n in (src, dst):
+            if n not in self.tanks:
+                raise KeyError(f"Ismeretlen tartály: {n}")
+        if src == dst:
+            raise ValueError(f"A szivattyú két vége azonos: {name}")
+        edge = PumpEdge(name, src, dst, pump if pump is not None else Pump(name=name), meter)
+        self.edges.append(edge)
+        return edge
+
+    def set_drain(self, tank: str, q_lps: float) -> None:
+        if tank not in self.tanks:
+            raise KeyError(f"Ismeretlen tartály: {tank}")
+        self.drains[tank] = max(0.0, float(q_lps))
+
+
+    @classmethod
+    def from_simulator_FL(cls, sim: Simulator_FL) -> "Topology_FL":
+        topo = cls()
+        topo.add_tank("T1", sim.t1)
+        topo.add_tank("T2", sim.t2)
+        topo.add_tank("T3", sim.t3)
+        topo.add_pump("P1", "T1", "T2", sim.p1, sim.fq12)
+        topo.add_pump("P2", "T2", "T3", sim.p2, sim.fq23)
+        topo.set_drain("T3", sim.drain_lps)
+        topo.hyst_l = sim.hyst_l
+        return topo
+
+    @classmethod
+    def preset_3t2p(cls) -> "Topology_FL":
+        return cls.from_simulator_FL(Simulator_FL())
+
+
+class TopologySimulator_FL:
+
+    # "simultaneous" (alapértelmezés): minden él egy vektoros lépésben, tartályonként
+    # skálázott korlátokkal, O(élek) költséggel
+    # "staged": élek sorrendhelyes léptetése (Simulator_FL-lel azonos nyomvonal, a 3T/2P
+    # előbeállítás összevetéséhez); egy láncban élenként külön szakasz, így lassú
+    MODES = ("simultaneous", "staged")
+
+    def __init__(self, topology: Topology_FL, mode: str = "simultaneous", history_capacity=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Ismeretlen mód: {mode}")
+        self.topology = topology
+        self.mode = mode
+        self.t = 0.0
+        self.history_capacity = history_capacity
+        self.reload_FL()
+
+    def reload_FL(self) -> None:
+        topo = self.topology
+        self.tank_names = list(topo.tanks)
+        self.edge_names = [e.name for e in topo.edges]
+        index = {n: i for i, n in enumerate(self.tank_names)}
+        tanks = [topo.tanks[n] for n in self.tank_names]
+        edges = topo.edges
+        n, m = len(tanks), len(edges)
+
+        def arr(objs, attr, default=0.0):
+            return np.array([float(getattr(o, attr)) if o is not None else default for o in objs], dtype=float)
+
+        self.capacity_l = arr(tanks, "capacity_l")
+        self.level_l = arr(tanks, "level_l")
+        self.temperature_c = arr(tanks, "temperature_c")
+        self.ua_kW_per_K = arr(tanks, "ua_kW_per_K")
+        self.ambient_c = arr(tanks, "ambient_c")
+        self.drain_lps = np.array([topo.drains.get(name, 0.0) for name in self.tank_names], dtype=float)
+
+        self.src = np.array([index[e.src] for e in edges], dtype=np.intp)
+        self.dst = np.array([index[e.dst] for e in edges], dtype=np.intp)
+        pumps = [e.pump for e in edges]
+        self.command = arr(pumps, "command")
+        self.max_flow_lps = arr(pumps, "max_flow_lps")
+        self.hours = arr(pumps, "hours")
+        self.run_lamp = arr(pumps, "run_lamp").astype(bool)
+
+        meters = [e.meter for e in edges]
+        self.has_meter = np.array([mtr is not None for mtr in meters], dtype=bool)
+        self.tau_s = arr(meters, "tau_s")
+        self.y_lps = arr(meters, "_y_lps")
+        self.last_lps = arr(meters, "last_lps")
+        self.last_kgps = arr(meters, "last_kgps")
+        self.total_l = arr(meters, "total_l")
+        self.total_kg = arr(meters, "total_kg")
+        self.min_lps = arr(meters, "min_lps", float("+inf"))
+        self.max_lps = arr(meters, "max_lps", float("-inf"))
+
+        self.q_lps = np.zeros(m)
+
+        # ritka incidencia-mátrix (COO): tartály x él, -1 a forrásnál, +1 a célnál
+        self.inc_rows = np.concatenate([self.src, self.dst])
+        self.inc_cols = np.concatenate([np.arange(m), np.arange(m)]).astype(np.intp)
+        self.inc_data = np.concatenate([-np.ones(m), np.ones(m)])
+        self.n_tanks, self.n_edges = n, m
+        self.stages = self._build_stages()
+        self.history = HistoryStore(
+            ["t"] + [f"L:{t}" for t in self.tank_names] + [f"q:{e}" for e in self.edge_names]
+            + [f"T:{t}" for t in self.tank_names] + [f"rho:{t}" for t in self.tank_names],
+            capacity=self.history_capacity)
+
+    def _build_stages(self) -> List[np.ndarray]:
+        # egy szakaszon belül egy tartályt legfeljebb egy él érint
+        last = np.full(self.n_tanks, -1, dtype=np.intp)
+        stage_of = np.empty(self.n_edges, dtype=np.intp)
+        for e in range(self.n_edges):
+            s, d = self.src[e], self.dst[e]
+            k = max(last[s], last[d]) + 1
+            stage_of[e] = k
+            last[s] = last[d] = k
+        if self.n_edges == 0:
+            return []
+        order = np.argsort(stage_of, kind="stable")
+        bounds = np.searchsorted(stage_of[order], np.arange(stage_of.max() + 2))
+        return [order[bounds[k]:bounds[k + 1]] for k in range(len(bounds) - 1)]
+
+    def incidence_dense(self) -> np.ndarray:
+        B = np.zeros((self.n_tanks, self.n_edges))
+        np.add.at(B, (self.inc_rows, self.inc_cols), self.inc_data)
+        return B
+
+    def net_inflow_lps(self) -> np.ndarray:
+        return np.bincount(self.inc_rows, weights=self.inc_data * self.q_lps[self.inc_cols], minlength=self.n_tanks)
+
+
+    def _index(self, names: List[str], name: str) -> int:
+        try:
+            return names.index(name)
+        except ValueError:
+            raise KeyError(f"Ismeretlen elem: {name}") from None
+
+    def set_command(self, pump: str, cmd: float) -> None:
+        self.command[self._index(self.edge_names, pump)] = float(cmd)
+
+    def set_drain(self, tank: str, q_lps: float) -> None:
+        self.drain_lps[self._index(self.tank_names, tank)] = max(0.0, float(q_lps))
+
+
+    def _interlock_FL(self, e: np.ndarray) -> np.ndarray:
+        q = np.clip(self.command[e], -1.0, 1.0) * self.max_flow_lps[e]
+        La, Lb = self.level_l[self.src[e]], self.level_l[self.dst[e]]
+        capa, capb = self.capacity_l[self.src[e]], self.capacity_l[self.dst[e]]
+        hy = self.topology.hyst_l
+        trip = ((q > 0) & ((La <= hy) | (Lb >= capb))) | ((q < 0) & ((Lb <= hy) | (La >= capa)))
+        self.command[e[trip]] = 0.0
+        q[trip] = 0.0
+        return q
+
+    def _orient(self, e: np.ndarray, q_cmd: np.ndarray):
+        rev = q_cmd < -1e-12
+        s = np.where(rev, self.dst[e], self.src[e])
+        d = np.where(rev, self.src[e], self.dst[e])
+        return rev, s, d
+
+    def _transfer_staged_FL(self, e: np.ndarray, q_cmd: np.ndarray, dt_s: float) -> np.ndarray:
+        rev, s, d = self._orient(e, q_cmd)
+        q, L_src, L_dst, T_dst = transfer_kernel(
+            np.abs(q_cmd), self.level_l[s], self.level_l[d],
+            self.temperature_c[s], self.temperature_c[d], self.capacity_l[d], dt_s)
+        self.level_l[s] = L_src
+        self.level_l[d] = L_dst
+        self.temperature_c[d] = T_dst
+        return np.where(rev, -q, q)
+
+    def _transfer_simultaneous_FL(self, e: np.ndarray, q_cmd: np.ndarray, dt_s: float) -> np.ndarray:
+        rev, s, d = self._orient(e, q_cmd)
+        n = self.n_tanks
+        L, T = self.level_l, self.temperature_c
+        want = np.abs(q_cmd) * dt_s
+        want[(want <= 1e-12 * dt_s) | (L[s] <= 0) | (L[d] >= self.capacity_l[d])] = 0.0
+
+        out_req = np.bincount(s, weights=want, minlength=n)
+        in_req = np.bincount(d, weights=want, minlength=n)
+        with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+            k_out = np.where(out_req > 0.0, np.minimum(1.0, L / out_req), 1.0)
+            k_in = np.where(in_req > 0.0, np.minimum(1.0, np.maximum(0.0, self.capacity_l - L) / in_req), 1.0)
+        moved = want * np.minimum(k_out[s], k_in[d])
+
+        out_v = np.bincount(s, weights=moved, minlength=n)
+        in_v = np.bincount(d, weights=moved, minlength=n)
+        in_h = np.bincount(d, weights=moved * T[s], minlength=n)
+        kept = L - out_v
+        L_new = np.minimum(self.capacity_l, kept + in_v)
+        with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+            T_mix = (kept * T + in_h) / (kept + in_v)
+        mix = in_v > _EPS
+        self.temperature_c = np.where(mix, np.clip(T_mix, Tank._t_min, Tank._t_max), T)
+        self.level_l = L_new
+        q = moved / dt_s if dt_s > 0 else np.zeros_like(moved)
+        return np.where(rev, -q, q)
+
+    def _measure_FL(self, e: np.ndarray, dt_s: float) -> None:
+        e = e[self.has_meter[e]]
+        if dt_s <= 0.0 or e.size == 0:
+            return
+        q = self.q_lps[e]
+        src_T = self.temperature_c[np.where(q >= 0, self.src[e], self.dst[e])]
+        q_filt, kgps = meter_kernel(np.abs(q), rho_water_arr(src_T), self.tau_s[e], self.y_lps[e], dt_s)
+        self.y_lps[e] = q_filt
+        self.last_lps[e] = q_filt
+        self.last_kgps[e] = kgps
+        self.total_l[e] += q_filt * dt_s
+        self.total_kg[e] += kgps * dt_s
+        self.min_lps[e] = np.minimum(self.min_lps[e], q_filt)
+        self.max_lps[e] = np.maximum(self.max_lps[e], q_filt)
+
+    def _tick_hours_FL(self, e: np.ndarray, dt_s: float) -> None:
+        running = np.abs(np.clip(self.command[e], -1.0, 1.0)) * self.max_flow_lps[e] > 1e-6
+        self.run_lamp[e] = running
+        self.hours[e[running]] += dt_s / 3600.0
+
+
+    def step_FL(self, dt_s: float = 1.0) -> None:
+        dt_s = float(dt_s)
+        if self.mode == "staged":
+            for e in self.stages:
+                q_cmd = self._interlock_FL(e)
+                self.q_lps[e] = self._transfer_staged_FL(e, q_cmd, dt_s)
+                self._measure_FL(e, dt_s)
+                self._tick_hours_FL(e, dt_s)
+        elif self.n_edges:
+            e = np.arange(self.n_edges)
+            q_cmd = self._interlock_FL(e)
+            self.q_lps = self._transfer_simultaneous_FL(e, q_cmd, dt_s)
+            self._measure_FL(e, dt_s)
+            self._tick_hours_FL(e, dt_s)
+
+        drain = np.minimum(self.drain_lps * dt_s, self.level_l)
+        self.level_l = self.level_l - np.minimum(self.level_l, np.maximum(0.0, drain))
+
+        self.temperature_c = thermal_step_arr(self.temperature_c, self.level_l, self.ua_kW_per_K, self.ambient_c, dt_s)
+
+        self.t += dt_s
+        self.history.append((
+            self.t,
+            *self.level_l.tolist(),
+            *self.q_lps.tolist(),
+            *self.temperature_c.tolist(),
+            *rho_water_arr(self.temperature_c).tolist(),
+        ))
+
+    def step(self, dt_s: float = 1.0) -> None:
+        self.step_FL(dt_s)
+
+
+    def sync_FL(self) -> None:
+        topo = self.topology
+        for i, name in enumerate(self.tank_names):
+            tank = topo.tanks[name]
+            tank.level_l = float(self.level_l[i])
+            tank.temperature_c = float(self.temperature_c[i])
+        for name, q in zip(self.tank_names, self.drain_lps):
+            if q > 0.0 or name in topo.drains:
+                topo.drains[name] = float(q)
+        for k, edge in enumerate(topo.edges):
+            edge.pump.command = float(self.command[k])
+            edge.pump.hours = float(self.hours[k])
+            edge.pump.run_lamp = bool(self.run_lamp[k])
+            mtr = edge.meter
+            if mtr is None:
+                continue
+            mtr._y_lps = float(self.y_lps[k])
+            mtr.last_lps = float(self.last_lps[k])
+            mtr.last_kgps = float(self.last_kgps[k])
+            mtr.total_l = float(self.total_l[k])
+            mtr.total_kg = float(self.total_kg[k])
+            mtr.min_lps = float(self.min_lps[k])
+            mtr.max_lps = float(self.max_lps[k])
@@ -1,6 +1,10 @@
-import tkinter as tk
-from tkinter import ttk
-from .app_fl import App_FL
-
+# Az App_FL (és vele a tkinter) csak első hozzáféréskor töltődik be, így pl. az
+# `ui.scene_fl` vagy a `core`/`controllers` használata nem húzza be a GUI-t.
 __all__ = ["App_FL"]
 
+
+def __getattr__(name):
+    if name == "App_FL":
+        from .app_fl import App_FL
+        return App_FL
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
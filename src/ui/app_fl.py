@@ -1,30 +1,75 @@
+import importlib
+import sys
+import threading
+import time
 import tkinter as tk
-from tkinter import ttk
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
+from tkinter import messagebox, ttk
 
 from controllers.app_controller_fl import AppController_FL
+from controllers.worker_fl import SimWorker_FL
+from controllers.replay_fl import ReplaySource_FL
+from core.profiler import PROFILER
+from core.events import SIGNALS, apply_events
+from .scene_fl import Scene_FL
 
 REF_CAPACITY_L = 1000.0
+# SIGNALS első nyolc jelzője lámpa: LL/HH tartályonként, majd a két szivattyú
+LAMP_COLORS = ("red",) * 6 + ("lime green",) * 2
 
 
 class App_FL(ttk.Frame):
-    def __init__(self, master):
+    OVERLAY_MS = 500
+    TREND_DELAY_MS = 50
+    TREND_POLL_MS = 50
+    # a matplotlib nehezét háttérszál tölti be; a Tk-függő részek a fő szálon
+    TREND_PREFETCH = ("matplotlib.figure", "matplotlib.backends.backend_agg")
+
+    # lazy_trend=True: előbb a séma jelenik meg, a matplotlib-es trendpanel az első
+    # képkocka után töltődik be (addig egy helykitöltő felirat áll a helyén)
+    def __init__(self, master, threaded: bool = False, display_hz: float = 10.0, replay: str = None,
+                 profile: bool = False, lazy_trend: bool = True):
         super().__init__(master, padding=8)
         self.pack(fill="both", expand=True)
 
 
-        self.ctrl = AppController_FL()
+        # threaded módban a self.ctrl a háttérszál pillanatkép-olvasója és parancssora;
+        # replay módban egy rögzített historian-fájl lejátszója
+        self.replay = ReplaySource_FL(replay) if replay else None
+        self.worker = SimWorker_FL(AppController_FL()) if threaded and not replay else None
+        if self.replay is not None:
+            self.ctrl = self.replay
+        else:
+            self.ctrl = self.worker if self.worker is not None else AppController_FL()
+        self.display_ms = max(1, int(1000.0 / max(0.1, float(display_hz))))
+        self._shown_seq = None
         self.running = False
         self.G = None
+        self.layout = None
         self._resize_after = None
+        # a lámpák a vezérlő eseménynaplójából frissülnek (csak változáskor);
+        # a lejátszónak nincs naplója, ott a jelzők lekérdezése marad
+        self.events = getattr(self.ctrl, "events", None)
+        self._ev_seq = 0
+        self._signals = [False] * len(SIGNALS)
 
         self._build()
+        self.scene = Scene_FL(self.canvas)
         self.canvas.bind("<Configure>", self._on_canvas_resize)
+        # F9: fázisonkénti időmérés és a statisztika-fedvény be/ki
+        self.bind_all("<F9>", self.toggle_profiling)
+        self._overlay_at = 0.0
+        if profile:
+            PROFILER.enable()
 
 
         self._draw_static()
         self.update_display_FL()
+        self._trend_prefetch = None
+        self._trend_after = None
+        if lazy_trend:
+            self._trend_after = self.after(self.TREND_DELAY_MS, self._load_trend)
+        else:
+            self._load_trend(prefetch=False)
 
     def fl_quick_start(self, *_):
 
@@ -120,6 +165,9 @@ class App_FL(ttk.Frame):
         ttk.Label(left, text="Zöld lámpa – fut a szivattyú").grid(row=10, column=0, columnspan=2, sticky="w")
         ttk.Label(left, text="LL/HH – szintkapcsolók").grid(row=11, column=0, columnspan=2, sticky="w")
 
+        if self.replay is not None:
+            self._build_replay(left, 12)
+
 
         mid = ttk.Frame(paned)
         paned.add(mid, weight=10)
@@ -138,20 +186,70 @@ class App_FL(ttk.Frame):
         self.lbl_flows = ttk.Label(meas, text="Áramlás  L/s: P1 - | P2 -    kg/s: P1 - | P2 -"); self.lbl_flows.pack(anchor="w")
         self.lbl_totals = ttk.Label(meas, text="Mennyiségek összesen [L]  FQ12:-  FQ23:-"); self.lbl_totals.pack(anchor="w")
         self.lbl_pumps = ttk.Label(meas, text="Szivattyúk – P1 üzemóra: - h | P2 üzemóra: - h"); self.lbl_pumps.pack(anchor="w")
+        self.lbl_fc = ttk.Label(meas, text="Előrejelzés: -", justify="left"); self.lbl_fc.pack(anchor="w")
 
-        trend = ttk.LabelFrame(right, text="Trend (szintek és hőmérséklet)", padding=4)
-        trend.pack(fill="both", expand=True, pady=(8, 0))
-        self.fig = Figure(figsize=(4.4, 3.0), constrained_layout=True)
-        self.ax1 = self.fig.add_subplot(211); self.ax1.set_ylabel("Szint [L]")
-        self.ax2 = self.fig.add_subplot(212); self.ax2.set_ylabel("T [°C]"); self.ax2.set_xlabel("Idő [s]")
-        self.canvas_plot = FigureCanvasTkAgg(self.fig, master=trend)
-        self.canvas_plot.get_tk_widget().pack(fill="both", expand=True)
+        self.trend_frame = ttk.LabelFrame(right, text="Trend (szintek és hőmérséklet)", padding=4)
+        self.trend_frame.pack(fill="both", expand=True, pady=(8, 0))
+        self.trend = None
+        self.lbl_trend_wait = ttk.Label(self.trend_frame, text="Trend betöltése…")
+        self.lbl_trend_wait.pack(expand=True)
 
 
         self.after(0, lambda: paned.sashpos(0, 270))
         self.after(0, lambda: paned.sashpos(1, 980))
 
 
+    def _load_trend(self, prefetch: bool = True):
+        self._trend_after = None
+        if prefetch and "ui.trend_fl" not in sys.modules:
+            if self._trend_prefetch is None:
+                self._trend_prefetch = threading.Thread(
+                    target=lambda: [importlib.import_module(m) for m in self.TREND_PREFETCH],
+                    name="TrendPrefetch_FL", daemon=True)
+                self._trend_prefetch.start()
+            if self._trend_prefetch.is_alive():
+                self._trend_after = self.after(self.TREND_POLL_MS, self._load_trend)
+                return
+        from .trend_fl import TrendPanel_FL
+        self.lbl_trend_wait.destroy()
+        self.trend = TrendPanel_FL(self.trend_frame)
+        self.trend.refresh_FL(self.ctrl)
+
+    def _build_replay(self, parent, row):
+        rp = self.replay
+        frm = ttk.LabelFrame(parent, text="Visszajátszás", padding=4)
+        frm.grid(row=row, column=0, columnspan=3, sticky="we", pady=(10, 0))
+        frm.columnconfigure(1, weight=1)
+
+        # sebesség logaritmikus csúszkán: 10^0 … 10^3
+        self.var_speed = tk.DoubleVar(value=0.0)
+        self.lbl_speed = ttk.Label(frm, text="1×", width=6)
+        ttk.Label(frm, text="Sebesség").grid(row=0, column=0, sticky="w")
+        ttk.Scale(frm, from_=0.0, to=3.0, variable=self.var_speed, orient="horizontal",
+                  command=lambda *_: self._on_speed()).grid(row=0, column=1, sticky="we")
+        self.lbl_speed.grid(row=0, column=2, sticky="e")
+
+        self.var_pos = tk.DoubleVar(value=rp.t_start)
+        self.lbl_pos = ttk.Label(frm, text="-", width=10)
+        ttk.Label(frm, text="Idő [s]").grid(row=1, column=0, sticky="w")
+        ttk.Scale(frm, from_=rp.t_start, to=rp.t_end, variable=self.var_pos, orient="horizontal",
+                  command=lambda *_: self._on_scrub()).grid(row=1, column=1, sticky="we")
+        self.lbl_pos.grid(row=1, column=2, sticky="e")
+
+    def _on_speed(self):
+        self.replay.set_speed(10.0 ** self.var_speed.get())
+        self.lbl_speed.config(text=f"{self.replay.speed:.0f}×")
+
+    def _on_scrub(self):
+        t = self.var_pos.get()
+        if abs(t - self.replay.time_s) < 1e-9:
+            return
+        self.replay.seek(t)
+        if self.trend is not None:
+            self.trend.reset_limits_FL()
+        self.update_display_FL()
+
+
     def _compute_layout_FL(self):
         c = self.canvas
         w = max(760, c.winfo_width() or 0)
@@ -172,9 +270,12 @@ class App_FL(ttk.Frame):
 
 
     def _draw_static(self):
+        pf = PROFILER.begin()
         c = self.canvas
         c.delete("all")
         L = self._compute_layout_FL()
+        self.layout = L
+        self.scene.reset()
         self.G = {"top": L["top"], "bar_h": L["bar_h"], "bar_w": L["bar_w"]}
 
         x1, x2, x3 = L["x1"], L["x2"], L["x3"]
@@ -222,6 +323,12 @@ class App_FL(ttk.Frame):
         self.lbl_p1_dir = c.create_text((x1 + x2) / 2, y_mid - 26, text="T1 → T2 (P1)", font=("TkDefaultFont", 9))
         self.lbl_p2_dir = c.create_text((x2 + x3) / 2, y_mid - 26, text="T2 → T3 (P2)", font=("TkDefaultFont", 9))
 
+        self.prof_text = c.create_text(8, 8, anchor="nw", text="", font=("TkFixedFont", 8), fill="#444")
+        self._paint_lamps(range(len(LAMP_COLORS)))
+        if pf:
+            pf.lap("ui.layout")
+            pf.done()
+
 
     def update_display_FL(self):
 
@@ -230,71 +337,125 @@ class App_FL(ttk.Frame):
     def _draw_dynamic(self):
         if not self.G:
             return
-        c = self.canvas
-        L = self._compute_layout_FL()
+        pf = PROFILER.begin()
+        sc = self.scene
+        L = self.layout
         x1, x2, x3 = L["x1"], L["x2"], L["x3"]
-        y_top, y_bot, y_mid = L["y_top"], L["y_bot"], L["y_mid"]
+        y_bot = L["y_bot"]
         bar_w = L["bar_w"]; inset = 6
 
 
-        l1, l2, l3 = self.ctrl.get_levels()
+        # egy képkocka egyetlen pillanatképből (threaded módban a munkaszál közben publikálhat)
+        snap = self.ctrl.snapshot()
+        l1, l2, l3 = snap.get_levels()
 
         def set_fill(rect, xc, level_l):
             h_px = int(self.G["bar_h"] * max(0.0, min(1.0, level_l / REF_CAPACITY_L)))
-            c.coords(rect, xc - bar_w // 2 + inset, y_bot - h_px, xc + bar_w // 2 - inset, y_bot)
+            sc.coords(rect, xc - bar_w // 2 + inset, y_bot - h_px, xc + bar_w // 2 - inset, y_bot)
 
         set_fill(self.t1_fill, x1, l1)
         set_fill(self.t2_fill, x2, l2)
         set_fill(self.t3_fill, x3, l3)
 
 
-        ll1, hh1, ll2, hh2, ll3, hh3 = self.ctrl.get_alarms()
-        c.itemconfig(self.t1_ll, fill=("red" if ll1 else "grey")); c.itemconfig(self.t1_hh, fill=("red" if hh1 else "grey"))
-        c.itemconfig(self.t2_ll, fill=("red" if ll2 else "grey")); c.itemconfig(self.t2_hh, fill=("red" if hh2 else "grey"))
-        c.itemconfig(self.t3_ll, fill=("red" if ll3 else "grey")); c.itemconfig(self.t3_hh, fill=("red" if hh3 else "grey"))
-
+        self._update_lamps(snap)
 
-        run1, run2, h1h, h2h = self.ctrl.get_pumps()
-        c.itemconfig(self.p1_lamp, fill=("lime green" if run1 else "grey"))
-        c.itemconfig(self.p2_lamp, fill=("lime green" if run2 else "grey"))
-
-        f12_lps, f23_lps, f12_kgps, f23_kgps = self.ctrl.get_flows()
+        f12_lps, f23_lps, f12_kgps, f23_kgps = snap.get_flows()
         w1 = max(2, int(2 + 8 * (min(35.0, f12_lps) / 35.0)))
         w2 = max(2, int(2 + 8 * (min(35.0, f23_lps) / 35.0)))
-        c.coords(self.p1_pipe, x1 + bar_w // 2, y_mid, x2 - bar_w // 2, y_mid)
-        c.coords(self.p2_pipe, x2 + bar_w // 2, y_mid, x3 - bar_w // 2, y_mid)
-        c.itemconfig(self.p1_pipe, width=w1); c.itemconfig(self.p2_pipe, width=w2)
-
-
-        cmd1, cmd2 = self.ctrl.get_pump_cmds()
-        c.itemconfig(self.p1_pipe, arrow=("last" if cmd1 >= 0 else "first"))
-        c.itemconfig(self.p2_pipe, arrow=("last" if cmd2 >= 0 else "first"))
-        c.itemconfig(self.lbl_p1_dir, text=("T1 → T2 (P1)" if cmd1 >= 0 else "T2 → T1 (P1)"))
-        c.itemconfig(self.lbl_p2_dir, text=("T2 → T3 (P2)" if cmd2 >= 0 else "T3 → T2 (P2)"))
-
-
-        tot12, tot23 = self.ctrl.get_totals()
-        T1, T2, T3 = self.ctrl.get_temps()
-        R1, R2, R3 = self.ctrl.get_rhos()
-        self.lbl_lvls.config(text=f"Szintek [L]  T1:{l1:.0f}  T2:{l2:.0f}  T3:{l3:.0f}")
-        self.lbl_temp.config(text=f"Hőmérséklet [°C]  T1:{T1:.1f}  T2:{T2:.1f}  T3:{T3:.1f}")
-        self.lbl_rho.config(text=f"Sűrűség [kg/m³]  T1:{R1:.0f}  T2:{R2:.0f}  T3:{R3:.0f}")
-        self.lbl_flows.config(text=f"Áramlás  L/s: P1 {f12_lps:.1f} | P2 {f23_lps:.1f}    kg/s: P1 {f12_kgps:.2f} | P2 {f23_kgps:.2f}")
-        self.lbl_totals.config(text=f"Mennyiségek összesen [L]  FQ12:{tot12:.0f}  FQ23:{tot23:.0f}")
-        self.lbl_pumps.config(text=f"Szivattyúk – P1 üzemóra: {h1h:.2f} h | P2 üzemóra: {h2h:.2f} h")
-
-
-        hist = self.ctrl.history()
-        if hist:
-            ts  = [h[0] for h in hist]
-            L1  = [h[1] for h in hist]; L2s = [h[2] for h in hist]; L3s = [h[3] for h in hist]
-            T1s = [h[6] for h in hist]; T2s = [h[7] for h in hist]; T3s = [h[8] for h in hist]
-            self.ax1.clear(); self.ax2.clear()
-            self.ax1.plot(ts, L1,  label="T1"); self.ax1.plot(ts, L2s, label="T2"); self.ax1.plot(ts, L3s, label="T3")
-            self.ax1.set_ylabel("Szint [L]"); self.ax1.legend(loc="upper right")
-            self.ax2.plot(ts, T1s, label="T1"); self.ax2.plot(ts, T2s, label="T2"); self.ax2.plot(ts, T3s, label="T3")
-            self.ax2.set_ylabel("T [°C]"); self.ax2.set_xlabel("Idő [s]"); self.ax2.legend(loc="upper right")
-            self.canvas_plot.draw()
+
+
+        cmd1, cmd2 = snap.get_pump_cmds()
+        sc.itemconfig(self.p1_pipe, width=w1, arrow=("last" if cmd1 >= 0 else "first"))
+        sc.itemconfig(self.p2_pipe, width=w2, arrow=("last" if cmd2 >= 0 else "first"))
+        sc.itemconfig(self.lbl_p1_dir, text=("T1 → T2 (P1)" if cmd1 >= 0 else "T2 → T1 (P1)"))
+        sc.itemconfig(self.lbl_p2_dir, text=("T2 → T3 (P2)" if cmd2 >= 0 else "T3 → T2 (P2)"))
+
+
+        if pf: pf.lap("ui.canvas")
+
+        tot12, tot23 = snap.get_totals()
+        T1, T2, T3 = snap.get_temps()
+        R1, R2, R3 = snap.get_rhos()
+        sc.label(self.lbl_lvls, f"Szintek [L]  T1:{l1:.0f}  T2:{l2:.0f}  T3:{l3:.0f}")
+        sc.label(self.lbl_temp, f"Hőmérséklet [°C]  T1:{T1:.1f}  T2:{T2:.1f}  T3:{T3:.1f}")
+        sc.label(self.lbl_rho, f"Sűrűség [kg/m³]  T1:{R1:.0f}  T2:{R2:.0f}  T3:{R3:.0f}")
+        sc.label(self.lbl_flows, f"Áramlás  L/s: P1 {f12_lps:.1f} | P2 {f23_lps:.1f}    kg/s: P1 {f12_kgps:.2f} | P2 {f23_kgps:.2f}")
+        sc.label(self.lbl_totals, f"Mennyiségek összesen [L]  FQ12:{tot12:.0f}  FQ23:{tot23:.0f}")
+        _, _, h1h, h2h = snap.get_pumps()
+        sc.label(self.lbl_pumps, f"Szivattyúk – P1 üzemóra: {h1h:.2f} h | P2 üzemóra: {h2h:.2f} h")
+        sc.label(self.lbl_fc, self._forecast_text(snap))
+
+
+        if pf:
+            pf.lap("ui.labels")
+            pf.done()
+
+        if self.trend is not None:
+            self.trend.refresh_FL(snap)
+        self._update_overlay()
+
+        if self.replay is not None:
+            self.var_pos.set(self.replay.time_s)
+            self.lbl_pos.config(text=f"{self.replay.time_s:.0f}")
+
+
+    def _lamp_items(self):
+        return (self.t1_ll, self.t1_hh, self.t2_ll, self.t2_hh, self.t3_ll, self.t3_hh, self.p1_lamp, self.p2_lamp)
+
+    def _paint_lamps(self, changed):
+        items = self._lamp_items()
+        for k in changed:
+            if k < len(items):
+                self.scene.itemconfig(items[k], fill=(LAMP_COLORS[k] if self._signals[k] else "grey"))
+
+    def _update_lamps(self, snap):
+        if self.events is None:
+            flags = (*snap.get_alarms(), *snap.get_pumps()[:2])
+            changed = [k for k, on in enumerate(flags) if self._signals[k] != bool(on)]
+            for k in changed:
+                self._signals[k] = bool(flags[k])
+        else:
+            recs, seq = self.events.journal.since(self._ev_seq)
+            if seq == self._ev_seq:
+                return
+            self._ev_seq = seq
+            changed = apply_events(self._signals, recs)
+        self._paint_lamps(changed)
+
+
+    FC_NAMES = {"LL": "LL", "HH": "HH", "empty": "üres", "full": "tele", "trip": "retesz"}
+    FC_SHOW = 4
+
+    def _forecast_text(self, snap) -> str:
+        # a gyorsítótárazott előrejelzés visszaszámlálása; tickenként nincs szimuláció
+        fc = snap.forecast_FL()
+        if fc is None:
+            return "Előrejelzés: -"
+        left = sorted(fc.countdown(snap.time_s).items(), key=lambda kv: kv[1])[:self.FC_SHOW]
+        if not left:
+            return "Előrejelzés: nincs várható esemény"
+        parts = []
+        for key, sec in left:
+            obj, kind = key.split(".")
+            m, s = divmod(int(sec + 0.5), 60)
+            h, m = divmod(m, 60)
+            parts.append(f"{obj} {self.FC_NAMES[kind]} {h:d}:{m:02d}:{s:02d}" if h else f"{obj} {self.FC_NAMES[kind]} {m:02d}:{s:02d}")
+        return "Előrejelzés: " + " | ".join(parts)
+
+    def toggle_profiling(self, *_):
+        PROFILER.enable(not PROFILER.enabled)
+        if not PROFILER.enabled:
+            self.scene.itemconfig(self.prof_text, text="")
+
+    def _update_overlay(self):
+        if not PROFILER.enabled:
+            return
+        now = time.perf_counter()
+        if (now - self._overlay_at) * 1000.0 < self.OVERLAY_MS:
+            return
+        self._overlay_at = now
+        self.scene.itemconfig(self.prof_text, text=PROFILER.report())
 
 
     def start(self):
@@ -304,10 +465,56 @@ class App_FL(ttk.Frame):
         self.ctrl.set_p2(self.var_p2.get())
         self.ctrl.set_drain(self.var_drain.get())
         self.running = True
+        if self.replay is not None:
+            if self.replay.at_end:
+                self.replay.seek(self.replay.t_start)
+                if self.trend is not None:
+                    self.trend.reset_limits_FL()
+            self._replay_step()
+            return
+        if self.worker is not None:
+            self.worker.resume()
+            self._poll()
+            return
         self._tick()
 
     def stop(self):
         self.running = False
+        if self.worker is not None:
+            self.worker.pause()
+
+    def destroy(self):
+        if self._trend_after is not None:
+            self.after_cancel(self._trend_after)
+            self._trend_after = None
+        if self.worker is not None:
+            self.worker.close()
+        if self.replay is not None:
+            self.replay.close()
+        super().destroy()
+
+    def _replay_step(self):
+        if not self.running:
+            return
+        self.replay.tick_FL(self.display_ms / 1000.0)
+        self.update_display_FL()
+        if self.replay.at_end:
+            self.running = False
+            return
+        self.after(self.display_ms, self._replay_step)
+
+    def _poll(self):
+        if not self.running:
+            return
+        snap = self.worker.latest()
+        if snap.seq != self._shown_seq:
+            self._shown_seq = snap.seq
+            self.update_display_FL()
+        if self.worker.error is not None:
+            self.running = False
+            messagebox.showerror("Szimulációs hiba", f"A szimuláció leállt: {self.worker.error!r}", parent=self)
+            return
+        self.after(self.display_ms, self._poll)
 
     def _tick(self):
         if not self.running:
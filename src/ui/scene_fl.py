@@ -0,0 +1,43 @@
+class Scene_FL:
+
+    # Megjegyzi az egyes vászonelemeknek és címkéknek utoljára átadott értéket,
+    # és csak tényleges változás esetén küld Tk-hívást.
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.sent = 0
+        self.skipped = 0
+        self.reset()
+
+    def reset(self):
+        self._coords = {}
+        self._opts = {}
+        self._text = {}
+
+
+    def coords(self, item, *xy):
+        xy = tuple(int(round(v)) for v in xy)
+        if self._coords.get(item) == xy:
+            self.skipped += 1
+            return
+        self._coords[item] = xy
+        self.canvas.coords(item, *xy)
+        self.sent += 1
+
+    def itemconfig(self, item, **opts):
+        cache = self._opts.setdefault(item, {})
+        changed = {k: v for k, v in opts.items() if cache.get(k) != v}
+        if not changed:
+            self.skipped += 1
+            return
+        cache.update(changed)
+        self.canvas.itemconfig(item, **changed)
+        self.sent += 1
+
+    def label(self, widget, text: str):
+        if self._text.get(widget) == text:
+            self.skipped += 1
+            return
+        self._text[widget] = text
+        widget.config(text=text)
+        self.sent += 1
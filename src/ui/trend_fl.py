@@ -0,0 +1,210 @@
+import math
+import time
+from tkinter import ttk
+
+import numpy as np
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+from core.profiler import PROFILER
+
+SERIES = (("L1", "L2", "L3"), ("T1", "T2", "T3"))
+LABELS = ("T1", "T2", "T3")
+
+
+class TrendPanel_FL:
+
+    # A vonalak egyszer jönnek létre; tickenként csak set_data + blit.
+    # Teljes újrarajzolás csak akkor kell, ha az adat kilép a tengelyhatárokból.
+    X_HEADROOM = 0.25
+    Y_MARGIN = 0.05
+    ZOOM_STEP = 2.0
+    MIN_SPAN_S = 10.0
+
+    # master=None: képernyő nélküli Agg vászon (mérésekhez), statisztika-címke nélkül
+    def __init__(self, master):
+        self.fig = Figure(figsize=(4.4, 3.0), constrained_layout=True)
+        self.ax1 = self.fig.add_subplot(211); self.ax1.set_ylabel("Szint [L]")
+        self.ax2 = self.fig.add_subplot(212); self.ax2.set_ylabel("T [°C]"); self.ax2.set_xlabel("Idő [s]")
+        self.axes = (self.ax1, self.ax2)
+
+        self.lines = []
+        for ax in self.axes:
+            row = [ax.plot([], [], label=lbl, animated=True)[0] for lbl in LABELS]
+            ax.legend(loc="upper right")
+            ax.set_xlim(0.0, 60.0)
+            self.lines.append(row)
+        self.ax1.set_ylim(0.0, 1000.0)
+        self.ax2.set_ylim(15.0, 65.0)
+
+        if master is None:
+            self.canvas_plot = FigureCanvasAgg(self.fig)
+            self.lbl_stats = None
+        else:
+            self.canvas_plot = FigureCanvasTkAgg(self.fig, master=master)
+            self.canvas_plot.get_tk_widget().pack(fill="both", expand=True)
+            self.lbl_stats = ttk.Label(master, text="Trend: - ms/képkocka | - FPS")
+            self.lbl_stats.pack(anchor="e")
+
+        self._bg = None
+        self._need_full = True
+        self.canvas_plot.mpl_connect("draw_event", self._on_draw)
+
+        self.frame_ms = 0.0
+        self.fps = 0.0
+        self._last_frame = None
+        self.full_draws = 0
+        self.blits = 0
+        self.points = 0
+        self.level = 0
+
+        # None: a teljes futást követi; (t0, t1): rögzített nagyítási ablak
+        self.window = None
+        self._t_now = 0.0
+        self.canvas_plot.mpl_connect("scroll_event", self._on_scroll)
+        self.canvas_plot.mpl_connect("button_press_event", self._on_press)
+
+
+    def _on_draw(self, _event):
+        c = self.canvas_plot
+        self._bg = [c.copy_from_bbox(ax.bbox) for ax in self.axes]
+        for ax, row in zip(self.axes, self.lines):
+            for ln in row:
+                ax.draw_artist(ln)
+
+    def _expand_x(self, t0: float, t1: float) -> bool:
+        lo, hi = self.ax1.get_xlim()
+        if t0 >= lo and t1 <= hi:
+            return False
+        span = max(60.0, t1 - t0)
+        for ax in self.axes:
+            ax.set_xlim(t0, t1 + span * self.X_HEADROOM)
+        return True
+
+    def _expand_y(self, ax, lo_d: float, hi_d: float) -> bool:
+        lo, hi = ax.get_ylim()
+        if lo_d >= lo and hi_d <= hi:
+            return False
+        pad = max(1.0, (hi_d - lo_d) * self.Y_MARGIN)
+        ax.set_ylim(min(lo, lo_d - pad), max(hi, hi_d + pad))
+        return True
+
+
+    def _on_scroll(self, event):
+        # görgetés: nagyítás/kicsinyítés az egér alatti idő körül
+        if event.inaxes is None or event.xdata is None:
+            return
+        lo, hi = self.window if self.window is not None else self.ax1.get_xlim()
+        f = 1.0 / self.ZOOM_STEP if event.button == "up" else self.ZOOM_STEP
+        x = float(event.xdata)
+        span = max(self.MIN_SPAN_S, (hi - lo) * f)
+        r = (x - lo) / (hi - lo) if hi > lo else 0.5
+        self.window = (x - r * span, x + (1.0 - r) * span)
+        self._need_full = True
+
+    def _on_press(self, event):
+        # dupla kattintás: vissza a teljes futás követéséhez
+        if getattr(event, "dblclick", False):
+            self.follow_FL()
+
+    def follow_FL(self) -> None:
+        self.window = None
+        self.reset_limits_FL()
+
+    @property
+    def width_px(self) -> int:
+        return max(16, int(self.ax1.bbox.width))
+
+    def refresh_FL(self, src) -> None:
+        # Piramissal rendelkező forrásnál ablak és pixelszélesség szerinti lekérdezés
+        # (a pontszám a futás hosszától független); egyébként a rövid előzménypuffer.
+        trend = getattr(src, "trend_FL", None)
+        cols = None
+        if trend is not None:
+            t0, t1 = self.window if self.window is not None else (-math.inf, math.inf)
+            cols = trend(t0, t1, self.width_px)
+        if cols is None:
+            cols = src.history_columns()
+        self.update_FL(cols)
+
+    @staticmethod
+    def _envelope(cols, key):
+        # vödrönként (kezdet, min), (vég, max): a vonal pixelszinten kirajzolja a sávot
+        t = np.empty(2 * len(cols["t"]))
+        y = np.empty_like(t)
+        t[0::2] = cols["t"]; t[1::2] = cols["t_end"]
+        y[0::2] = cols[key + "_min"]; y[1::2] = cols[key + "_max"]
+        return t, y
+
+    def update_FL(self, cols) -> None:
+        # cols: nyers oszlopok (history_columns) vagy piramis-vödrök (TrendPyramid_FL.query)
+        t_start = time.perf_counter()
+        t = cols["t"]
+        if len(t) == 0:
+            return
+        buckets = "t_end" in cols
+        self.level = int(cols.get("level", 0)) if buckets else 0
+
+        if self.window is None:
+            rescale = self._expand_x(float(t[0]), float(cols["t_end"][-1] if buckets else t[-1]))
+        else:
+            rescale = tuple(self.ax1.get_xlim()) != self.window
+            if rescale:
+                for ax in self.axes:
+                    ax.set_xlim(*self.window)
+        n = 0
+        for ax, keys, row in zip(self.axes, SERIES, self.lines):
+            if buckets:
+                lo = min(float(cols[k + "_min"].min()) for k in keys)
+                hi = max(float(cols[k + "_max"].max()) for k in keys)
+            else:
+                lo = min(float(cols[k].min()) for k in keys)
+                hi = max(float(cols[k].max()) for k in keys)
+            rescale |= self._expand_y(ax, lo, hi)
+            for k, ln in zip(keys, row):
+                if buckets:
+                    ln.set_data(*self._envelope(cols, k))
+                else:
+                    ln.set_data(t, cols[k])
+                n += len(ln.get_xdata())
+        self.points = n
+
+        c = self.canvas_plot
+        pf = PROFILER.begin()
+        if rescale or self._need_full or self._bg is None:
+            self._need_full = False
+            c.draw()
+            self.full_draws += 1
+            if pf: pf.lap("ui.plot.draw")
+        else:
+            for bg, ax, row in zip(self._bg, self.axes, self.lines):
+                c.restore_region(bg)
+                for ln in row:
+                    ax.draw_artist(ln)
+                c.blit(ax.bbox)
+            self.blits += 1
+            if pf: pf.lap("ui.plot.blit")
+        if pf: pf.done()
+
+        now = time.perf_counter()
+        self.frame_ms = (now - t_start) * 1e3
+        if self._last_frame is not None and now > self._last_frame:
+            inst = 1.0 / (now - self._last_frame)
+            self.fps = inst if self.fps <= 0.0 else 0.8 * self.fps + 0.2 * inst
+        self._last_frame = now
+        if self.lbl_stats is not None:
+            self.lbl_stats.config(text=f"Trend: {self.frame_ms:.1f} ms/képkocka | {self.fps:.1f} FPS | "
+                                       f"{self.points} pont, {self.level}. szint")
+
+    def invalidate(self) -> None:
+        self._need_full = True
+
+    def reset_limits_FL(self) -> None:
+        # ugrás (pl. visszajátszásban visszatekerés) után a tengelyek újra a kezdő méretről nőnek
+        for ax in self.axes:
+            ax.set_xlim(0.0, 60.0)
+        self.ax1.set_ylim(0.0, 1000.0)
+        self.ax2.set_ylim(15.0, 65.0)
+        self._need_full = True